@@ -1,24 +1,478 @@
 import asyncio
+import bisect
+import contextlib
+import contextvars
+import csv
+import functools
+import heapq
+import io
+import logging
+import logging.handlers
+import queue
 import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from typing import List, Optional, Dict, Any
+from typing import Annotated, Callable, List, Literal, Optional, Dict, Any, Tuple
 import json
+import os
 import random
+import secrets
 from datetime import datetime
+from urllib.parse import urlsplit
 
 import aiohttp
 import aiosqlite
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, File, Header, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+
+try:
+    import orjson
+except ImportError:  # optional: fast JSON decoding falls back to the stdlib
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: price analytics are unavailable without it
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: every worker runs its own refresh engine
+    fcntl = None
+
+
+# Outbound HTTP client settings (shared by all merchant fetches)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_SIZE_PER_HOST = int(os.getenv("HTTP_POOL_SIZE_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "10"))
+
+# Connection pre-warming: keep-alive connections opened per merchant host before traffic arrives
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_CONNECTIONS = int(os.getenv("PREWARM_CONNECTIONS", "2"))
+# Per request; a host that does not answer in time is reported but does not block readiness
+PREWARM_TIMEOUT = float(os.getenv("PREWARM_TIMEOUT", "5"))
+
+# Background canary probes per endpoint; compares skip endpoints that keep failing them
+PROBE_ENABLED = os.getenv("PROBE_ENABLED", "true").lower() == "true"
+PROBE_UPC = os.getenv("PROBE_UPC", "012345678905")
+PROBE_INTERVAL = float(os.getenv("PROBE_INTERVAL", "30"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "5"))
+PROBE_WINDOW = int(os.getenv("PROBE_WINDOW", "20"))
+# Consecutive failed probes after which an endpoint is skipped until a probe succeeds
+PROBE_DOWN_AFTER = int(os.getenv("PROBE_DOWN_AFTER", "3"))
+
+# Per-merchant circuit breaker and adaptive timeouts
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+ADAPTIVE_TIMEOUT_ENABLED = os.getenv("ADAPTIVE_TIMEOUT_ENABLED", "true").lower() == "true"
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0"))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "0.5"))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20"))
+ADAPTIVE_TIMEOUT_WINDOW = int(os.getenv("ADAPTIVE_TIMEOUT_WINDOW", "200"))
+
+# Fast JSON mode: orjson for merchant payloads, pre-serialized compare replies
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "true").lower() == "true"
+
+# Outbound request scheduling (per-endpoint rate limits live in api_endpoints)
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "1000"))
+SCHEDULER_INTERACTIVE_MAX_WAIT = float(os.getenv("SCHEDULER_INTERACTIVE_MAX_WAIT", "10"))
+SCHEDULER_BULK_MAX_WAIT = float(os.getenv("SCHEDULER_BULK_MAX_WAIT", "60"))
+SCHEDULER_BACKGROUND_MAX_WAIT = float(os.getenv("SCHEDULER_BACKGROUND_MAX_WAIT", "5"))
+
+# Catalog refresh engine (keeps watchlisted UPCs warm in the price cache)
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "true").lower() == "true"
+REFRESH_BASE_INTERVAL = float(os.getenv("REFRESH_BASE_INTERVAL", "300"))
+REFRESH_MIN_INTERVAL = float(os.getenv("REFRESH_MIN_INTERVAL", "30"))
+REFRESH_MAX_INTERVAL = float(os.getenv("REFRESH_MAX_INTERVAL", "86400"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "10"))
+REFRESH_MERCHANT_RATE = float(os.getenv("REFRESH_MERCHANT_RATE", "5"))
+REFRESH_RATE_SHARE = float(os.getenv("REFRESH_RATE_SHARE", "0.5"))
+REFRESH_RETRY_DELAY = float(os.getenv("REFRESH_RETRY_DELAY", "30"))
+REFRESH_PERSIST_INTERVAL = float(os.getenv("REFRESH_PERSIST_INTERVAL", "10"))
+
+# Multi-worker mode: worker processes, endpoint change polling and the shared price cache
+WORKERS = int(os.getenv("WORKERS", "1"))
+ENDPOINT_SYNC_INTERVAL = float(os.getenv("ENDPOINT_SYNC_INTERVAL", "1.0"))
+PRICE_CACHE_BACKEND = os.getenv("PRICE_CACHE_BACKEND", "sqlite" if WORKERS > 1 else "memory").lower()
+PRICE_CACHE_DATABASE_URL = os.getenv("PRICE_CACHE_DATABASE_URL", "price_cache.db")
+PRICE_CACHE_BUSY_TIMEOUT_MS = int(os.getenv("PRICE_CACHE_BUSY_TIMEOUT_MS", "50"))
+PRICE_CACHE_PRUNE_INTERVAL = float(os.getenv("PRICE_CACHE_PRUNE_INTERVAL", "30"))
+
+# Price result cache
+PRICE_CACHE_ENABLED = os.getenv("PRICE_CACHE_ENABLED", "true").lower() == "true"
+PRICE_CACHE_MAX_ENTRIES = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "10000"))
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "60"))
+PRICE_CACHE_SERVE_STALE = os.getenv("PRICE_CACHE_SERVE_STALE", "true").lower() == "true"
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "300"))
+
+# Warm-restart snapshot of hot cache entries and merchant health, written at shutdown
+WARM_SNAPSHOT_ENABLED = os.getenv("WARM_SNAPSHOT_ENABLED", "true").lower() == "true"
+WARM_SNAPSHOT_PATH = os.getenv("WARM_SNAPSHOT_PATH", "warm_snapshot.db")
+WARM_SNAPSHOT_MAX_ENTRIES = int(os.getenv("WARM_SNAPSHOT_MAX_ENTRIES", str(PRICE_CACHE_MAX_ENTRIES)))
+# Older snapshots no longer describe the merchants and are ignored
+WARM_SNAPSHOT_MAX_AGE = float(os.getenv("WARM_SNAPSHOT_MAX_AGE", "3600"))
+
+# Default latency budget for /api/compare when the request has no deadline_ms (0 = wait for all)
+COMPARE_DEFAULT_DEADLINE_MS = int(os.getenv("COMPARE_DEFAULT_DEADLINE_MS", "0"))
+
+# Price history (separate SQLite file, written in batches by a background task)
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY_ENABLED", "true").lower() == "true"
+PRICE_HISTORY_DATABASE_URL = os.getenv("PRICE_HISTORY_DATABASE_URL", "price_history.db")
+PRICE_HISTORY_QUEUE_SIZE = int(os.getenv("PRICE_HISTORY_QUEUE_SIZE", "100000"))
+PRICE_HISTORY_BATCH_SIZE = int(os.getenv("PRICE_HISTORY_BATCH_SIZE", "1000"))
+PRICE_HISTORY_FLUSH_INTERVAL = float(os.getenv("PRICE_HISTORY_FLUSH_INTERVAL", "1.0"))
+PRICE_HISTORY_RETENTION_DAYS = float(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "365"))
+PRICE_HISTORY_DOWNSAMPLE_AFTER_DAYS = float(os.getenv("PRICE_HISTORY_DOWNSAMPLE_AFTER_DAYS", "7"))
+PRICE_HISTORY_DOWNSAMPLE_BUCKET = int(os.getenv("PRICE_HISTORY_DOWNSAMPLE_BUCKET", "3600"))
+PRICE_HISTORY_MAINTENANCE_INTERVAL = float(os.getenv("PRICE_HISTORY_MAINTENANCE_INTERVAL", "3600"))
+
+# Price analytics (columnar, memory-mapped copy of the price history)
+PRICE_ANALYTICS_DIR = os.getenv("PRICE_ANALYTICS_DIR", "price_analytics")
+PRICE_ANALYTICS_SYNC_CHUNK = int(os.getenv("PRICE_ANALYTICS_SYNC_CHUNK", "100000"))
+# Rebuild from scratch this often, dropping rows removed by retention and downsampling
+PRICE_ANALYTICS_REBUILD_INTERVAL = float(os.getenv("PRICE_ANALYTICS_REBUILD_INTERVAL", "86400"))
+PRICE_ANALYTICS_DEFAULT_DAYS = float(os.getenv("PRICE_ANALYTICS_DEFAULT_DAYS", "30"))
+PRICE_ANALYTICS_DEFAULT_BUCKET = int(os.getenv("PRICE_ANALYTICS_DEFAULT_BUCKET", "3600"))
+
+# Batch comparison limits
+BATCH_MAX_UPCS = int(os.getenv("BATCH_MAX_UPCS", "50000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "500"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "50"))
+BATCH_DEFAULT_PER_MERCHANT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_PER_MERCHANT_CONCURRENCY", "10"))
+
+# Per-request phase timings in a Server-Timing response header
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+# Admin endpoints (sampling profiler) need this token in X-Admin-Token; unset = disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Logging (JSON lines written to stderr by a listener thread)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+FETCH_LOG_VERBOSE = os.getenv("FETCH_LOG_VERBOSE", "false").lower() == "true"
+FETCH_LOG_SAMPLE_RATE = float(os.getenv("FETCH_LOG_SAMPLE_RATE", "0.01"))
+
+
+# Logging
+LOG_FIELDS = ("merchant", "upc", "status", "latency_ms", "price", "in_stock", "error", "url")
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Render a record as one JSON line, including any structured fields passed via extra="""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field in LOG_FIELDS:
+            value = record.__dict__.get(field)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the listener falls behind"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging() -> Tuple[DroppingQueueHandler, logging.handlers.QueueListener]:
+    """Route the app's loggers through an in-memory queue drained by a listener thread"""
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonLogFormatter())
+    
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    app_logger = logging.getLogger("price_comparison")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+    # Verbose fetch logging: every request URL at debug, every success unsampled
+    logging.getLogger("price_comparison.fetch").setLevel(logging.DEBUG if FETCH_LOG_VERBOSE else logging.NOTSET)
+    
+    return queue_handler, logging.handlers.QueueListener(queue_handler.queue, stream_handler)
+
+
+log_handler, log_listener = setup_logging()
+logger = logging.getLogger("price_comparison")
+fetch_logger = logging.getLogger("price_comparison.fetch")
+
+
+def sample_fetch_success() -> bool:
+    """Whether to log this successful fetch (always in verbose mode, else FETCH_LOG_SAMPLE_RATE)"""
+    return fetch_logger.isEnabledFor(logging.DEBUG) or random.random() < FETCH_LOG_SAMPLE_RATE
+
+
+# Metrics (Prometheus text format)
+# All updates happen on the event loop thread, so plain dicts and ints need no locks
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+    
+    type = "counter"
+    
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[Any, ...], float] = {}
+    
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by label values"""
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[Any, ...], list] = {}
+    
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def samples(self):
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket" + _format_labels(self.labelnames, labels, f'le="{le}"'), cumulative
+            yield self.name + "_sum" + _format_labels(self.labelnames, labels), total
+            yield self.name + "_count" + _format_labels(self.labelnames, labels), count
+
+
+class CallbackMetric:
+    """Metric whose samples are read from existing stats at scrape time"""
+    
+    def __init__(self, name: str, help: str, type: str, labelnames: Tuple[str, ...], collect: Callable[[], Any]):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = labelnames
+        self.collect = collect
+    
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+    
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+compare_requests = metrics.register(Counter(
+    "price_compare_requests_total", "POST /api/compare requests by outcome", ("outcome",)
+))
+compare_latency = metrics.register(Histogram(
+    "price_compare_request_duration_seconds", "POST /api/compare handling time"
+))
+upstream_latency = metrics.register(Histogram(
+    "merchant_request_duration_seconds", "Merchant API response time", ("merchant",)
+))
+upstream_responses = metrics.register(Counter(
+    "merchant_responses_total", "Merchant API responses by HTTP status", ("merchant", "status")
+))
+upstream_errors = metrics.register(Counter(
+    "merchant_errors_total", "Failed merchant fetches by error class", ("merchant", "error_class")
+))
+parse_failures = metrics.register(Counter(
+    "merchant_parse_failures_total", "Merchant payloads that yielded no price", ("merchant",)
+))
+scheduler_wait = metrics.register(Histogram(
+    "scheduler_wait_seconds", "Time outbound requests waited for a merchant's rate limit", ("priority",)
+))
+
+
+# Request Timing (Server-Timing header)
+class RequestTimings:
+    """Seconds spent per phase while handling one HTTP request
+    
+    Phases with the same name add up; concurrent phases (one fetch per merchant)
+    each get their own name, so their durations overlap in wall-clock time.
+    """
+    
+    __slots__ = ("phases",)
+    
+    def __init__(self):
+        self.phases: Dict[str, List[Any]] = {}
+    
+    def add(self, name: str, seconds: float, desc: Optional[str] = None):
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [seconds, desc]
+        else:
+            phase[0] += seconds
+    
+    def header(self) -> str:
+        entries = []
+        for name, (seconds, desc) in self.phases.items():
+            if desc is not None:
+                desc = desc.replace("\\", "\\\\").replace('"', '\\"')
+                entries.append(f'{name};desc="{desc}";dur={seconds * 1000:.1f}')
+            else:
+                entries.append(f"{name};dur={seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# Set by ServerTimingMiddleware for each request; None (nothing recorded) everywhere else
+request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+class TimedPhase:
+    """Context manager adding the time spent in its block to the current request's timings, if any"""
+    
+    __slots__ = ("name", "desc", "timings", "started")
+    
+    def __init__(self, name: str, desc: Optional[str] = None):
+        self.name = name
+        self.desc = desc
+    
+    def __enter__(self):
+        self.timings = request_timings.get()
+        if self.timings is not None:
+            self.started = time.perf_counter()
+    
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started, self.desc)
+
+
+class ServerTimingMiddleware:
+    """Send each request's phase timings as a Server-Timing header
+    
+    Plain ASGI, so the handler runs in the same context and sees the request's
+    RequestTimings. Streaming responses only report the phases that finished
+    before their headers went out.
+    """
+    
+    def __init__(self, app, allow_origins: List[str]):
+        self.app = app
+        self.timing_allow_origin = ", ".join(allow_origins).encode("latin-1")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                timings.add("total", time.perf_counter() - started)
+                message = {**message, "headers": [
+                    *message.get("headers", ()),
+                    (b"server-timing", timings.header().encode("latin-1", "replace")),
+                    # Lets the cross-origin frontend read the header
+                    (b"timing-allow-origin", self.timing_allow_origin)
+                ]}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            request_timings.reset(token)
 
 
 # Pydantic Models
+class ResponseMapping(BaseModel):
+    """Declarative description of where a merchant puts price and stock in its JSON
+    
+    Paths are dot-separated keys; a key ending in [] fans out over a list,
+    e.g. "a[].q" reads q from every element of a.
+    """
+    price_path: str = Field(..., min_length=1, max_length=200)
+    price_unit: Literal["dollar_string", "float", "microcents"]
+    stock_path: str = Field(..., min_length=1, max_length=200)
+    stock_rule: Literal["positive", "truthy", "any_positive"]
+    
+    @field_validator("price_path", "stock_path")
+    @classmethod
+    def validate_path(cls, path: str) -> str:
+        if any(not part or part == "[]" for part in path.split(".")):
+            raise ValueError(f"Invalid response path: {path!r}")
+        return path
+
+
 class APIEndpoint(BaseModel):
     id: Optional[int] = None
     name: str = Field(..., min_length=1, max_length=100)
     url: str = Field(..., min_length=1, max_length=500)
     is_active: bool = True
+    cache_ttl: Optional[float] = Field(None, ge=0)
+    response_mapping: Optional[ResponseMapping] = None
+    rate_limit_per_second: Optional[float] = Field(None, ge=0)
+    rate_limit_burst: Optional[int] = Field(None, ge=1)
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -27,10 +481,15 @@ class APIEndpointUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     url: Optional[str] = Field(None, min_length=1, max_length=500)
     is_active: Optional[bool] = None
+    cache_ttl: Optional[float] = Field(None, ge=0)
+    response_mapping: Optional[ResponseMapping] = None
+    rate_limit_per_second: Optional[float] = Field(None, ge=0)
+    rate_limit_burst: Optional[int] = Field(None, ge=1)
 
 
 class PriceComparisonRequest(BaseModel):
     upc: str = Field(..., min_length=1, max_length=50)
+    deadline_ms: Optional[int] = Field(None, ge=1, le=60000)
 
 
 class PriceResult(BaseModel):
@@ -39,6 +498,69 @@ class PriceResult(BaseModel):
     url: Optional[str] = None
     error: Optional[str] = None
     in_stock: Optional[bool] = None
+    cached: bool = False
+    cache_age: Optional[float] = None
+    pending: bool = False
+
+
+class PriceRecord:
+    """One merchant's answer inside the fetch, cache and compare pipeline
+    
+    A plain __slots__ object with the PriceResult fields: about a tenth of the
+    memory and a fifth of the allocations of the Pydantic model, and nothing
+    to validate on construction. It becomes a PriceResult only when a response
+    is serialized (see to_model).
+    """
+    
+    __slots__ = ("merchant", "price", "url", "error", "in_stock", "cached", "cache_age", "pending")
+    
+    def __init__(
+        self,
+        merchant: str,
+        price: Optional[float] = None,
+        url: Optional[str] = None,
+        error: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        cached: bool = False,
+        cache_age: Optional[float] = None,
+        pending: bool = False
+    ):
+        self.merchant = merchant
+        self.price = price
+        self.url = url
+        self.error = error
+        self.in_stock = in_stock
+        self.cached = cached
+        self.cache_age = cache_age
+        self.pending = pending
+    
+    def __repr__(self) -> str:
+        return f"PriceRecord({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+    
+    def as_cached(self, age: float) -> "PriceRecord":
+        return PriceRecord(self.merchant, self.price, self.url, self.error, self.in_stock, True, age, self.pending)
+    
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def to_model(self) -> PriceResult:
+        # Every field was set by our own code, so skip re-validating it
+        return PriceResult.model_construct(**{name: getattr(self, name) for name in self.__slots__})
+
+
+class PriceStreamEvent(BaseModel):
+    result: PriceResult
+    best_price: Optional[float]
+    best_merchant: Optional[str]
+    best_url: Optional[str]
+
+
+class BatchComparisonRequest(BaseModel):
+    upcs: List[Annotated[str, Field(min_length=1, max_length=50)]] = Field(
+        ..., min_length=1, max_length=BATCH_MAX_UPCS
+    )
+    max_concurrency: Optional[int] = Field(None, ge=1, le=BATCH_MAX_CONCURRENCY)
+    per_merchant_concurrency: Optional[int] = Field(None, ge=1, le=BATCH_MAX_CONCURRENCY)
 
 
 class PriceComparisonResponse(BaseModel):
@@ -48,15 +570,176 @@ class PriceComparisonResponse(BaseModel):
     best_merchant: Optional[str]
     best_url: Optional[str]
     comparison_time: str
+    partial: bool = False
+
+
+class WatchlistItem(BaseModel):
+    upc: str = Field(..., min_length=1, max_length=50)
+    popularity: float = Field(1.0, gt=0)
+
+
+class WatchlistUpdate(BaseModel):
+    items: List[WatchlistItem] = Field(..., min_length=1)
+
+
+class PriceObservation(BaseModel):
+    upc: str
+    merchant: str
+    price: float
+    in_stock: bool
+    observed_at: str
 
 
 # Database setup
-DATABASE_URL = "api_endpoints.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "api_endpoints.db")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "128"))
+
+# Column order used by every api_endpoints SELECT (see endpoint_from_row)
+ENDPOINT_COLUMNS = (
+    "id, name, url, is_active, created_at, updated_at, cache_ttl, response_mapping, "
+    "rate_limit_per_second, rate_limit_burst"
+)
+
+
+def endpoint_from_row(row) -> APIEndpoint:
+    """Build an APIEndpoint from a row selected with ENDPOINT_COLUMNS"""
+    return APIEndpoint(
+        id=row[0],
+        name=row[1],
+        url=row[2],
+        is_active=bool(row[3]),
+        created_at=row[4],
+        updated_at=row[5],
+        cache_ttl=row[6],
+        response_mapping=ResponseMapping.model_validate_json(row[7]) if row[7] else None,
+        rate_limit_per_second=row[8],
+        rate_limit_burst=row[9]
+    )
+
+
+async def ensure_column(db: aiosqlite.Connection, table: str, column: str, definition: str):
+    """Add a column to an existing table if an older database is missing it"""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    columns = [row[1] for row in await cursor.fetchall()]
+    if column not in columns:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def configure_connection(db: aiosqlite.Connection):
+    """Apply the per-connection pragmas every database connection should use"""
+    await db.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    await db.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+
+
+class TimedCursor:
+    """aiosqlite cursor whose fetches count towards the request's `sqlite` phase"""
+    
+    __slots__ = ("_cursor",)
+    
+    def __init__(self, cursor: aiosqlite.Cursor):
+        self._cursor = cursor
+    
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+    
+    async def fetchone(self):
+        with TimedPhase("sqlite"):
+            return await self._cursor.fetchone()
+    
+    async def fetchmany(self, *args):
+        with TimedPhase("sqlite"):
+            return await self._cursor.fetchmany(*args)
+    
+    async def fetchall(self):
+        with TimedPhase("sqlite"):
+            return await self._cursor.fetchall()
+
+
+class TimedConnection:
+    """Pooled aiosqlite connection handed to a request, timing its queries for Server-Timing
+    
+    Wraps the public execute/executemany/commit/rollback calls and the cursor
+    fetches; everything else goes straight to the connection.
+    """
+    
+    __slots__ = ("_db",)
+    
+    def __init__(self, db: aiosqlite.Connection):
+        self._db = db
+    
+    def __getattr__(self, name: str):
+        return getattr(self._db, name)
+    
+    async def execute(self, sql: str, parameters=None) -> TimedCursor:
+        with TimedPhase("sqlite"):
+            return TimedCursor(await self._db.execute(sql, parameters))
+    
+    async def executemany(self, sql: str, parameters) -> TimedCursor:
+        with TimedPhase("sqlite"):
+            return TimedCursor(await self._db.executemany(sql, parameters))
+    
+    async def commit(self):
+        with TimedPhase("sqlite"):
+            await self._db.commit()
+    
+    async def rollback(self):
+        with TimedPhase("sqlite"):
+            await self._db.rollback()
+
+
+class SQLitePool:
+    """Small pool of persistent aiosqlite connections
+    
+    Each aiosqlite connection owns a worker thread, so connections are opened
+    once at startup and reused across requests. Long-lived connections also
+    keep sqlite3's prepared statement cache warm.
+    """
+    
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._connections: List[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+    
+    async def open(self):
+        for _ in range(self.size):
+            db = await aiosqlite.connect(self.path, cached_statements=SQLITE_STATEMENT_CACHE)
+            await configure_connection(db)
+            self._connections.append(db)
+            self._idle.put_nowait(db)
+    
+    async def close(self):
+        for db in self._connections:
+            await db.close()
+        self._connections.clear()
+    
+    @asynccontextmanager
+    async def acquire(self):
+        db = await self._idle.get()
+        try:
+            # Only requests collect timings; background work gets the bare connection
+            yield TimedConnection(db) if request_timings.get() is not None else db
+        finally:
+            # Never hand the next request a connection with a half-finished transaction
+            if db.in_transaction:
+                await db.rollback()
+            self._idle.put_nowait(db)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"size": self.size, "idle": self._idle.qsize()}
 
 
 async def init_db():
     """Initialize the database with default API endpoints"""
     async with aiosqlite.connect(DATABASE_URL) as db:
+        # WAL lets the pooled connections read while another one writes
+        await db.execute("PRAGMA journal_mode = WAL")
+        await configure_connection(db)
+        # Every worker runs this at startup; the write lock keeps them from seeding twice
+        await db.execute("BEGIN IMMEDIATE")
         await db.execute("""
             CREATE TABLE IF NOT EXISTS api_endpoints (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,7 +747,50 @@ async def init_db():
                 url TEXT NOT NULL,
                 is_active BOOLEAN DEFAULT TRUE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                cache_ttl REAL,
+                response_mapping TEXT,
+                rate_limit_per_second REAL,
+                rate_limit_burst INTEGER
+            )
+        """)
+        await ensure_column(db, "api_endpoints", "cache_ttl", "REAL")
+        await ensure_column(db, "api_endpoints", "response_mapping", "TEXT")
+        await ensure_column(db, "api_endpoints", "rate_limit_per_second", "REAL")
+        await ensure_column(db, "api_endpoints", "rate_limit_burst", "INTEGER")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_api_endpoints_active ON api_endpoints (is_active)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_api_endpoints_created_at ON api_endpoints (created_at)")
+        # Change log polled by every worker to pick up edits made by the others
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS endpoint_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                endpoint_id INTEGER NOT NULL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # UPCs kept warm by the catalog refresh engine
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS watchlist (
+                upc TEXT PRIMARY KEY,
+                popularity REAL NOT NULL DEFAULT 1,
+                last_refreshed_at REAL,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS watchlist_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        await db.execute("INSERT OR IGNORE INTO watchlist_version (id, version) VALUES (1, 0)")
+        # Progress of the worker running the refresh engine, served by every worker
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS refresh_status (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                stats TEXT NOT NULL,
+                updated_at REAL NOT NULL
             )
         """)
         
@@ -90,22 +816,319 @@ async def init_db():
             ]
             
             for endpoint in default_endpoints:
+                mapping = BUILTIN_RESPONSE_MAPPINGS[endpoint["name"].lower()]
                 await db.execute("""
-                    INSERT INTO api_endpoints (name, url, is_active)
-                    VALUES (?, ?, ?)
+                    INSERT INTO api_endpoints (name, url, is_active, response_mapping)
+                    VALUES (?, ?, ?, ?)
                 """, (
                     endpoint["name"],
                     endpoint["url"],
-                    True
+                    True,
+                    mapping.model_dump_json()
                 ))
-            
-            await db.commit()
+        
+        await db.commit()
+
+
+# Active Endpoint Registry
+class RegisteredEndpoint:
+    """An active endpoint prepared for the compare hot path
+    
+    The URL template is pre-split around {upc} and the response mapping is
+    compiled once, so a compare does no database I/O or model construction.
+    """
+    
+    __slots__ = ("id", "name", "url", "cache_ttl", "rate_limit_per_second", "rate_limit_burst", "url_parts", "parser")
+    
+    def __init__(self, endpoint: APIEndpoint):
+        self.id = endpoint.id
+        self.name = endpoint.name
+        self.url = endpoint.url
+        self.cache_ttl = endpoint.cache_ttl
+        self.rate_limit_per_second = endpoint.rate_limit_per_second
+        self.rate_limit_burst = endpoint.rate_limit_burst
+        self.url_parts = tuple(endpoint.url.split("{upc}"))
+        self.parser = parser_registry.resolve(endpoint.name, endpoint.response_mapping)
+    
+    def render_url(self, upc: str) -> str:
+        return upc.join(self.url_parts)
+
+
+class EndpointRegistry:
+    """In-memory view of the active api_endpoints rows
+    
+    Loaded once at startup and kept current by the CRUD handlers. Every change
+    swaps in a new tuple, so readers always see a complete, consistent list.
+    """
+    
+    def __init__(self):
+        self._active: Tuple[RegisteredEndpoint, ...] = ()
+    
+    @property
+    def active(self) -> Tuple[RegisteredEndpoint, ...]:
+        return self._active
+    
+    async def load(self, db: aiosqlite.Connection):
+        cursor = await db.execute(
+            f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE is_active = TRUE ORDER BY id"
+        )
+        rows = await cursor.fetchall()
+        self._active = tuple(RegisteredEndpoint(endpoint_from_row(row)) for row in rows)
+    
+    def put(self, endpoint: APIEndpoint):
+        """Add or replace an endpoint, dropping it if it is no longer active"""
+        others = [e for e in self._active if e.id != endpoint.id]
+        if endpoint.is_active:
+            others.append(RegisteredEndpoint(endpoint))
+            others.sort(key=lambda e: e.id)
+        self._active = tuple(others)
+    
+    def remove(self, endpoint_id: int):
+        self._active = tuple(e for e in self._active if e.id != endpoint_id)
+
+
+endpoint_registry = EndpointRegistry()
+
+
+class EndpointSync:
+    """Propagate endpoint edits between worker processes
+    
+    CRUD handlers append the edited endpoint's id to endpoint_changes in the
+    same transaction as the edit. Every worker polls the log for versions it
+    has not seen, reloads those endpoints into its registry and drops their
+    breaker state (and cached prices, unless the cache is shared), so an edit
+    on one worker reaches the others within ENDPOINT_SYNC_INTERVAL.
+    """
+    
+    def __init__(self):
+        self.last_version = 0
+        self._own_versions: set = set()
+        self.applied = 0
+    
+    async def start(self, db: aiosqlite.Connection):
+        cursor = await db.execute("SELECT COALESCE(MAX(version), 0) FROM endpoint_changes")
+        self.last_version = (await cursor.fetchone())[0]
+    
+    async def record(self, db: aiosqlite.Connection, endpoint_id: int):
+        """Log a change; call inside the transaction that makes it"""
+        cursor = await db.execute("INSERT INTO endpoint_changes (endpoint_id) VALUES (?)", (endpoint_id,))
+        # This worker already applied the change itself
+        self._own_versions.add(cursor.lastrowid)
+    
+    async def poll(self, db: aiosqlite.Connection) -> int:
+        """Apply changes made by other workers since the last poll"""
+        cursor = await db.execute(
+            "SELECT version, endpoint_id FROM endpoint_changes WHERE version > ? ORDER BY version",
+            (self.last_version,)
+        )
+        rows = await cursor.fetchall()
+        changed = set()
+        for version, endpoint_id in rows:
+            self.last_version = version
+            if version in self._own_versions:
+                self._own_versions.discard(version)
+            else:
+                changed.add(endpoint_id)
+        
+        activated = []
+        for endpoint_id in changed:
+            cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
+            row = await cursor.fetchone()
+            if row is None:
+                endpoint_registry.remove(endpoint_id)
+            else:
+                endpoint = endpoint_from_row(row)
+                if endpoint.is_active and not any(e.id == endpoint_id and e.url == endpoint.url for e in endpoint_registry.active):
+                    activated.append(endpoint)
+                endpoint_registry.put(endpoint)
+            if not price_cache.shared:
+                price_cache.invalidate_endpoint(endpoint_id)
+            merchant_health.reset(endpoint_id)
+            merchant_prober.reset(endpoint_id)
+        if activated:
+            connection_prewarmer.schedule(activated)
+        self.applied += len(changed)
+        return len(changed)
+    
+    async def run(self, pool: "SQLitePool"):
+        while True:
+            await asyncio.sleep(ENDPOINT_SYNC_INTERVAL)
+            try:
+                async with pool.acquire() as db:
+                    await self.poll(db)
+                    # Keep an hour of history; workers poll every few seconds
+                    await db.execute("DELETE FROM endpoint_changes WHERE changed_at < datetime('now', '-1 hour')")
+                    await db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Endpoint change poll failed: %s", e)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self.last_version, "applied_from_other_workers": self.applied}
+
+
+endpoint_sync = EndpointSync()
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create the long-lived client session used for all merchant requests"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE,
+        limit_per_host=HTTP_POOL_SIZE_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TOTAL_TIMEOUT,
+        connect=HTTP_CONNECT_TIMEOUT,
+        sock_read=HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+# Connection Pre-warming
+def endpoint_origin(endpoint: RegisteredEndpoint) -> Optional[str]:
+    """scheme://host[:port] of an endpoint's URL template, or None if the host is templated"""
+    parts = urlsplit(endpoint.url)
+    if parts.scheme not in ("http", "https") or not parts.netloc or "{upc}" in parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class ConnectionPrewarmer:
+    """Open keep-alive connections to merchant hosts before compares need them
+    
+    Each host gets `connections` concurrent HEAD requests to its origin. The
+    responses are released, so DNS is cached and the TCP/TLS connections sit
+    idle in the shared pool for the first compare. The instance reports ready
+    once the startup pass is over, whether or not every host answered.
+    """
+    
+    def __init__(self, connections: int = PREWARM_CONNECTIONS, timeout: float = PREWARM_TIMEOUT):
+        # 0 means aiohttp does not limit connections per host
+        if HTTP_POOL_SIZE_PER_HOST > 0:
+            connections = min(connections, HTTP_POOL_SIZE_PER_HOST)
+        self.connections = max(0, connections)
+        self.timeout = timeout
+        self.ready = False
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+        self.passes = 0
+    
+    async def _open(self, session: aiohttp.ClientSession, origin: str) -> Optional[str]:
+        """One HEAD request; returns an error message or None"""
+        try:
+            async with session.head(origin, allow_redirects=False, timeout=client_timeout(self.timeout)) as response:
+                await response.read()
+        except asyncio.TimeoutError:
+            return "Request timeout"
+        except aiohttp.ClientError as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+    
+    async def warm_host(self, session: aiohttp.ClientSession, origin: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        errors = await asyncio.gather(*(self._open(session, origin) for _ in range(self.connections)))
+        failed = [error for error in errors if error is not None]
+        host = {
+            "connections": len(errors) - len(failed),
+            "error": failed[0] if failed else None,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "warmed_at": time.time()
+        }
+        self.hosts[origin] = host
+        if failed:
+            logger.warning("Pre-warming %s: %d of %d connections failed (%s)", origin, len(failed), len(errors), failed[0])
+        return host
+    
+    async def warm(self, session: aiohttp.ClientSession, endpoints) -> Dict[str, Dict[str, Any]]:
+        """Warm every distinct host of `endpoints` concurrently"""
+        origins = {origin for origin in map(endpoint_origin, endpoints) if origin is not None}
+        self.passes += 1
+        if not origins or self.connections == 0:
+            return {}
+        results = await asyncio.gather(*(self.warm_host(session, origin) for origin in sorted(origins)))
+        # Drop hosts that no active endpoint uses any more
+        current = origins | {endpoint_origin(endpoint) for endpoint in endpoint_registry.active}
+        self.hosts = {origin: host for origin, host in self.hosts.items() if origin in current}
+        return dict(zip(sorted(origins), results))
+    
+    async def _startup(self, endpoints):
+        try:
+            await self.warm(self.session, endpoints)
+        finally:
+            self.ready = True
+    
+    def start(self, session: aiohttp.ClientSession, endpoints) -> asyncio.Task:
+        """Warm the active endpoints in the background; readiness follows when done"""
+        self.session = session
+        self.ready = False
+        return spawn_background(self._startup(endpoints))
+    
+    def schedule(self, endpoints):
+        """Warm newly created or re-activated endpoints without delaying the caller"""
+        if self.session is not None and not self.session.closed:
+            spawn_background(self.warm(self.session, endpoints))
+    
+    def stop(self):
+        self.session = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "connections_per_host": self.connections,
+            "passes": self.passes,
+            "hosts": self.hosts
+        }
+
+
+connection_prewarmer = ConnectionPrewarmer()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    log_listener.start()
     await init_db()
-    yield
+    app.state.db_pool = SQLitePool(DATABASE_URL, SQLITE_POOL_SIZE)
+    await app.state.db_pool.open()
+    async with app.state.db_pool.acquire() as db:
+        await endpoint_sync.start(db)
+        await endpoint_registry.load(db)
+    endpoint_sync_task = asyncio.create_task(endpoint_sync.run(app.state.db_pool))
+    warm_snapshot = load_warm_snapshot() if WARM_SNAPSHOT_ENABLED else None
+    app.state.http_session = create_http_session()
+    if price_cache.shared:
+        price_cache.start()
+    if PRICE_HISTORY_ENABLED:
+        await price_history.start()
+        app.state.history_pool = SQLitePool(PRICE_HISTORY_DATABASE_URL, SQLITE_POOL_SIZE)
+        await app.state.history_pool.open()
+    if PREWARM_ENABLED:
+        connection_prewarmer.start(app.state.http_session, endpoint_registry.active)
+    else:
+        connection_prewarmer.ready = True
+    if PROBE_ENABLED:
+        merchant_prober.start(app.state.http_session)
+    if REFRESH_ENABLED:
+        await catalog_refresher.start(app.state.http_session, app.state.db_pool)
+    try:
+        yield
+    finally:
+        await merchant_prober.stop()
+        connection_prewarmer.stop()
+        await catalog_refresher.stop(app.state.db_pool)
+        if WARM_SNAPSHOT_ENABLED:
+            await save_warm_snapshot(warm_snapshot)
+        # Nothing may still be using the session or the pools once they are closed
+        await cancel_and_wait([endpoint_sync_task, *_background_tasks])
+        if price_cache.shared:
+            await price_cache.stop()
+        await app.state.http_session.close()
+        if PRICE_HISTORY_ENABLED:
+            await app.state.history_pool.close()
+            await price_history.stop()
+        await app.state.db_pool.close()
+        log_listener.stop()
 
 
 # FastAPI app
@@ -117,89 +1140,95 @@ app = FastAPI(
 )
 
 # CORS middleware
+CORS_ORIGINS = ["http://localhost:3010", "http://127.0.0.1:3010"]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3010", "http://127.0.0.1:3010"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware, allow_origins=CORS_ORIGINS)
 
 
 # Database dependency
-async def get_db():
-    async with aiosqlite.connect(DATABASE_URL) as db:
+async def get_db(request: Request):
+    async with request.app.state.db_pool.acquire() as db:
         yield db
 
 
+# HTTP session dependency
+async def get_http_session(request: Request) -> aiohttp.ClientSession:
+    return request.app.state.http_session
+
+
 # API Endpoints CRUD Operations
 @app.get("/api/endpoints", response_model=List[APIEndpoint])
 async def get_endpoints(db: aiosqlite.Connection = Depends(get_db)):
     """Get all API endpoints"""
-    cursor = await db.execute("SELECT * FROM api_endpoints ORDER BY created_at DESC")
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints ORDER BY created_at DESC")
     rows = await cursor.fetchall()
     
     endpoints = []
     for row in rows:
-        endpoint = APIEndpoint(
-            id=row[0],
-            name=row[1],
-            url=row[2],
-            is_active=bool(row[3]),
-            created_at=row[4],
-            updated_at=row[5]
-        )
-        endpoints.append(endpoint)
+        endpoints.append(endpoint_from_row(row))
     
     return endpoints
 
 
+# Declared before /api/endpoints/{endpoint_id} so "health" is not taken for an id
+@app.get("/api/endpoints/health")
+async def get_endpoints_health(db: aiosqlite.Connection = Depends(get_db)):
+    """Canary probe statistics per endpoint (null until an active endpoint is first probed)"""
+    cursor = await db.execute("SELECT id, name, is_active FROM api_endpoints ORDER BY id")
+    rows = await cursor.fetchall()
+    return [
+        {"id": row[0], "name": row[1], "is_active": bool(row[2]), "probe": merchant_prober.stats(row[0])}
+        for row in rows
+    ]
+
+
 @app.get("/api/endpoints/{endpoint_id}", response_model=APIEndpoint)
 async def get_endpoint(endpoint_id: int, db: aiosqlite.Connection = Depends(get_db)):
     """Get a specific API endpoint"""
-    cursor = await db.execute("SELECT * FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
     row = await cursor.fetchone()
     
     if not row:
         raise HTTPException(status_code=404, detail="Endpoint not found")
     
-    return APIEndpoint(
-        id=row[0],
-        name=row[1],
-        url=row[2],
-        is_active=bool(row[3]),
-        created_at=row[4],
-        updated_at=row[5]
-    )
+    return endpoint_from_row(row)
 
 
 @app.post("/api/endpoints", response_model=APIEndpoint)
 async def create_endpoint(endpoint: APIEndpoint, db: aiosqlite.Connection = Depends(get_db)):
     """Create a new API endpoint"""
     cursor = await db.execute("""
-        INSERT INTO api_endpoints (name, url, is_active)
-        VALUES (?, ?, ?)
+        INSERT INTO api_endpoints (name, url, is_active, cache_ttl, response_mapping, rate_limit_per_second, rate_limit_burst)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (
         endpoint.name,
         endpoint.url,
-        endpoint.is_active
+        endpoint.is_active,
+        endpoint.cache_ttl,
+        endpoint.response_mapping.model_dump_json() if endpoint.response_mapping else None,
+        endpoint.rate_limit_per_second,
+        endpoint.rate_limit_burst
     ))
-    
-    await db.commit()
     endpoint_id = cursor.lastrowid
+    await endpoint_sync.record(db, endpoint_id)
+    await db.commit()
     
     # Fetch the created endpoint
-    cursor = await db.execute("SELECT * FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
     row = await cursor.fetchone()
     
-    return APIEndpoint(
-        id=row[0],
-        name=row[1],
-        url=row[2],
-        is_active=bool(row[3]),
-        created_at=row[4],
-        updated_at=row[5]
-    )
+    created = endpoint_from_row(row)
+    endpoint_registry.put(created)
+    if created.is_active:
+        connection_prewarmer.schedule([created])
+    return created
 
 
 @app.put("/api/endpoints/{endpoint_id}", response_model=APIEndpoint)
@@ -210,20 +1239,20 @@ async def update_endpoint(
 ):
     """Update an existing API endpoint"""
     # Check if endpoint exists
-    cursor = await db.execute("SELECT * FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
     existing = await cursor.fetchone()
     
     if not existing:
         raise HTTPException(status_code=404, detail="Endpoint not found")
+    previous = endpoint_from_row(existing)
     
-    # Prepare update data
-    update_data = {}
-    if endpoint_update.name is not None:
-        update_data["name"] = endpoint_update.name
-    if endpoint_update.url is not None:
-        update_data["url"] = endpoint_update.url
-    if endpoint_update.is_active is not None:
-        update_data["is_active"] = endpoint_update.is_active
+    # Prepare update data: only the fields sent, so an explicit null clears an optional setting
+    update_data = endpoint_update.model_dump(exclude_unset=True)
+    for key in ("name", "url", "is_active"):
+        if key in update_data and update_data[key] is None:
+            raise HTTPException(status_code=400, detail=f"{key} cannot be null")
+    if endpoint_update.response_mapping is not None:
+        update_data["response_mapping"] = endpoint_update.response_mapping.model_dump_json()
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
@@ -240,33 +1269,39 @@ async def update_endpoint(
     
     query = f"UPDATE api_endpoints SET {', '.join(set_clauses)} WHERE id = ?"
     await db.execute(query, values)
+    await endpoint_sync.record(db, endpoint_id)
     await db.commit()
     
     # Fetch updated endpoint
-    cursor = await db.execute("SELECT * FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
     row = await cursor.fetchone()
     
-    return APIEndpoint(
-        id=row[0],
-        name=row[1],
-        url=row[2],
-        is_active=bool(row[3]),
-        created_at=row[4],
-        updated_at=row[5]
-    )
+    updated = endpoint_from_row(row)
+    endpoint_registry.put(updated)
+    await price_cache.invalidate_endpoint_async(endpoint_id)
+    merchant_health.reset(endpoint_id)
+    merchant_prober.reset(endpoint_id)
+    if updated.is_active and (not previous.is_active or updated.url != previous.url):
+        connection_prewarmer.schedule([updated])
+    return updated
 
 
 @app.delete("/api/endpoints/{endpoint_id}")
 async def delete_endpoint(endpoint_id: int, db: aiosqlite.Connection = Depends(get_db)):
     """Delete an API endpoint"""
-    cursor = await db.execute("SELECT * FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
     existing = await cursor.fetchone()
     
     if not existing:
         raise HTTPException(status_code=404, detail="Endpoint not found")
     
     await db.execute("DELETE FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    await endpoint_sync.record(db, endpoint_id)
     await db.commit()
+    endpoint_registry.remove(endpoint_id)
+    await price_cache.invalidate_endpoint_async(endpoint_id)
+    merchant_health.reset(endpoint_id)
+    merchant_prober.reset(endpoint_id)
     
     return {"message": "Endpoint deleted successfully"}
 
@@ -285,202 +1320,3166 @@ async def toggle_endpoint(endpoint_id: int, db: aiosqlite.Connection = Depends(g
         "UPDATE api_endpoints SET is_active = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
         (new_status, endpoint_id)
     )
+    await endpoint_sync.record(db, endpoint_id)
     await db.commit()
     
+    cursor = await db.execute(f"SELECT {ENDPOINT_COLUMNS} FROM api_endpoints WHERE id = ?", (endpoint_id,))
+    toggled = endpoint_from_row(await cursor.fetchone())
+    endpoint_registry.put(toggled)
+    await price_cache.invalidate_endpoint_async(endpoint_id)
+    merchant_health.reset(endpoint_id)
+    merchant_prober.reset(endpoint_id)
+    if new_status:
+        connection_prewarmer.schedule([toggled])
+    
     return {"message": f"Endpoint {'activated' if new_status else 'deactivated'} successfully"}
 
 
-# Price Comparison Service
-async def fetch_price_from_api(session: aiohttp.ClientSession, endpoint: APIEndpoint, upc: str) -> PriceResult:
-    """Fetch price from a single API endpoint"""
-    try:
-        # Replace UPC placeholder in URL
-        url = endpoint.url.replace("{upc}", upc)
+# Price Result Cache
+class PriceCache:
+    """Bounded LRU cache of merchant price results keyed by (endpoint id, UPC)
+    
+    Each entry carries its own TTL. Once expired an entry may still be served
+    as stale for stale_ttl seconds while a fresh fetch runs in the background.
+    """
+    
+    # Entries live in this process only
+    shared = False
+    
+    def __init__(
+        self,
+        max_entries: int,
+        stale_ttl: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        # (endpoint_id, upc) -> (result, stored_at, expires_at)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[PriceRecord, float, float]]" = OrderedDict()
+        self._keys_by_endpoint: Dict[int, set] = {}
+        # Bumped on invalidation so fetches started before an edit cannot repopulate the cache
+        self._generations: Dict[int, int] = {}
+        # Entries saved by the previous process, looked up on a miss (see WarmSnapshot)
+        self.snapshot: Optional["WarmSnapshot"] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def generation(self, endpoint_id: int) -> int:
+        return self._generations.get(endpoint_id, 0)
+    
+    # Async variants used on the request path; SharedPriceCache runs these off the event loop
+    async def generation_async(self, endpoint_id: int) -> int:
+        return self.generation(endpoint_id)
+    
+    async def get_async(self, endpoint_id: int, upc: str) -> Optional[Tuple[PriceRecord, float, bool]]:
+        return self.get(endpoint_id, upc)
+    
+    async def set_async(self, endpoint_id: int, upc: str, result: PriceRecord, ttl: float, generation: Optional[int] = None):
+        self.set(endpoint_id, upc, result, ttl, generation)
+    
+    async def invalidate_endpoint_async(self, endpoint_id: int):
+        self.invalidate_endpoint(endpoint_id)
+    
+    def get(self, endpoint_id: int, upc: str) -> Optional[Tuple[PriceRecord, float, bool]]:
+        """Return (result, age in seconds, is_fresh), or None on a miss"""
+        key = (endpoint_id, upc)
+        entry = self._entries.get(key)
+        if entry is None and self.snapshot is not None:
+            entry = self._restore(key)
+        if entry is None:
+            self.misses += 1
+            return None
         
-        # Log the URL being requested
-        print(f"[PRICE_FETCH] Requesting URL for {endpoint.name}: {url}")
+        result, stored_at, expires_at = entry
+        now = self._clock()
+        if now >= expires_at + self.stale_ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
         
-        # Make API request with timeout
-        async with session.get(url, timeout=10) as response:
-            if response.status == 200:
-                data = await response.json()
-                
-                # Parse response based on endpoint type
-                price, in_stock = parse_api_response(endpoint.name, data)
-                
-                if price is not None and in_stock:
-                    result = PriceResult(
-                        merchant=endpoint.name,
-                        price=price,
-                        url=url,
-                        in_stock=True
-                    )
-                    print(f"[PRICE_RESULT] {endpoint.name}: SUCCESS - Price: ${price:.2f}, In Stock: {in_stock}")
-                    return result
-                elif price is not None and not in_stock:
-                    result = PriceResult(
-                        merchant=endpoint.name,
-                        price=price,
-                        url=url,
-                        in_stock=False,
-                        error="Out of stock"
-                    )
-                    print(f"[PRICE_RESULT] {endpoint.name}: OUT OF STOCK - Price: ${price:.2f}")
-                    return result
+        self._entries.move_to_end(key)
+        if now < expires_at:
+            self.hits += 1
+            return result, now - stored_at, True
+        self.stale_hits += 1
+        return result, now - stored_at, False
+    
+    def set(self, endpoint_id: int, upc: str, result: PriceRecord, ttl: float, generation: Optional[int] = None):
+        """Store a result unless the endpoint was invalidated since `generation` was read"""
+        if generation is not None and generation != self.generation(endpoint_id):
+            return
+        
+        key = (endpoint_id, upc)
+        now = self._clock()
+        self._entries[key] = (result, now, now + ttl)
+        self._entries.move_to_end(key)
+        self._keys_by_endpoint.setdefault(endpoint_id, set()).add(upc)
+        
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+    
+    def invalidate_endpoint(self, endpoint_id: int):
+        """Drop every cached result for an endpoint"""
+        self._generations[endpoint_id] = self.generation(endpoint_id) + 1
+        for upc in self._keys_by_endpoint.pop(endpoint_id, set()):
+            self._entries.pop((endpoint_id, upc), None)
+        if self.snapshot is not None:
+            self.snapshot.forget(endpoint_id)
+    
+    def _restore(self, key: Tuple[int, str]) -> Optional[Tuple[PriceRecord, float, float]]:
+        if self.snapshot.closed:
+            self.snapshot = None
+            return None
+        saved = self.snapshot.price(*key)
+        if saved is None:
+            return None
+        result, age, remaining_ttl = saved
+        now = self._clock()
+        self.set(key[0], key[1], result, remaining_ttl)
+        self._entries[key] = entry = (result, now - age, now + remaining_ttl)
+        return entry
+    
+    def export(self, limit: int) -> List[Tuple[int, str, PriceRecord, float, float]]:
+        """Up to `limit` usable entries, most recently used first, as (endpoint_id, upc, result, age, remaining_ttl)"""
+        now = self._clock()
+        exported = []
+        for (endpoint_id, upc), (result, stored_at, expires_at) in reversed(self._entries.items()):
+            if len(exported) >= limit:
+                break
+            if now < expires_at + self.stale_ttl:
+                exported.append((endpoint_id, upc, result, now - stored_at, expires_at - now))
+        return exported
+    
+    def clear(self):
+        for endpoint_id in list(self._keys_by_endpoint):
+            self.invalidate_endpoint(endpoint_id)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _remove(self, key: Tuple[int, str]):
+        self._entries.pop(key, None)
+        upcs = self._keys_by_endpoint.get(key[0])
+        if upcs is not None:
+            upcs.discard(key[1])
+            if not upcs:
+                del self._keys_by_endpoint[key[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+def price_record_from_json(data: str) -> PriceRecord:
+    values = json.loads(data)
+    # Entries written before the compact row format are PriceResult objects
+    return PriceRecord(**values) if isinstance(values, dict) else PriceRecord(*values)
+
+
+class SharedPriceCache:
+    """PriceCache with the same interface, stored in SQLite so all workers share it
+    
+    Used when running several worker processes. Generations are stored next
+    to the entries, so an invalidation by any worker also stops in-flight
+    fetches on the other workers from writing back old results. The async
+    variants run on one dedicated thread so the event loop never waits on the
+    file. The cache is best effort: if the database is busy for longer than
+    PRICE_CACHE_BUSY_TIMEOUT_MS, lookups count as misses and writes are
+    skipped. Every PRICE_CACHE_PRUNE_INTERVAL seconds a background task drops
+    expired entries and evicts the oldest beyond max_entries.
+    """
+    
+    shared = True
+    # Entries already outlive the process, so nothing is snapshotted or restored
+    snapshot = None
+    
+    def __init__(self, path: str, max_entries: int, stale_ttl: float, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        # Wall-clock time, since entries are compared across processes
+        self._clock = clock
+        self._db = sqlite3.connect(
+            path, timeout=PRICE_CACHE_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS price_cache_entries (
+                endpoint_id INTEGER NOT NULL,
+                upc TEXT NOT NULL,
+                result TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (endpoint_id, upc)
+            );
+            CREATE INDEX IF NOT EXISTS idx_price_cache_entries_stored_at ON price_cache_entries (stored_at);
+            CREATE TABLE IF NOT EXISTS price_cache_generations (
+                endpoint_id INTEGER PRIMARY KEY,
+                generation INTEGER NOT NULL
+            );
+        """)
+        # One thread owns the async calls; the lock also covers sync calls made from the loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-cache")
+        self._lock = threading.Lock()
+        self._prune_task: Optional[asyncio.Task] = None
+        # Refreshed by each prune on the cache thread, so stats and scrapes never count rows on the loop
+        self.entries = len(self)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+    
+    async def _call(self, function: Callable, *args) -> Any:
+        with TimedPhase("sqlite"):
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+    
+    async def generation_async(self, endpoint_id: int) -> int:
+        return await self._call(self.generation, endpoint_id)
+    
+    async def get_async(self, endpoint_id: int, upc: str) -> Optional[Tuple[PriceRecord, float, bool]]:
+        return await self._call(self.get, endpoint_id, upc)
+    
+    async def set_async(self, endpoint_id: int, upc: str, result: PriceRecord, ttl: float, generation: Optional[int] = None):
+        await self._call(self.set, endpoint_id, upc, result, ttl, generation)
+    
+    async def invalidate_endpoint_async(self, endpoint_id: int):
+        await self._call(self.invalidate_endpoint, endpoint_id)
+    
+    def start(self):
+        self._prune_task = asyncio.create_task(self._prune_periodically())
+    
+    async def stop(self):
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            try:
+                await self._prune_task
+            except asyncio.CancelledError:
+                pass
+            self._prune_task = None
+    
+    async def _prune_periodically(self):
+        while True:
+            await asyncio.sleep(PRICE_CACHE_PRUNE_INTERVAL)
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.prune)
+    
+    def generation(self, endpoint_id: int) -> int:
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT generation FROM price_cache_generations WHERE endpoint_id = ?", (endpoint_id,)
+                ).fetchone()
+        except sqlite3.OperationalError:
+            self.errors += 1
+            return -1
+        return row[0] if row else 0
+    
+    def get(self, endpoint_id: int, upc: str) -> Optional[Tuple[PriceRecord, float, bool]]:
+        """Return (result, age in seconds, is_fresh), or None on a miss"""
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT result, stored_at, expires_at FROM price_cache_entries WHERE endpoint_id = ? AND upc = ?",
+                    (endpoint_id, upc)
+                ).fetchone()
+        except sqlite3.OperationalError:
+            self.errors += 1
+            row = None
+        now = self._clock()
+        if row is None or now >= row[2] + self.stale_ttl:
+            self.misses += 1
+            return None
+        
+        result, stored_at, expires_at = price_record_from_json(row[0]), row[1], row[2]
+        if now < expires_at:
+            self.hits += 1
+            return result, now - stored_at, True
+        self.stale_hits += 1
+        return result, now - stored_at, False
+    
+    def set(self, endpoint_id: int, upc: str, result: PriceRecord, ttl: float, generation: Optional[int] = None):
+        """Store a result unless the endpoint was invalidated since `generation` was read"""
+        if generation is not None and generation < 0:
+            return
+        now = self._clock()
+        values = (endpoint_id, upc, json.dumps(result.to_row()), now, now + ttl)
+        try:
+            with self._lock:
+                if generation is None:
+                    self._db.execute("INSERT OR REPLACE INTO price_cache_entries VALUES (?, ?, ?, ?, ?)", values)
                 else:
-                    result = PriceResult(
-                        merchant=endpoint.name,
-                        price=None,
-                        url=None,
-                        error="Invalid response format"
-                    )
-                    print(f"[PRICE_RESULT] {endpoint.name}: ERROR - Invalid response format")
-                    return result
-            else:
-                result = PriceResult(
-                    merchant=endpoint.name,
-                    price=None,
-                    url=None,
-                    error=f"HTTP {response.status}"
+                    # Checked and written in one statement, so a concurrent invalidation cannot slip in between
+                    self._db.execute("""
+                        INSERT OR REPLACE INTO price_cache_entries
+                        SELECT ?, ?, ?, ?, ?
+                        WHERE COALESCE((SELECT generation FROM price_cache_generations WHERE endpoint_id = ?), 0) = ?
+                    """, values + (endpoint_id, generation))
+        except sqlite3.OperationalError:
+            self.errors += 1
+    
+    def prune(self):
+        """Drop entries past their stale window, then the oldest ones beyond max_entries"""
+        try:
+            with self._lock:
+                self._db.execute(
+                    "DELETE FROM price_cache_entries WHERE expires_at + ? <= ?", (self.stale_ttl, self._clock())
                 )
-                print(f"[PRICE_RESULT] {endpoint.name}: ERROR - HTTP {response.status}")
-                return result
-                
-    except asyncio.TimeoutError:
-        result = PriceResult(
-            merchant=endpoint.name,
-            price=None,
-            url=None,
-            error="Request timeout"
-        )
-        print(f"[PRICE_RESULT] {endpoint.name}: ERROR - Request timeout")
-        return result
-    except Exception as e:
-        result = PriceResult(
-            merchant=endpoint.name,
-            price=None,
-            url=None,
-            error=str(e)
-        )
-        print(f"[PRICE_RESULT] {endpoint.name}: ERROR - Exception: {str(e)}")
-        return result
+                entries = self._db.execute("SELECT COUNT(*) FROM price_cache_entries").fetchone()[0]
+                excess = entries - self.max_entries
+                if excess > 0:
+                    self._db.execute("""
+                        DELETE FROM price_cache_entries WHERE rowid IN (
+                            SELECT rowid FROM price_cache_entries ORDER BY stored_at LIMIT ?
+                        )
+                    """, (excess,))
+                    self.evictions += excess
+                    entries -= excess
+                self.entries = entries
+        except sqlite3.OperationalError:
+            self.errors += 1
+    
+    def invalidate_endpoint(self, endpoint_id: int):
+        """Drop every cached result for an endpoint, for all workers"""
+        try:
+            with self._lock, self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("""
+                    INSERT INTO price_cache_generations (endpoint_id, generation) VALUES (?, 1)
+                    ON CONFLICT (endpoint_id) DO UPDATE SET generation = generation + 1
+                """, (endpoint_id,))
+                self._db.execute("DELETE FROM price_cache_entries WHERE endpoint_id = ?", (endpoint_id,))
+        except sqlite3.OperationalError as e:
+            self.errors += 1
+            logger.error("Failed to invalidate shared cache for endpoint %s: %s", endpoint_id, e)
+    
+    def clear(self):
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT endpoint_id FROM price_cache_entries").fetchall()
+        for (endpoint_id,) in rows:
+            self.invalidate_endpoint(endpoint_id)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM price_cache_entries").fetchone()[0]
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "backend": "sqlite",
+            # As of the last prune
+            "entries": self.entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
 
 
-def parse_api_response(merchant_name: str, data: dict) -> tuple[Optional[float], bool]:
-    """Parse API response based on merchant type"""
-    try:
-        if merchant_name.lower() == "appedia":
-            # Appedia format: {"price": "$4.77", "stock": 7}
-            price_str = data.get("price", "")
-            stock = data.get("stock", 0)
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key
+    
+    Waiters are shielded from the shared task, so cancelling one waiter never
+    cancels the call the others are waiting on.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    def in_flight(self, key: Any) -> bool:
+        return key in self._inflight
+    
+    async def do(self, key: Any, call: Callable[[], Any]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(call())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Any, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception so it is not reported as unhandled if every waiter left
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / calls, 4) if calls else 0.0
+        }
+
+
+if PRICE_CACHE_BACKEND == "sqlite":
+    price_cache = SharedPriceCache(
+        PRICE_CACHE_DATABASE_URL, max_entries=PRICE_CACHE_MAX_ENTRIES, stale_ttl=PRICE_CACHE_STALE_TTL
+    )
+else:
+    price_cache = PriceCache(max_entries=PRICE_CACHE_MAX_ENTRIES, stale_ttl=PRICE_CACHE_STALE_TTL)
+price_flights = SingleFlight()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks: set = set()
+
+
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def cancel_and_wait(tasks) -> None:
+    """Cancel tasks and wait until each has finished unwinding"""
+    tasks = [task for task in tasks if task is not None]
+    for task in tasks:
+        task.cancel()
+    # Already failed or cancelled tasks must not abort the shutdown
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# JSON helpers
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def render_model(model: BaseModel):
+    """Return a model as a pre-serialized JSON response in fast JSON mode
+    
+    Routes keep their response_model for the OpenAPI schema, but handing
+    FastAPI a ready Response skips its re-validation and jsonable_encoder pass.
+    """
+    if FAST_JSON_ENABLED:
+        return Response(content=model.model_dump_json(), media_type="application/json")
+    return model
+
+
+# Price History
+class PriceHistoryWriter:
+    """Record fresh merchant prices without making the compare path wait on disk
+    
+    record() only enqueues; a background task drains the queue in batched
+    transactions into price_history (append-only) and latest_prices (one row
+    per merchant and UPC). The same task periodically applies the retention
+    and downsampling policy. Rows are appended in time order, so rowid order
+    is observation order and old data is found without a full table scan.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=PRICE_HISTORY_QUEUE_SIZE)
+        self._db: Optional[aiosqlite.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        # Rows already taken off the queue but not yet committed
+        self._pending: List[tuple] = []
+        self._next_maintenance = 0.0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+    
+    def record(self, upc: str, endpoint_id: int, result: PriceRecord):
+        if result.price is None:
+            return
+        row = (upc, result.merchant, int(time.time()), result.price, int(bool(result.in_stock)), endpoint_id)
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # Shedding history is better than slowing down compares
+            self.dropped += 1
+    
+    async def start(self):
+        self._db = await aiosqlite.connect(self.path, cached_statements=SQLITE_STATEMENT_CACHE)
+        await self._db.execute("PRAGMA journal_mode = WAL")
+        await configure_connection(self._db)
+        await self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS price_history (
+                id INTEGER PRIMARY KEY,
+                upc TEXT NOT NULL,
+                merchant TEXT NOT NULL,
+                observed_at INTEGER NOT NULL,
+                price REAL NOT NULL,
+                in_stock INTEGER NOT NULL,
+                endpoint_id INTEGER
+            );
+            -- Covers history reads by UPC (optionally per merchant) in time order
+            CREATE INDEX IF NOT EXISTS idx_price_history_upc_merchant_time
+                ON price_history (upc, merchant, observed_at, price, in_stock);
             
-            # Parse price string (remove $ and convert to float)
-            if price_str and price_str.startswith("$"):
-                price = float(price_str[1:])
-                in_stock = stock > 0
-                return price, in_stock
-                
-        elif merchant_name.lower() == "micromazon":
-            # Micromazon format: {"available": true, "price": 5.67}
-            available = data.get("available", False)
-            price = data.get("price")
+            CREATE TABLE IF NOT EXISTS latest_prices (
+                merchant TEXT NOT NULL,
+                upc TEXT NOT NULL,
+                observed_at INTEGER NOT NULL,
+                price REAL NOT NULL,
+                in_stock INTEGER NOT NULL,
+                PRIMARY KEY (merchant, upc)
+            ) WITHOUT ROWID;
+            -- Covers a merchant's most recent prices (upc comes along as part of the key)
+            CREATE INDEX IF NOT EXISTS idx_latest_prices_merchant_time
+                ON latest_prices (merchant, observed_at, price, in_stock);
             
-            if price is not None and isinstance(price, (int, float)):
-                return float(price), available
-                
-        elif merchant_name.lower() == "googdit":
-            # Googdit format: {"a": [{"l": 8839, "q": 4}, {"l": 1292, "q": 0}], "p": 478000000}
-            price_microcents = data.get("p")
-            availability_array = data.get("a", [])
+            CREATE TABLE IF NOT EXISTS history_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        await self._db.commit()
+        self._next_maintenance = time.monotonic() + PRICE_HISTORY_MAINTENANCE_INTERVAL
+        self._write_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            # Never interrupt a transaction: cancel only once the current write is done
+            async with self._write_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is not None:
+            # Flush the batch being collected and whatever is still queued before shutting down
+            await self._write(self._pending)
+            self._pending = []
+            while not self._queue.empty():
+                await self._write(self._drain(PRICE_HISTORY_BATCH_SIZE))
+            await self._db.close()
+            self._db = None
+    
+    def _drain(self, limit: int) -> List[tuple]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+    
+    async def _run(self):
+        while True:
+            batch = self._pending = [await self._queue.get()]
+            flush_at = time.monotonic() + PRICE_HISTORY_FLUSH_INTERVAL
+            while len(batch) < PRICE_HISTORY_BATCH_SIZE:
+                batch.extend(self._drain(PRICE_HISTORY_BATCH_SIZE - len(batch)))
+                remaining = flush_at - time.monotonic()
+                if len(batch) >= PRICE_HISTORY_BATCH_SIZE or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
             
-            if price_microcents is not None:
-                # Convert microcents to dollars
-                price = price_microcents / 100000000.0
-                
-                # Check if in stock at any location
-                in_stock = any(item.get("q", 0) > 0 for item in availability_array)
-                
-                return price, in_stock
+            async with self._write_lock:
+                await self._write(batch)
+                self._pending = []
                 
-    except (ValueError, TypeError, KeyError) as e:
-        print(f"Error parsing {merchant_name} response: {e}")
+                if time.monotonic() >= self._next_maintenance:
+                    self._next_maintenance = time.monotonic() + PRICE_HISTORY_MAINTENANCE_INTERVAL
+                    try:
+                        await self.run_maintenance()
+                    except sqlite3.Error as e:
+                        self.errors += 1
+                        logger.error("Price history maintenance failed: %s", e)
+    
+    async def _write(self, batch: List[tuple]):
+        if not batch:
+            return
+        try:
+            await self._db.executemany("""
+                INSERT INTO price_history (upc, merchant, observed_at, price, in_stock, endpoint_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, batch)
+            await self._db.executemany("""
+                INSERT INTO latest_prices (merchant, upc, observed_at, price, in_stock)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (merchant, upc) DO UPDATE SET
+                    observed_at = excluded.observed_at,
+                    price = excluded.price,
+                    in_stock = excluded.in_stock
+                WHERE excluded.observed_at >= latest_prices.observed_at
+            """, [(row[1], row[0], row[2], row[3], row[4]) for row in batch])
+            await self._db.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.error("Failed to write %d price history observations: %s", len(batch), e)
+            if self._db.in_transaction:
+                await self._db.rollback()
+    
+    async def _first_id_at_or_after(self, observed_at: int) -> Optional[int]:
+        # Rows are appended in time order, so observed_at rises with id and the
+        # boundary can be binary-searched with rowid lookups instead of a scan
+        cursor = await self._db.execute("SELECT MIN(id), MAX(id) FROM price_history")
+        low, high = await cursor.fetchone()
+        if low is None:
+            return None
+        found = None
+        while low <= high:
+            middle = (low + high) // 2
+            # Deleted rows leave gaps, so probe the first row at or after the midpoint
+            cursor = await self._db.execute(
+                "SELECT id, observed_at FROM price_history WHERE id >= ? ORDER BY id LIMIT 1", (middle,)
+            )
+            row_id, row_observed_at = await cursor.fetchone()
+            if row_observed_at >= observed_at:
+                found = row_id
+                high = middle - 1
+            else:
+                low = row_id + 1
+        return found
+    
+    async def run_maintenance(self, now: Optional[int] = None):
+        """Apply retention, then downsample old rows to one per merchant, UPC and bucket"""
+        now = int(time.time()) if now is None else now
+        retention_cutoff = now - int(PRICE_HISTORY_RETENTION_DAYS * 86400)
+        downsample_cutoff = now - int(PRICE_HISTORY_DOWNSAMPLE_AFTER_DAYS * 86400)
         
-    return None, False
+        # Retention: everything before the first row inside the retention window
+        keep_from = await self._first_id_at_or_after(retention_cutoff)
+        if keep_from is None:
+            await self._db.execute("DELETE FROM price_history WHERE observed_at < ?", (retention_cutoff,))
+        else:
+            await self._db.execute("DELETE FROM price_history WHERE id < ?", (keep_from,))
+        await self._db.commit()
+        
+        # Downsampling: walk forward one day at a time from where the last run stopped
+        cursor = await self._db.execute("SELECT value FROM history_meta WHERE key = 'downsampled_through'")
+        row = await cursor.fetchone()
+        start = max(row[0] if row else retention_cutoff, retention_cutoff)
+        start -= start % PRICE_HISTORY_DOWNSAMPLE_BUCKET
+        end = downsample_cutoff - downsample_cutoff % PRICE_HISTORY_DOWNSAMPLE_BUCKET
+        
+        while start < end:
+            window_end = min(start + 86400, end)
+            low = await self._first_id_at_or_after(start)
+            high = await self._first_id_at_or_after(window_end)
+            if low is not None and low != high:
+                high = high if high is not None else low + 2 ** 62
+                await self._db.execute("""
+                    DELETE FROM price_history
+                    WHERE id >= :low AND id < :high AND id NOT IN (
+                        SELECT MAX(id) FROM price_history
+                        WHERE id >= :low AND id < :high
+                        GROUP BY upc, merchant, observed_at / :bucket
+                    )
+                """, {"low": low, "high": high, "bucket": PRICE_HISTORY_DOWNSAMPLE_BUCKET})
+            await self._db.execute(
+                "INSERT OR REPLACE INTO history_meta (key, value) VALUES ('downsampled_through', ?)",
+                (window_end,)
+            )
+            await self._db.commit()
+            start = window_end
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors
+        }
 
 
-@app.post("/api/compare", response_model=PriceComparisonResponse)
-async def compare_prices(
-    request: PriceComparisonRequest,
-    db: aiosqlite.Connection = Depends(get_db)
-):
-    """Compare prices across all active API endpoints"""
-    # Get active endpoints
-    cursor = await db.execute("SELECT * FROM api_endpoints WHERE is_active = TRUE")
-    rows = await cursor.fetchall()
+price_history = PriceHistoryWriter(PRICE_HISTORY_DATABASE_URL)
+
+
+# Price Analytics
+class PriceColumnStore:
+    """Append-only columnar copy of price_history for whole-catalog analytics
     
-    if not rows:
-        raise HTTPException(status_code=400, detail="No active API endpoints configured")
+    Each column is a flat little-endian binary file that sync() appends to
+    (new history rows are read in rowid order) and columns() maps read-only
+    with numpy.memmap, so a scan over tens of millions of observations only
+    touches the pages it needs. UPCs and merchants are stored as integer ids;
+    the id -> name dictionaries are append-only text files next to the columns.
+    """
     
-    endpoints = []
-    for row in rows:
-        endpoint = APIEndpoint(
-            id=row[0],
-            name=row[1],
-            url=row[2],
-            is_active=bool(row[3]),
-            created_at=row[4],
-            updated_at=row[5]
-        )
-        endpoints.append(endpoint)
+    COLUMNS = (
+        ("upc_id", "<i4"),
+        ("merchant_id", "<i2"),
+        ("observed_at", "<i8"),
+        ("price", "<f8"),
+        ("in_stock", "|u1")
+    )
     
-    # Fetch prices concurrently
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_price_from_api(session, endpoint, request.upc) for endpoint in endpoints]
-        results = await asyncio.gather(*tasks)
+    def __init__(self, directory: str, history_path: str, clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.history_path = history_path
+        self._clock = clock
+        self._upc_ids: Dict[str, int] = {}
+        self._merchant_ids: Dict[str, int] = {}
+        self._loaded_rows = -1
+        self._lock = threading.Lock()
+        self.synced_rows = 0
+        self.rebuilds = 0
     
-    # Find best price (only consider in-stock items)
-    valid_results = [r for r in results if r.price is not None and r.in_stock is True]
-    best_price = None
-    best_merchant = None
-    best_url = None
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
     
-    if valid_results:
-        best_result = min(valid_results, key=lambda x: x.price)
-        best_price = best_result.price
-        best_merchant = best_result.merchant
-        best_url = best_result.url
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"rows": 0, "last_id": 0, "built_at": None}
     
-    return PriceComparisonResponse(
-        upc=request.upc,
-        results=results,
-        best_price=best_price,
-        best_merchant=best_merchant,
-        best_url=best_url,
-        comparison_time=datetime.now().isoformat()
-    )
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp_path = self._path("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path("meta.json"))
+    
+    def _read_names(self, name: str) -> List[str]:
+        try:
+            with open(self._path(name), encoding="utf-8") as f:
+                return f.read().splitlines()
+        except OSError:
+            return []
+    
+    def _reset(self):
+        for name, _ in self.COLUMNS:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._path(f"{name}.bin"))
+        for name in ("upcs.txt", "merchants.txt", "meta.json"):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._path(name))
+        self._loaded_rows = -1
+        self.rebuilds += 1
+    
+    def sync(self) -> Dict[str, Any]:
+        """Append history rows added since the last sync (blocking; run it in a thread)"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._path("sync.lock"), "w") as lock_file:
+            # One writer across worker processes; readers never wait
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            meta = self._read_meta()
+            if meta["built_at"] is not None and self._clock() - meta["built_at"] >= PRICE_ANALYTICS_REBUILD_INTERVAL:
+                self._reset()
+                meta = self._read_meta()
+            if meta["built_at"] is None:
+                meta["built_at"] = self._clock()
+            if self._loaded_rows != meta["rows"]:
+                # Another process (or a rebuild) changed the dictionaries
+                self._upc_ids = {upc: i for i, upc in enumerate(self._read_names("upcs.txt"))}
+                self._merchant_ids = {name: i for i, name in enumerate(self._read_names("merchants.txt"))}
+            
+            history = sqlite3.connect(f"file:{self.history_path}?mode=ro", uri=True)
+            try:
+                cursor = history.execute(
+                    "SELECT id, upc, merchant, observed_at, price, in_stock FROM price_history WHERE id > ? ORDER BY id",
+                    (meta["last_id"],)
+                )
+                while True:
+                    rows = cursor.fetchmany(PRICE_ANALYTICS_SYNC_CHUNK)
+                    if not rows:
+                        break
+                    self._append(rows)
+                    meta["rows"] += len(rows)
+                    meta["last_id"] = rows[-1][0]
+                    self._write_meta(meta)
+            except sqlite3.OperationalError as e:
+                # No history recorded yet
+                logger.info("Price analytics sync skipped: %s", e)
+            finally:
+                history.close()
+            self._write_meta(meta)
+            self._loaded_rows = meta["rows"]
+            self.synced_rows = meta["rows"]
+            return meta
+    
+    def _append(self, rows: List[tuple]):
+        new_upcs: List[str] = []
+        new_merchants: List[str] = []
+        upc_ids = np.empty(len(rows), dtype="<i4")
+        merchant_ids = np.empty(len(rows), dtype="<i2")
+        for i, (_, upc, merchant, _, _, _) in enumerate(rows):
+            upc_id = self._upc_ids.get(upc)
+            if upc_id is None:
+                upc_id = self._upc_ids[upc] = len(self._upc_ids)
+                new_upcs.append(upc)
+            merchant_id = self._merchant_ids.get(merchant)
+            if merchant_id is None:
+                merchant_id = self._merchant_ids[merchant] = len(self._merchant_ids)
+                new_merchants.append(merchant)
+            upc_ids[i] = upc_id
+            merchant_ids[i] = merchant_id
+        
+        # Names are written before the rows that use them, so readers can always resolve an id
+        for name, names in (("upcs.txt", new_upcs), ("merchants.txt", new_merchants)):
+            if names:
+                with open(self._path(name), "a", encoding="utf-8") as f:
+                    f.write("".join(f"{value}\n" for value in names))
+        columns = {
+            "upc_id": upc_ids,
+            "merchant_id": merchant_ids,
+            "observed_at": np.fromiter((row[3] for row in rows), dtype="<i8", count=len(rows)),
+            "price": np.fromiter((row[4] for row in rows), dtype="<f8", count=len(rows)),
+            "in_stock": np.fromiter((row[5] for row in rows), dtype="|u1", count=len(rows))
+        }
+        for name, _ in self.COLUMNS:
+            with open(self._path(f"{name}.bin"), "ab") as f:
+                columns[name].tofile(f)
+    
+    def columns(self) -> Tuple[Dict[str, Any], List[str]]:
+        """Read-only memory maps of every column (same length), plus merchant names by id"""
+        rows = self._read_meta()["rows"]
+        for name, dtype in self.COLUMNS:
+            try:
+                size = os.path.getsize(self._path(f"{name}.bin"))
+            except OSError:
+                size = 0
+            # A sync may be appending right now: only expose rows every column has
+            rows = min(rows, size // np.dtype(dtype).itemsize)
+        merchants = self._read_names("merchants.txt")
+        columns = {}
+        for name, dtype in self.COLUMNS:
+            if rows == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(self._path(f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+        return columns, merchants
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.synced_rows, "rebuilds": self.rebuilds}
 
 
-@app.get("/api/health")
-async def health_check():
-    """Health check endpoint"""
+def compute_price_analytics(
+    columns: Dict[str, Any],
+    merchants: List[str],
+    since: int,
+    until: int,
+    bucket: int
+) -> Dict[str, Any]:
+    """Per-merchant price index, best-price share and volatility, plus price spread
+    
+    A comparison is one UPC within one time bucket, priced by each merchant's
+    last observation in that bucket. Only comparisons with at least two
+    in-stock merchants count towards the index, best-price share and spread.
+    Everything is computed with sorts and bincounts over whole columns.
+    """
+    observed_at = columns["observed_at"]
+    mask = (observed_at >= since) & (observed_at < until)
+    # The default window usually covers every row: skip the boolean-index copies then
+    selected = slice(None) if mask.all() else mask
+    merchant = columns["merchant_id"][selected]
+    price = np.asarray(columns["price"][selected])
+    in_stock = columns["in_stock"][selected].astype(bool)
+    bucket_index = (observed_at[selected] - since) // bucket
+    rows = len(price)
+    n_merchants = max(len(merchants), 1)
+    n_buckets = int(bucket_index.max()) + 1 if rows else 1
+    
+    # Key = (UPC, bucket, merchant), built in place to keep peak memory down
+    key = columns["upc_id"][selected].astype(np.int64)
+    key *= n_buckets
+    key += bucket_index
+    key *= n_merchants
+    key += merchant
+    observations = np.bincount(merchant, minlength=n_merchants)
+    del bucket_index, merchant
+    
+    # Last observation per key. Rows are in observation order, so sorting
+    # key * rows + row number (a plain sort of one int64 array, much faster
+    # than a stable argsort) puts each key's latest row last
+    if rows and int(key.max()) < np.iinfo(np.int64).max // rows - 1:
+        key *= rows
+        key += np.arange(rows)
+        key.sort()
+        sorted_key = key // rows
+        key -= sorted_key * rows
+        order = key
+    else:
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+    run_end = np.ones(rows, dtype=bool)
+    run_end[:-1] = sorted_key[1:] != sorted_key[:-1]
+    snapshot = order[run_end]
+    # Decode the sorted keys instead of gathering more columns by row number
+    snapshot_group = sorted_key[run_end] // n_merchants
+    snapshot_merchant = sorted_key[run_end] - snapshot_group * n_merchants
+    snapshot_upc = snapshot_group // n_buckets
+    snapshot_price = price[snapshot]
+    snapshot_in_stock = in_stock[snapshot]
+    distinct_upcs = int(np.count_nonzero(snapshot_upc[1:] != snapshot_upc[:-1]) + 1) if rows else 0
+    
+    # Volatility: coefficient of variation of each (UPC, merchant) bucketed price series.
+    # UPC ids are dense, so the pair id indexes a bincount directly
+    pair = snapshot_upc * n_merchants + snapshot_merchant
+    count = np.bincount(pair)
+    total = np.bincount(pair, weights=snapshot_price, minlength=len(count))
+    total_sq = np.bincount(pair, weights=snapshot_price * snapshot_price, minlength=len(count))
+    series = (count >= 2) & (total > 0)
+    mean = total[series] / count[series]
+    cv = np.sqrt(np.maximum(total_sq[series] / count[series] - mean * mean, 0)) / mean
+    series_merchant = np.flatnonzero(series) % n_merchants
+    volatility_sum = np.bincount(series_merchant, weights=cv, minlength=n_merchants)
+    volatility_count = np.bincount(series_merchant, minlength=n_merchants)
+    
+    # Comparisons: in-stock snapshot rows grouped by (UPC, bucket), already in key order
+    group = snapshot_group[snapshot_in_stock]
+    offer_merchant = snapshot_merchant[snapshot_in_stock]
+    offer_price = snapshot_price[snapshot_in_stock]
+    appearances = np.zeros(n_merchants, dtype=np.int64)
+    wins = np.zeros(n_merchants, dtype=np.int64)
+    relative_sum = np.zeros(n_merchants)
+    spread = relative_spread = np.empty(0)
+    if len(group):
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        sizes = np.diff(np.r_[starts, len(group)])
+        group_min = np.minimum.reduceat(offer_price, starts)
+        group_max = np.maximum.reduceat(offer_price, starts)
+        group_mean = np.add.reduceat(offer_price, starts) / sizes
+        row_group = np.repeat(np.arange(len(starts)), sizes)
+        contested = (sizes >= 2)[row_group]
+        best = contested & (offer_price <= group_min[row_group])
+        appearances = np.bincount(offer_merchant[contested], minlength=n_merchants)
+        wins = np.bincount(offer_merchant[best], minlength=n_merchants)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = offer_price / group_mean[row_group]
+        relative_sum = np.bincount(
+            offer_merchant[contested], weights=np.nan_to_num(relative[contested]), minlength=n_merchants
+        )
+        contested_groups = sizes >= 2
+        spread = (group_max - group_min)[contested_groups]
+        positive = group_min[contested_groups] > 0
+        relative_spread = spread[positive] / group_min[contested_groups][positive]
+    
+    def summary(values) -> Optional[Dict[str, float]]:
+        if not len(values):
+            return None
+        median, p90 = np.percentile(values, [50, 90])
+        return {"mean": round(float(values.mean()), 4), "median": round(float(median), 4), "p90": round(float(p90), 4)}
+    
+    merchant_stats = []
+    for merchant_id, name in enumerate(merchants):
+        if not observations[merchant_id]:
+            continue
+        compared = int(appearances[merchant_id])
+        merchant_stats.append({
+            "merchant": name,
+            "observations": int(observations[merchant_id]),
+            "comparisons": compared,
+            "best_price_wins": int(wins[merchant_id]),
+            "best_price_share": round(float(wins[merchant_id]) / compared, 4) if compared else None,
+            # 100 = priced at the comparison average; 95 = 5% cheaper on average
+            "price_index": round(100 * float(relative_sum[merchant_id]) / compared, 2) if compared else None,
+            "volatility": round(float(volatility_sum[merchant_id]) / int(volatility_count[merchant_id]), 4)
+                if volatility_count[merchant_id] else None
+        })
+    
     return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "service": "Price Comparison Tool API"
+        "observations": rows,
+        "upcs": distinct_upcs,
+        "comparisons": int(len(spread)),
+        "spread": summary(spread),
+        "relative_spread": summary(relative_spread),
+        "merchants": merchant_stats
     }
 
 
-@app.get("/")
-async def root():
-    """Root endpoint with API information"""
-    return {
-        "name": "Price Comparison Tool API",
-        "version": "1.0.0",
-        "documentation": "/docs",
-        "health": "/api/health"
-    }
+price_columns = PriceColumnStore(PRICE_ANALYTICS_DIR, PRICE_HISTORY_DATABASE_URL)
 
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+# Merchant Health: Circuit Breaker and Adaptive Timeouts
+def client_timeout(seconds: float) -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(
+        total=seconds,
+        connect=min(HTTP_CONNECT_TIMEOUT, seconds),
+        sock_read=seconds,
+    )
+
+
+class MerchantHealth:
+    """Circuit breaker and latency tracker for one endpoint
+    
+    The breaker opens once the failure rate over the last `window` requests
+    reaches `failure_rate`, rejects requests for `open_seconds`, then lets
+    `half_open_probes` requests through; a successful probe closes it again.
+    The request timeout follows the merchant's observed p99 latency.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        window: int = BREAKER_WINDOW,
+        min_requests: int = BREAKER_MIN_REQUESTS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.min_requests = min_requests
+        self.failure_threshold = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self.state = self.CLOSED
+        self._outcomes: deque = deque(maxlen=window)  # True for a failed request
+        self._latencies: deque = deque(maxlen=ADAPTIVE_TIMEOUT_WINDOW)
+        self._samples_since_update = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._default_timeout = client_timeout(HTTP_TOTAL_TIMEOUT)
+        self._timeout = self._default_timeout
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+    
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if self._clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        self.requests += 1
+        return True
+    
+    def request_timeout(self) -> aiohttp.ClientTimeout:
+        # Probes get the full timeout so a merchant that became slower can still recover
+        if self.state == self.HALF_OPEN:
+            return self._default_timeout
+        return self._timeout
+    
+    def record_success(self, latency: float):
+        self._outcomes.append(False)
+        if self.state == self.HALF_OPEN:
+            self._close()
+        self._add_latency(latency)
+    
+    def record_failure(self):
+        self.failures += 1
+        self._outcomes.append(True)
+        if self.state == self.HALF_OPEN:
+            self._open()
+        elif (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= self.min_requests
+            and self.failure_rate() >= self.failure_threshold
+        ):
+            self._open()
+    
+    def release(self):
+        """Give back a half-open probe slot for a request that was abandoned"""
+        if self.state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+    
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+    
+    def _add_latency(self, latency: float):
+        self._latencies.append(latency)
+        self._samples_since_update += 1
+        # Re-sorting the window on every sample is wasteful; refresh every few samples
+        if self._samples_since_update >= 10:
+            self._update_timeout()
+    
+    def _update_timeout(self):
+        if len(self._latencies) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return
+        self._samples_since_update = 0
+        if ADAPTIVE_TIMEOUT_ENABLED:
+            seconds = self.latency_percentile(0.99) * ADAPTIVE_TIMEOUT_MULTIPLIER
+            self._timeout = client_timeout(min(max(seconds, ADAPTIVE_TIMEOUT_MIN), HTTP_TOTAL_TIMEOUT))
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Outcome and latency windows and breaker state, for the warm-restart snapshot"""
+        return {
+            "state": self.state,
+            "open_for": self._clock() - self._opened_at if self.state != self.CLOSED else None,
+            "outcomes": list(self._outcomes),
+            "latencies": list(self._latencies)
+        }
+    
+    def restore_state(self, state: Dict[str, Any], elapsed: float):
+        """Resume from export_state() saved `elapsed` seconds ago"""
+        self._outcomes.extend(state["outcomes"])
+        self._latencies.extend(state["latencies"])
+        self._update_timeout()
+        if state["state"] != self.CLOSED:
+            # Still open if the open period has not run out; otherwise the next request is a probe
+            self.state = self.OPEN
+            self._opened_at = self._clock() - state["open_for"] - elapsed
+    
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self.times_opened += 1
+    
+    def _close(self):
+        # Forget the outage: old failures and pre-outage latencies no longer describe the merchant
+        self.state = self.CLOSED
+        self._outcomes.clear()
+        self._latencies.clear()
+        self._samples_since_update = 0
+        self._timeout = self._default_timeout
+    
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5)
+        p99 = self.latency_percentile(0.99)
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 4),
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout_seconds": round(self._timeout.total, 3)
+        }
+
+
+class MerchantHealthBoard:
+    """MerchantHealth for every endpoint, created on first use"""
+    
+    def __init__(self):
+        self._health: Dict[int, MerchantHealth] = {}
+        self.snapshot: Optional["WarmSnapshot"] = None
+    
+    def get(self, endpoint_id: int) -> MerchantHealth:
+        health = self._health.get(endpoint_id)
+        if health is None:
+            health = self._health[endpoint_id] = MerchantHealth()
+            if self.snapshot is not None:
+                saved = self.snapshot.health(endpoint_id)
+                if saved is not None:
+                    health.restore_state(*saved)
+        return health
+    
+    def peek(self, endpoint_id: int) -> Optional[MerchantHealth]:
+        """The endpoint's health if it has been used, without creating or restoring it"""
+        return self._health.get(endpoint_id)
+    
+    def reset(self, endpoint_id: int):
+        self._health.pop(endpoint_id, None)
+        if self.snapshot is not None:
+            self.snapshot.forget(endpoint_id)
+    
+    def export(self) -> Dict[int, Dict[str, Any]]:
+        return {endpoint_id: health.export_state() for endpoint_id, health in self._health.items()}
+    
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        return {endpoint_id: health.stats() for endpoint_id, health in self._health.items()}
+
+
+merchant_health = MerchantHealthBoard()
+
+
+# Warm Restart Snapshot
+def endpoint_signature(endpoint: RegisteredEndpoint) -> str:
+    """Saved entries are only reused for an endpoint that still has the same name and URL"""
+    return f"{endpoint.name}\n{endpoint.url}"
+
+
+def write_warm_snapshot(
+    path: str,
+    endpoints: Tuple[RegisteredEndpoint, ...],
+    prices: List[Tuple[int, str, PriceRecord, float, float]],
+    health: Dict[int, Dict[str, Any]],
+    now: float,
+    previous: Optional["WarmSnapshot"] = None
+):
+    """Write a snapshot file (blocking; run it in a thread)
+    
+    Saved entries of `previous` that this process never looked up are
+    carried over while they are still usable, so back-to-back restarts do
+    not shrink the warm set. Written to a temporary file and renamed over the
+    old one, so a crash mid-write leaves the previous snapshot intact.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE snapshot_meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            CREATE TABLE endpoints (endpoint_id INTEGER PRIMARY KEY, signature TEXT NOT NULL);
+            CREATE TABLE price_entries (
+                endpoint_id INTEGER NOT NULL,
+                upc TEXT NOT NULL,
+                result TEXT NOT NULL,
+                age REAL NOT NULL,
+                remaining_ttl REAL NOT NULL,
+                PRIMARY KEY (endpoint_id, upc)
+            ) WITHOUT ROWID;
+            CREATE TABLE merchant_health (endpoint_id INTEGER PRIMARY KEY, state TEXT NOT NULL);
+        """)
+        db.executemany(
+            "INSERT INTO endpoints VALUES (?, ?)",
+            [(endpoint.id, endpoint_signature(endpoint)) for endpoint in endpoints]
+        )
+        db.executemany(
+            "INSERT OR IGNORE INTO price_entries VALUES (?, ?, ?, ?, ?)",
+            [
+                (endpoint_id, upc, json.dumps(result.to_row()), age, remaining_ttl)
+                for endpoint_id, upc, result, age, remaining_ttl in prices
+            ]
+        )
+        db.executemany(
+            "INSERT INTO merchant_health VALUES (?, ?)",
+            [(endpoint_id, json.dumps(state)) for endpoint_id, state in health.items()]
+        )
+        if previous is not None and previous.endpoint_ids:
+            previous.carry_over(db, now, WARM_SNAPSHOT_MAX_ENTRIES - len(prices))
+        max_remaining = db.execute("SELECT MAX(remaining_ttl) FROM price_entries").fetchone()[0] or 0
+        db.executemany(
+            "INSERT INTO snapshot_meta VALUES (?, ?)",
+            [("written_at", now), ("usable_for", max_remaining + PRICE_CACHE_STALE_TTL)]
+        )
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+
+
+class WarmSnapshot:
+    """Read side of the snapshot left by the previous process
+    
+    Opening only reads the header and endpoint list, so startup time does
+    not depend on how many entries were saved. Price entries and merchant
+    health are looked up by primary key the first time each one is needed.
+    Entries of endpoints whose name or URL changed, or that were edited since
+    startup, are ignored, and the file is closed once every saved entry is
+    past its stale window.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        db: sqlite3.Connection,
+        written_at: float,
+        usable_for: float,
+        valid_endpoints: set,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path
+        self._db = db
+        self._clock = clock
+        self.written_at = written_at
+        self._usable_until = written_at + usable_for
+        self._valid_endpoints = valid_endpoints
+        self.prices_restored = 0
+        self.health_restored = 0
+    
+    @classmethod
+    def open(cls, path: str, endpoints: Tuple[RegisteredEndpoint, ...], clock: Callable[[], float] = time.time) -> Optional["WarmSnapshot"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            meta = dict(db.execute("SELECT key, value FROM snapshot_meta").fetchall())
+            saved = dict(db.execute("SELECT endpoint_id, signature FROM endpoints").fetchall())
+        except sqlite3.Error as e:
+            logger.warning("Ignoring unreadable warm-restart snapshot %s: %s", path, e)
+            return None
+        if clock() - meta["written_at"] > WARM_SNAPSHOT_MAX_AGE:
+            db.close()
+            return None
+        valid = {endpoint.id for endpoint in endpoints if saved.get(endpoint.id) == endpoint_signature(endpoint)}
+        return cls(path, db, meta["written_at"], meta["usable_for"], valid, clock)
+    
+    @property
+    def closed(self) -> bool:
+        return self._db is None
+    
+    @property
+    def endpoint_ids(self) -> set:
+        """Endpoints whose saved entries may still be used"""
+        return set(self._valid_endpoints) if self._clock() < self._usable_until else set()
+    
+    def carry_over(self, db: sqlite3.Connection, now: float, room: int):
+        """Copy still-usable entries into a snapshot being written (INSERT OR IGNORE: newer entries win)"""
+        ids = sorted(self.endpoint_ids)
+        placeholders = ", ".join("?" * len(ids))
+        elapsed = now - self.written_at
+        db.execute("ATTACH DATABASE ? AS previous", (self.path,))
+        try:
+            if room > 0:
+                db.execute(f"""
+                    INSERT OR IGNORE INTO price_entries
+                    SELECT endpoint_id, upc, result, age + ?, remaining_ttl - ? FROM previous.price_entries
+                    WHERE endpoint_id IN ({placeholders}) AND remaining_ttl - ? + ? > 0
+                    LIMIT ?
+                """, (elapsed, elapsed, *ids, elapsed, PRICE_CACHE_STALE_TTL, room))
+            db.execute(f"""
+                INSERT OR IGNORE INTO merchant_health
+                SELECT endpoint_id, json_set(state, '$.open_for', json_extract(state, '$.open_for') + ?)
+                FROM previous.merchant_health WHERE endpoint_id IN ({placeholders})
+            """, (elapsed, *ids))
+            db.commit()
+        finally:
+            db.execute("DETACH DATABASE previous")
+    
+    def _usable(self, endpoint_id: int) -> bool:
+        if self._db is None:
+            return False
+        if self._clock() >= self._usable_until:
+            self.close()
+            return False
+        return endpoint_id in self._valid_endpoints
+    
+    def forget(self, endpoint_id: int):
+        self._valid_endpoints.discard(endpoint_id)
+    
+    def price(self, endpoint_id: int, upc: str) -> Optional[Tuple[PriceRecord, float, float]]:
+        """(result, age, remaining TTL) as of now, or None if nothing usable was saved"""
+        if not self._usable(endpoint_id):
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT result, age, remaining_ttl FROM price_entries WHERE endpoint_id = ? AND upc = ?",
+                (endpoint_id, upc)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        elapsed = self._clock() - self.written_at
+        if row[2] - elapsed + PRICE_CACHE_STALE_TTL <= 0:
+            return None
+        self.prices_restored += 1
+        return price_record_from_json(row[0]), row[1] + elapsed, row[2] - elapsed
+    
+    def health(self, endpoint_id: int) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(saved MerchantHealth state, seconds since it was saved), or None"""
+        if self._db is None or endpoint_id not in self._valid_endpoints:
+            return None
+        try:
+            row = self._db.execute("SELECT state FROM merchant_health WHERE endpoint_id = ?", (endpoint_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        self.health_restored += 1
+        return json.loads(row[0]), self._clock() - self.written_at
+    
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "written_at": datetime.fromtimestamp(self.written_at).isoformat(),
+            "open": self._db is not None,
+            "prices_restored": self.prices_restored,
+            "health_restored": self.health_restored
+        }
+
+
+async def save_warm_snapshot(previous: Optional[WarmSnapshot]):
+    """Snapshot the hottest cache entries and every merchant's health at shutdown"""
+    prices = price_cache.export(WARM_SNAPSHOT_MAX_ENTRIES) if not price_cache.shared else []
+    if previous is not None:
+        previous.close()
+    try:
+        await asyncio.to_thread(
+            write_warm_snapshot, WARM_SNAPSHOT_PATH, endpoint_registry.active, prices,
+            merchant_health.export(), time.time(), previous
+        )
+        logger.info("Saved warm-restart snapshot with %d price entries", len(prices))
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Failed to save warm-restart snapshot: %s", e)
+
+
+def load_warm_snapshot() -> Optional[WarmSnapshot]:
+    snapshot = WarmSnapshot.open(WARM_SNAPSHOT_PATH, endpoint_registry.active)
+    if snapshot is not None:
+        if not price_cache.shared:
+            price_cache.snapshot = snapshot
+        merchant_health.snapshot = snapshot
+    return snapshot
+
+
+# Outbound Request Scheduling: Per-Endpoint Rate Limits and Priorities
+INTERACTIVE = 0
+BULK = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk", BACKGROUND: "background"}
+PRIORITY_MAX_WAIT = {
+    INTERACTIVE: SCHEDULER_INTERACTIVE_MAX_WAIT,
+    BULK: SCHEDULER_BULK_MAX_WAIT,
+    BACKGROUND: SCHEDULER_BACKGROUND_MAX_WAIT
+}
+
+# Priority of the merchant fetches made by the current task; routes and background jobs set it
+fetch_priority: contextvars.ContextVar[int] = contextvars.ContextVar("fetch_priority", default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    """Raised when a request is shed instead of queued behind a merchant's rate limit"""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self._updated = clock()
+    
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+    
+    def time_until_token(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class MerchantScheduler:
+    """Admit outbound requests to one endpoint at its rate limit, highest priority first
+    
+    Requests that find a token and an empty queue go straight through. The
+    rest wait in a priority queue (interactive, then bulk, then background,
+    FIFO within a priority) that is drained as tokens refill. A request is
+    shed with RateLimited when the queue is full or its expected wait would
+    exceed the limit for its priority.
+    """
+    
+    def __init__(
+        self,
+        rate: Optional[float],
+        burst: Optional[int],
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        max_wait: Optional[Dict[int, float]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_queue = max_queue
+        self.max_wait = max_wait or PRIORITY_MAX_WAIT
+        self._clock = clock
+        self.bucket: Optional[TokenBucket] = None
+        self.configure(rate, burst)
+        # (priority, sequence, future)
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = 0
+        self._dispatch_handle: Optional[asyncio.TimerHandle] = None
+        self.admitted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.shed = {priority: 0 for priority in PRIORITY_NAMES}
+        self.queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self.waits = {priority: deque(maxlen=500) for priority in PRIORITY_NAMES}
+    
+    def configure(self, rate: Optional[float], burst: Optional[int]):
+        """Apply the endpoint's current limit; rate None or 0 means unlimited"""
+        self.limit = (rate, burst)
+        if not rate:
+            self.bucket = None
+        elif self.bucket is None:
+            self.bucket = TokenBucket(rate, burst or max(1, int(rate)), self._clock)
+        else:
+            self.bucket.rate = rate
+            self.bucket.burst = burst or max(1, int(rate))
+    
+    def expected_wait(self, priority: int) -> float:
+        """Seconds until a new request at this priority would be admitted"""
+        if self.bucket is None:
+            return 0.0
+        ahead = sum(1 for waiting in self._waiting if waiting[0] <= priority and not waiting[2].done())
+        return self.bucket.time_until_token() + ahead / self.bucket.rate
+    
+    async def acquire(self, priority: int = INTERACTIVE):
+        if self.bucket is None or (not self._waiting and self.bucket.try_take()):
+            self._admit(priority, 0.0)
+            return
+        
+        if len(self._waiting) >= self.max_queue or self.expected_wait(priority) > self.max_wait[priority]:
+            self.shed[priority] += 1
+            raise RateLimited()
+        
+        enqueued = self._clock()
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._waiting, (priority, self._sequence, future))
+        self.queued[priority] += 1
+        self._schedule_dispatch()
+        try:
+            await future
+        finally:
+            self.queued[priority] -= 1
+        self._admit(priority, self._clock() - enqueued)
+    
+    def _admit(self, priority: int, wait: float):
+        self.admitted[priority] += 1
+        self.waits[priority].append(wait)
+        scheduler_wait.observe(wait, PRIORITY_NAMES[priority])
+    
+    def _schedule_dispatch(self):
+        if self._dispatch_handle is None and self._waiting and self.bucket is not None:
+            self._dispatch_handle = asyncio.get_running_loop().call_later(
+                self.bucket.time_until_token(), self._dispatch
+            )
+    
+    def _dispatch(self):
+        self._dispatch_handle = None
+        while self._waiting:
+            future = self._waiting[0][2]
+            if future.done():
+                # The waiter was cancelled; it does not need a token
+                heapq.heappop(self._waiting)
+                continue
+            if self.bucket is not None and not self.bucket.try_take():
+                break
+            heapq.heappop(self._waiting)
+            future.set_result(None)
+        self._schedule_dispatch()
+    
+    def stats(self) -> Dict[str, Any]:
+        rate, burst = self.limit
+        by_priority = {}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self.waits[priority])
+            by_priority[name] = {
+                "queued": self.queued[priority],
+                "admitted": self.admitted[priority],
+                "shed": self.shed[priority],
+                "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else None,
+                "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else None
+            }
+        return {
+            "rate_limit_per_second": rate,
+            "rate_limit_burst": self.bucket.burst if self.bucket else burst,
+            "queue_depth": sum(self.queued.values()),
+            "priorities": by_priority
+        }
+
+
+class RequestScheduler:
+    """MerchantScheduler for every endpoint, kept in step with the endpoint's limit"""
+    
+    def __init__(self):
+        self._schedulers: Dict[int, MerchantScheduler] = {}
+    
+    def get(self, endpoint: "RegisteredEndpoint") -> MerchantScheduler:
+        scheduler = self._schedulers.get(endpoint.id)
+        limit = (endpoint.rate_limit_per_second, endpoint.rate_limit_burst)
+        if scheduler is None:
+            scheduler = self._schedulers[endpoint.id] = MerchantScheduler(*limit)
+        elif scheduler.limit != limit:
+            # Reconfigure in place so requests already queued keep their place
+            scheduler.configure(*limit)
+        return scheduler
+    
+    def peek(self, endpoint_id: int) -> Optional[MerchantScheduler]:
+        """The endpoint's scheduler if it has been used, without creating one"""
+        return self._schedulers.get(endpoint_id)
+    
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        return {endpoint_id: scheduler.stats() for endpoint_id, scheduler in self._schedulers.items()}
+
+
+request_scheduler = RequestScheduler()
+
+
+# Merchant Probing: Canary Checks and Skipping Down Merchants
+class ProbeStats:
+    """Rolling outcome and latency window of one endpoint's canary probes"""
+    
+    __slots__ = ("outcomes", "latencies", "consecutive_failures", "probes", "last_probe_at", "last_error")
+    
+    def __init__(self, window: int):
+        self.outcomes: deque = deque(maxlen=window)
+        self.latencies: deque = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.probes = 0
+        self.last_probe_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+    
+    def record(self, latency: float, error: Optional[str], now: float):
+        self.probes += 1
+        self.last_probe_at = now
+        self.outcomes.append(error is None)
+        if error is None:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            self.last_error = error
+    
+    @property
+    def latency_p50(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+    
+    def to_dict(self, down: bool) -> Dict[str, Any]:
+        p50 = self.latency_p50
+        return {
+            "down": down,
+            "success_rate": round(sum(self.outcomes) / len(self.outcomes), 3) if self.outcomes else None,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "probes": self.probes,
+            "last_probe_at": self.last_probe_at,
+            "last_error": self.last_error
+        }
+
+
+class MerchantProber:
+    """Probe every active endpoint with a canary UPC in the background
+    
+    A probe fails on a timeout, connection error, HTTP 5xx/429 or a 200 that
+    is not JSON; any other answer means the merchant is up. Endpoints with
+    `down_after` consecutive failures are left out of compares until a probe
+    succeeds again. Probes bypass the breaker and rate limits: one request per endpoint
+    per interval.
+    """
+    
+    def __init__(
+        self,
+        upc: str = PROBE_UPC,
+        interval: float = PROBE_INTERVAL,
+        timeout: float = PROBE_TIMEOUT,
+        window: int = PROBE_WINDOW,
+        down_after: int = PROBE_DOWN_AFTER,
+        clock: Callable[[], float] = time.time
+    ):
+        self.upc = upc
+        self.interval = interval
+        self.timeout = timeout
+        self.window = window
+        self.down_after = down_after
+        self._clock = clock
+        self._stats: Dict[int, ProbeStats] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def get(self, endpoint_id: int) -> Optional[ProbeStats]:
+        return self._stats.get(endpoint_id)
+    
+    def reset(self, endpoint_id: int):
+        """Forget an endpoint's probes (it was edited, toggled or deleted)"""
+        self._stats.pop(endpoint_id, None)
+    
+    def is_down(self, endpoint_id: int) -> bool:
+        stats = self._stats.get(endpoint_id)
+        return stats is not None and stats.consecutive_failures >= self.down_after
+    
+    async def probe(self, session: aiohttp.ClientSession, endpoint: RegisteredEndpoint) -> Optional[str]:
+        """Probe one endpoint and record the outcome; returns the error, if any"""
+        started = time.monotonic()
+        error = None
+        try:
+            async with session.get(endpoint.render_url(self.upc), timeout=client_timeout(self.timeout)) as response:
+                body = await response.read()
+                if response.status >= 500 or response.status == 429:
+                    error = f"HTTP {response.status}"
+                elif response.status == 200:
+                    json_loads(body)
+        except asyncio.TimeoutError:
+            error = "Request timeout"
+        except (aiohttp.ClientError, ValueError) as e:
+            error = str(e) or type(e).__name__
+        
+        stats = self._stats.get(endpoint.id)
+        if stats is None:
+            stats = self._stats[endpoint.id] = ProbeStats(self.window)
+        was_down = self.is_down(endpoint.id)
+        stats.record(time.monotonic() - started, error, self._clock())
+        if self.is_down(endpoint.id) != was_down:
+            logger.warning(
+                "Merchant %s is %s (canary probe: %s)", endpoint.name,
+                "down, skipping it in compares" if not was_down else "back up", error or "ok"
+            )
+        return error
+    
+    async def probe_all(self, session: aiohttp.ClientSession, endpoints: Tuple[RegisteredEndpoint, ...]):
+        await asyncio.gather(*(self.probe(session, endpoint) for endpoint in endpoints))
+        # Drop endpoints that were deleted or deactivated meanwhile
+        active = {endpoint.id for endpoint in endpoint_registry.active}
+        for endpoint_id in [endpoint_id for endpoint_id in self._stats if endpoint_id not in active]:
+            del self._stats[endpoint_id]
+    
+    async def run(self, session: aiohttp.ClientSession):
+        while True:
+            try:
+                await self.probe_all(session, endpoint_registry.active)
+            except Exception as e:
+                logger.warning("Merchant probe pass failed: %s", e)
+            await asyncio.sleep(self.interval)
+    
+    def start(self, session: aiohttp.ClientSession):
+        self._task = asyncio.create_task(self.run(session))
+    
+    async def stop(self):
+        await cancel_and_wait([self._task])
+        self._task = None
+    
+    def plan(
+        self, endpoints: Tuple[RegisteredEndpoint, ...]
+    ) -> Tuple[Tuple[RegisteredEndpoint, ...], Dict[int, PriceRecord]]:
+        """Split endpoints into the ones to call and results (by endpoint id) for the ones that are down"""
+        skipped = {
+            endpoint.id: PriceRecord(merchant=endpoint.name, price=None, url=None, error="Merchant down")
+            for endpoint in endpoints
+            if self.is_down(endpoint.id)
+        }
+        if not skipped:
+            return endpoints, skipped
+        return tuple(endpoint for endpoint in endpoints if endpoint.id not in skipped), skipped
+    
+    def stats(self, endpoint_id: int) -> Optional[Dict[str, Any]]:
+        stats = self._stats.get(endpoint_id)
+        return stats.to_dict(self.is_down(endpoint_id)) if stats is not None else None
+
+
+merchant_prober = MerchantProber()
+
+
+# Price Comparison Service
+async def fetch_price_from_api(session: aiohttp.ClientSession, endpoint: RegisteredEndpoint, upc: str) -> PriceRecord:
+    """Fetch price from a single API endpoint"""
+    health = merchant_health.get(endpoint.id)
+    if not health.allow_request():
+        # Circuit open: answer immediately instead of waiting on a failing merchant
+        upstream_errors.inc(endpoint.name, "circuit_open")
+        return PriceRecord(
+            merchant=endpoint.name,
+            price=None,
+            url=None,
+            error="Merchant unavailable"
+        )
+    
+    started = time.monotonic()
+    url = None
+    try:
+        # Wait for the merchant's rate limit, behind any higher-priority requests
+        await request_scheduler.get(endpoint).acquire(fetch_priority.get())
+        started = time.monotonic()
+        
+        # Fill the UPC into the pre-split URL template
+        url = endpoint.render_url(upc)
+        fetch_logger.debug("Requesting merchant price", extra={"merchant": endpoint.name, "upc": upc, "url": url})
+        
+        # Make API request with the merchant's adaptive timeout
+        async with session.get(url, timeout=health.request_timeout()) as response:
+            if response.status == 200:
+                # Read the whole body first so decoding is timed apart from the network
+                with TimedPhase("read"):
+                    body = await response.read()
+                with TimedPhase("decode"):
+                    # aiohttp's json() decodes the body already read above
+                    data = json_loads(body) if FAST_JSON_ENABLED else await response.json()
+                latency = time.monotonic() - started
+                health.record_success(latency)
+                upstream_latency.observe(latency, endpoint.name)
+                upstream_responses.inc(endpoint.name, 200)
+                
+                # Parse response with the endpoint's bound parser
+                with TimedPhase("extract"):
+                    price, in_stock = apply_parser(endpoint.parser, endpoint.name, data)
+                
+                if price is not None:
+                    result = PriceRecord(
+                        merchant=endpoint.name,
+                        price=price,
+                        url=url,
+                        in_stock=in_stock,
+                        error=None if in_stock else "Out of stock"
+                    )
+                    if sample_fetch_success():
+                        fetch_logger.info("Merchant price fetched", extra={
+                            "merchant": endpoint.name, "upc": upc, "status": response.status,
+                            "latency_ms": round(latency * 1000, 1), "price": price, "in_stock": in_stock
+                        })
+                    return result
+                else:
+                    upstream_errors.inc(endpoint.name, "invalid_response")
+                    fetch_logger.warning("Invalid merchant response format", extra={
+                        "merchant": endpoint.name, "upc": upc, "status": response.status,
+                        "latency_ms": round(latency * 1000, 1), "error": "Invalid response format"
+                    })
+                    return PriceRecord(
+                        merchant=endpoint.name,
+                        price=None,
+                        url=None,
+                        error="Invalid response format"
+                    )
+            else:
+                # 5xx and 429 mean the merchant is struggling; other statuses are real answers
+                latency = time.monotonic() - started
+                if response.status >= 500 or response.status == 429:
+                    health.record_failure()
+                else:
+                    health.record_success(latency)
+                upstream_latency.observe(latency, endpoint.name)
+                upstream_responses.inc(endpoint.name, response.status)
+                upstream_errors.inc(endpoint.name, "http_status")
+                fetch_logger.warning("Merchant returned an error status", extra={
+                    "merchant": endpoint.name, "upc": upc, "status": response.status,
+                    "latency_ms": round(latency * 1000, 1), "error": f"HTTP {response.status}"
+                })
+                return PriceRecord(
+                    merchant=endpoint.name,
+                    price=None,
+                    url=None,
+                    error=f"HTTP {response.status}"
+                )
+                
+    except asyncio.CancelledError:
+        health.release()
+        raise
+    except RateLimited:
+        # Shed before reaching the merchant: says nothing about its health
+        health.release()
+        upstream_errors.inc(endpoint.name, "rate_limited")
+        return PriceRecord(
+            merchant=endpoint.name,
+            price=None,
+            url=None,
+            error="Rate limited"
+        )
+    except asyncio.TimeoutError:
+        health.record_failure()
+        upstream_errors.inc(endpoint.name, "timeout")
+        fetch_logger.warning("Merchant request timed out", extra={
+            "merchant": endpoint.name, "upc": upc,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1), "error": "Request timeout"
+        })
+        return PriceRecord(
+            merchant=endpoint.name,
+            price=None,
+            url=None,
+            error="Request timeout"
+        )
+    except Exception as e:
+        health.record_failure()
+        upstream_errors.inc(endpoint.name, "connection" if isinstance(e, aiohttp.ClientError) else "exception")
+        fetch_logger.warning("Merchant request failed", extra={
+            "merchant": endpoint.name, "upc": upc,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1), "error": str(e)
+        })
+        return PriceRecord(
+            merchant=endpoint.name,
+            price=None,
+            url=None,
+            error=str(e)
+        )
+
+
+PriceFetcher = Callable[[aiohttp.ClientSession, RegisteredEndpoint, str], Any]
+
+
+async def _fetch_and_cache(
+    session: aiohttp.ClientSession,
+    endpoint: RegisteredEndpoint,
+    upc: str,
+    ttl: float,
+    fetch: PriceFetcher
+) -> PriceRecord:
+    """Fetch a fresh price and cache it when the merchant returned a usable answer"""
+    generation = await price_cache.generation_async(endpoint.id)
+    started = time.perf_counter()
+    result = await fetch(session, endpoint, upc)
+    timings = request_timings.get()
+    if timings is not None:
+        # Includes any wait for the merchant's rate limit
+        timings.add(f"fetch-{endpoint.id}", time.perf_counter() - started, endpoint.name)
+    if PRICE_HISTORY_ENABLED:
+        price_history.record(upc, endpoint.id, result)
+    # Only parsed prices are cached; timeouts and HTTP errors are retried next time
+    if ttl > 0 and result.price is not None:
+        await price_cache.set_async(endpoint.id, upc, result, ttl, generation=generation)
+    return result
+
+
+def cache_ttl_for(endpoint: RegisteredEndpoint) -> float:
+    """Seconds to cache this endpoint's prices (0 = no caching)"""
+    if not PRICE_CACHE_ENABLED:
+        return 0
+    return endpoint.cache_ttl if endpoint.cache_ttl is not None else PRICE_CACHE_TTL
+
+
+async def price_flight_running(endpoint: RegisteredEndpoint, upc: str) -> bool:
+    generation = await price_cache.generation_async(endpoint.id)
+    return any(price_flights.in_flight((endpoint.id, generation, upc, priority)) for priority in PRIORITY_NAMES)
+
+
+async def join_price_flight(endpoint: RegisteredEndpoint, upc: str, call: Callable[[], Any]) -> PriceRecord:
+    """Share an upstream fetch with callers of the same or a more urgent priority
+    
+    A fetch waits in its leader's rate-limit queue (and batch slots), so a
+    caller only joins flights at least as urgent as its own priority; an
+    interactive compare never waits behind a bulk or background fetch.
+    """
+    priority = fetch_priority.get()
+    # The generation changes when the endpoint is edited, so new callers never join a stale fetch
+    generation = await price_cache.generation_async(endpoint.id)
+    for urgent in range(INTERACTIVE, priority):
+        key = (endpoint.id, generation, upc, urgent)
+        if price_flights.in_flight(key):
+            return await price_flights.do(key, call)
+    return await price_flights.do((endpoint.id, generation, upc, priority), call)
+
+
+async def refresh_price(session: aiohttp.ClientSession, endpoint: RegisteredEndpoint, upc: str) -> PriceRecord:
+    """Fetch a fresh price into the cache, joining a fetch that is already in flight"""
+    ttl = cache_ttl_for(endpoint)
+    return await join_price_flight(
+        endpoint, upc, lambda: _fetch_and_cache(session, endpoint, upc, ttl, fetch_price_from_api)
+    )
+
+
+async def refresh_in_background(endpoint: RegisteredEndpoint, upc: str, fetch_fresh: Callable[[], Any]) -> PriceRecord:
+    """Run a cache refresh nobody is waiting for at background priority"""
+    fetch_priority.set(BACKGROUND)
+    return await join_price_flight(endpoint, upc, fetch_fresh)
+
+
+# Catalog Refresh Engine
+def refresh_interval(popularity: float) -> float:
+    """How often to refresh a UPC: REFRESH_BASE_INTERVAL at popularity 1, shorter for more popular UPCs"""
+    return min(REFRESH_MAX_INTERVAL, max(REFRESH_MIN_INTERVAL, REFRESH_BASE_INTERVAL / popularity))
+
+
+class WatchedUPC:
+    __slots__ = ("upc", "popularity", "last_refreshed_at", "due_at")
+    
+    def __init__(self, upc: str, popularity: float, last_refreshed_at: Optional[float]):
+        self.upc = upc
+        self.popularity = popularity
+        self.last_refreshed_at = last_refreshed_at
+        # Never refreshed: due immediately
+        self.due_at = (last_refreshed_at or 0) + refresh_interval(popularity)
+
+
+class CatalogRefresher:
+    """Keep watchlisted UPCs warm in the price cache
+    
+    Each UPC is due REFRESH_BASE_INTERVAL / popularity seconds after its last
+    refresh, and the most overdue UPC is refreshed first. Refreshes go through
+    the same single-flight and cache path as compares (so a UPC a user is
+    fetching right now is not fetched twice). They run at BACKGROUND priority
+    behind user traffic, and each merchant has a refresh budget of
+    REFRESH_MERCHANT_RATE requests/second, capped at REFRESH_RATE_SHARE of
+    the merchant's own rate limit.
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._items: Dict[str, WatchedUPC] = {}
+        # (due_at, upc); entries whose due_at no longer matches the item are skipped
+        self._heap: List[Tuple[float, str]] = []
+        self._budgets: Dict[int, TokenBucket] = {}
+        self._dirty: set = set()
+        self._version = -1
+        self._lock_file = None
+        self._task: Optional[asyncio.Task] = None
+        self._persist_task: Optional[asyncio.Task] = None
+        self._refreshes: set = set()
+        self._wakeup = asyncio.Event()
+        self.state = "stopped"
+        self.refreshed = 0
+        self.fetches = 0
+        self.errors = 0
+        self.shed = 0
+        self._completions: deque = deque()
+    
+    def schedule(self, item: WatchedUPC):
+        heapq.heappush(self._heap, (item.due_at, item.upc))
+    
+    def upsert(self, upc: str, popularity: float, last_refreshed_at: Optional[float] = None):
+        item = self._items.get(upc)
+        if item is None:
+            item = self._items[upc] = WatchedUPC(upc, popularity, last_refreshed_at)
+        else:
+            item.popularity = popularity
+            item.due_at = (item.last_refreshed_at or 0) + refresh_interval(popularity)
+        self.schedule(item)
+        self._wakeup.set()
+    
+    def remove(self, upc: str):
+        self._items.pop(upc, None)
+    
+    def next_due(self) -> Optional[WatchedUPC]:
+        """The most overdue UPC, dropping heap entries for removed or rescheduled items"""
+        while self._heap:
+            due_at, upc = self._heap[0]
+            item = self._items.get(upc)
+            if item is not None and item.due_at == due_at:
+                return item
+            heapq.heappop(self._heap)
+        return None
+    
+    async def reload(self, db: aiosqlite.Connection):
+        """Sync the in-memory watchlist with the table if any worker changed it"""
+        cursor = await db.execute("SELECT version FROM watchlist_version WHERE id = 1")
+        version = (await cursor.fetchone())[0]
+        if version == self._version:
+            return
+        self._version = version
+        cursor = await db.execute("SELECT upc, popularity, last_refreshed_at FROM watchlist")
+        seen = set()
+        for upc, popularity, last_refreshed_at in await cursor.fetchall():
+            seen.add(upc)
+            item = self._items.get(upc)
+            if item is None or item.popularity != popularity:
+                self.upsert(upc, popularity, last_refreshed_at if item is None else item.last_refreshed_at)
+        for upc in set(self._items) - seen:
+            self.remove(upc)
+    
+    def _budget(self, endpoint: RegisteredEndpoint) -> TokenBucket:
+        rate = REFRESH_MERCHANT_RATE
+        if endpoint.rate_limit_per_second:
+            rate = min(rate, endpoint.rate_limit_per_second * REFRESH_RATE_SHARE)
+        budget = self._budgets.get(endpoint.id)
+        if budget is None:
+            budget = self._budgets[endpoint.id] = TokenBucket(rate, 1)
+        budget.rate = rate
+        return budget
+    
+    async def _refresh_endpoint(self, session: aiohttp.ClientSession, endpoint: RegisteredEndpoint, upc: str) -> PriceRecord:
+        budget = self._budget(endpoint)
+        while not budget.try_take():
+            await asyncio.sleep(budget.time_until_token())
+        self.fetches += 1
+        return await refresh_price(session, endpoint, upc)
+    
+    async def refresh(self, session: aiohttp.ClientSession, item: WatchedUPC):
+        """Refresh one UPC at every active merchant and schedule its next refresh"""
+        fetch_priority.set(BACKGROUND)
+        results = await asyncio.gather(*(
+            self._refresh_endpoint(session, endpoint, item.upc) for endpoint in endpoint_registry.active
+        ))
+        now = self._clock()
+        shed = sum(1 for r in results if r.error == "Rate limited")
+        self.shed += shed
+        self.errors += sum(1 for r in results if r.error and r.error != "Rate limited" and r.price is None)
+        if results and shed == len(results):
+            # Every merchant was saturated by user traffic: try again soon
+            item.due_at = now + REFRESH_RETRY_DELAY
+        else:
+            item.last_refreshed_at = now
+            item.due_at = now + refresh_interval(item.popularity)
+            self._dirty.add(item.upc)
+            self.refreshed += 1
+            self._completions.append(now)
+        if item.upc in self._items:
+            self.schedule(item)
+    
+    async def run(self, session: aiohttp.ClientSession, pool: SQLitePool):
+        slots = asyncio.Semaphore(REFRESH_CONCURRENCY)
+        in_flight: set = set()
+        last_reload = 0.0
+        
+        async def refresh_and_release(item):
+            try:
+                await self.refresh(session, item)
+            except Exception as e:
+                self.errors += 1
+                item.due_at = self._clock() + REFRESH_RETRY_DELAY
+                self.schedule(item)
+                logger.warning("Catalog refresh of %s failed: %s", item.upc, e)
+            finally:
+                in_flight.discard(item.upc)
+                slots.release()
+        
+        while True:
+            if time.monotonic() - last_reload >= ENDPOINT_SYNC_INTERVAL:
+                last_reload = time.monotonic()
+                async with pool.acquire() as db:
+                    await self.reload(db)
+            
+            item = self.next_due()
+            if item is not None and item.upc in in_flight:
+                # Rescheduled while refreshing (e.g. a popularity change); the running
+                # refresh schedules it again when it finishes, so let the next UPC through
+                heapq.heappop(self._heap)
+                continue
+            now = self._clock()
+            if item is None or item.due_at > now:
+                self._wakeup.clear()
+                delay = ENDPOINT_SYNC_INTERVAL if item is None else min(max(item.due_at - now, 0.05), ENDPOINT_SYNC_INTERVAL)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            heapq.heappop(self._heap)
+            await slots.acquire()
+            in_flight.add(item.upc)
+            task = spawn_background(refresh_and_release(item))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+    
+    async def persist(self, pool: SQLitePool):
+        """Write refresh times back in batches, so a restart resumes where it left off
+        
+        Also publishes this worker's progress for the status endpoint on every worker.
+        """
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            (self._items[upc].last_refreshed_at, upc)
+            for upc in dirty if upc in self._items
+        ]
+        async with pool.acquire() as db:
+            if rows:
+                await db.executemany("UPDATE watchlist SET last_refreshed_at = ? WHERE upc = ?", rows)
+            await db.execute(
+                "INSERT OR REPLACE INTO refresh_status (id, stats, updated_at) VALUES (1, ?, ?)",
+                (json.dumps(self.stats()), time.time())
+            )
+            await db.commit()
+    
+    async def _persist_loop(self, pool: SQLitePool):
+        while True:
+            await asyncio.sleep(REFRESH_PERSIST_INTERVAL)
+            try:
+                await self.persist(pool)
+            except sqlite3.Error as e:
+                logger.warning("Failed to save catalog refresh times: %s", e)
+    
+    def _acquire_leadership(self) -> bool:
+        """Only one worker process runs the engine; the others serve the API as standbys"""
+        if fcntl is None:
+            return True
+        self._lock_file = open(f"{DATABASE_URL}.refresh.lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+    
+    async def start(self, session: aiohttp.ClientSession, pool: SQLitePool):
+        if not self._acquire_leadership():
+            self.state = "standby"
+            return
+        self.state = "running"
+        await self.persist(pool)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run(session, pool))
+        self._persist_task = asyncio.create_task(self._persist_loop(pool))
+    
+    async def stop(self, pool: SQLitePool):
+        await cancel_and_wait([self._task, self._persist_task, *self._refreshes])
+        self._task = self._persist_task = None
+        if self.state == "running":
+            # The other workers report the engine as stopped from here on
+            self.state = "stopped"
+            await self.persist(pool)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.state = "stopped"
+    
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        while self._completions and self._completions[0] < now - 60:
+            self._completions.popleft()
+        overdue = [now - item.due_at for item in self._items.values() if item.due_at <= now]
+        never = sum(1 for item in self._items.values() if item.last_refreshed_at is None)
+        return {
+            "state": self.state,
+            "watchlist_size": len(self._items),
+            "never_refreshed": never,
+            "due_now": len(overdue),
+            "max_overdue_seconds": round(max(overdue), 1) if overdue else 0.0,
+            "refreshed": self.refreshed,
+            "merchant_fetches": self.fetches,
+            "errors": self.errors,
+            "rate_limited": self.shed,
+            "upcs_per_minute": len(self._completions)
+        }
+
+
+catalog_refresher = CatalogRefresher()
+
+
+async def get_price(
+    session: aiohttp.ClientSession,
+    endpoint: RegisteredEndpoint,
+    upc: str,
+    fetch: Optional[PriceFetcher] = None
+) -> PriceRecord:
+    """Get a merchant price from the cache, or from one shared upstream fetch"""
+    fetch = fetch or fetch_price_from_api
+    ttl = cache_ttl_for(endpoint)
+    
+    def fetch_fresh():
+        return _fetch_and_cache(session, endpoint, upc, ttl, fetch)
+    
+    if ttl > 0:
+        cached = await price_cache.get_async(endpoint.id, upc)
+        if cached is not None:
+            result, age, is_fresh = cached
+            if is_fresh or PRICE_CACHE_SERVE_STALE:
+                if not is_fresh and not await price_flight_running(endpoint, upc):
+                    # Stale-while-revalidate: answer now, refresh for the next caller
+                    spawn_background(refresh_in_background(endpoint, upc, fetch_fresh))
+                return result.as_cached(round(age, 3))
+    
+    return await join_price_flight(endpoint, upc, fetch_fresh)
+
+
+# Response Parser Registry
+ResponseExtractor = Callable[[Any], tuple[Optional[float], bool]]
+
+
+def _compile_path(path: str) -> Callable[[Any], Any]:
+    """Compile a dotted response path into a chain of closures"""
+    head, _, rest = path.partition(".")
+    inner = _compile_path(rest) if rest else None
+    
+    if head.endswith("[]"):
+        key = head[:-2]
+        
+        def get_each(data):
+            items = data.get(key) if isinstance(data, dict) else None
+            if not isinstance(items, list):
+                return []
+            return [inner(item) for item in items] if inner else items
+        return get_each
+    
+    def get_key(data):
+        value = data.get(head) if isinstance(data, dict) else None
+        if inner is None or value is None:
+            return value
+        return inner(value)
+    return get_key
+
+
+def _price_from_dollar_string(value) -> Optional[float]:
+    # e.g. "$4.77"
+    if isinstance(value, str) and value.startswith("$"):
+        return float(value[1:])
+    return None
+
+
+def _price_from_float(value) -> Optional[float]:
+    # e.g. 5.67
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def _price_from_microcents(value) -> Optional[float]:
+    # e.g. 478000000 -> 4.78
+    if value is None:
+        return None
+    return value / 100000000.0
+
+
+PRICE_CONVERTERS: Dict[str, Callable[[Any], Optional[float]]] = {
+    "dollar_string": _price_from_dollar_string,
+    "float": _price_from_float,
+    "microcents": _price_from_microcents,
+}
+
+STOCK_RULES: Dict[str, Callable[[Any], bool]] = {
+    # A stock count greater than zero
+    "positive": lambda value: value is not None and value > 0,
+    # An availability flag
+    "truthy": bool,
+    # Any location in a list has a quantity greater than zero
+    "any_positive": lambda values: any((value or 0) > 0 for value in values),
+}
+
+
+def compile_mapping(mapping: ResponseMapping) -> ResponseExtractor:
+    """Compile a declarative mapping into a single extractor function"""
+    get_price = _compile_path(mapping.price_path)
+    get_stock = _compile_path(mapping.stock_path)
+    convert_price = PRICE_CONVERTERS[mapping.price_unit]
+    in_stock = STOCK_RULES[mapping.stock_rule]
+    
+    def extract(data) -> tuple[Optional[float], bool]:
+        price = convert_price(get_price(data))
+        if price is None:
+            return None, False
+        return price, in_stock(get_stock(data))
+    return extract
+
+
+# Built-in merchant formats, used when an endpoint has no mapping of its own
+BUILTIN_RESPONSE_MAPPINGS: Dict[str, ResponseMapping] = {
+    # Appedia format: {"price": "$4.77", "stock": 7}
+    "appedia": ResponseMapping(
+        price_path="price", price_unit="dollar_string", stock_path="stock", stock_rule="positive"
+    ),
+    # Micromazon format: {"available": true, "price": 5.67}
+    "micromazon": ResponseMapping(
+        price_path="price", price_unit="float", stock_path="available", stock_rule="truthy"
+    ),
+    # Googdit format: {"a": [{"l": 8839, "q": 4}, {"l": 1292, "q": 0}], "p": 478000000}
+    "googdit": ResponseMapping(
+        price_path="p", price_unit="microcents", stock_path="a[].q", stock_rule="any_positive"
+    ),
+}
+
+
+class ParserRegistry:
+    """Compiled response extractors, shared between endpoints with the same mapping"""
+    
+    def __init__(self, builtins: Dict[str, ResponseMapping]):
+        self._compiled: Dict[Tuple[str, str, str, str], ResponseExtractor] = {}
+        self._builtins = {name: self.compile(mapping) for name, mapping in builtins.items()}
+    
+    def compile(self, mapping: ResponseMapping) -> ResponseExtractor:
+        key = (mapping.price_path, mapping.price_unit, mapping.stock_path, mapping.stock_rule)
+        extractor = self._compiled.get(key)
+        if extractor is None:
+            extractor = self._compiled[key] = compile_mapping(mapping)
+        return extractor
+    
+    def resolve(self, merchant_name: str, mapping: Optional[ResponseMapping] = None) -> Optional[ResponseExtractor]:
+        """Extractor for an endpoint: its own mapping, else the built-in for its name"""
+        if mapping is not None:
+            return self.compile(mapping)
+        return self._builtins.get(merchant_name.lower())
+
+
+parser_registry = ParserRegistry(BUILTIN_RESPONSE_MAPPINGS)
+
+
+def apply_parser(parser: Optional[ResponseExtractor], merchant_name: str, data: dict) -> tuple[Optional[float], bool]:
+    """Run a compiled merchant extractor, treating malformed payloads as unparseable"""
+    if parser is None:
+        return None, False
+    
+    try:
+        price, in_stock = parser(data)
+        if price is None:
+            parse_failures.inc(merchant_name)
+        return price, in_stock
+    except (ValueError, TypeError, KeyError) as e:
+        fetch_logger.warning("Unparseable merchant response", extra={"merchant": merchant_name, "error": str(e)})
+    
+    parse_failures.inc(merchant_name)
+    return None, False
+
+
+def parse_api_response(merchant_name: str, data: dict) -> tuple[Optional[float], bool]:
+    """Parse API response based on merchant type"""
+    return apply_parser(parser_registry.resolve(merchant_name), merchant_name, data)
+
+
+def require_active_endpoints() -> Tuple["RegisteredEndpoint", ...]:
+    """Return the registry's active endpoints, failing if none are configured"""
+    endpoints = endpoint_registry.active
+    if not endpoints:
+        raise HTTPException(status_code=400, detail="No active API endpoints configured")
+    return endpoints
+
+
+def with_skipped(
+    endpoints: Tuple[RegisteredEndpoint, ...],
+    results: List[PriceRecord],
+    skipped: Dict[int, PriceRecord]
+) -> List[PriceRecord]:
+    """Put the results of merchants skipped as down back in endpoint order"""
+    if not skipped:
+        return list(results)
+    called = iter(results)
+    return [skipped[endpoint.id] if endpoint.id in skipped else next(called) for endpoint in endpoints]
+
+
+async def gather_within_deadline(
+    session: aiohttp.ClientSession,
+    endpoints: Tuple[RegisteredEndpoint, ...],
+    upc: str,
+    deadline: float
+) -> List[PriceRecord]:
+    """Collect the merchant results that arrive within `deadline` seconds
+    
+    Merchants that have not answered are reported as pending. Only our wait is
+    cancelled: the shared upstream fetch keeps running and still fills the cache.
+    """
+    if not endpoints:
+        return []
+    tasks = [asyncio.create_task(get_price(session, endpoint, upc)) for endpoint in endpoints]
+    await asyncio.wait(tasks, timeout=deadline)
+    
+    results = []
+    for endpoint, task in zip(endpoints, tasks):
+        if task.done():
+            results.append(task.result())
+        else:
+            task.cancel()
+            results.append(PriceRecord(
+                merchant=endpoint.name,
+                price=None,
+                url=None,
+                error="Deadline exceeded",
+                pending=True
+            ))
+    return results
+
+
+def select_best_result(results: List[PriceRecord]) -> Optional[PriceRecord]:
+    """Find best price (only consider in-stock items)"""
+    valid_results = [r for r in results if r.price is not None and r.in_stock is True]
+    if not valid_results:
+        return None
+    return min(valid_results, key=lambda x: x.price)
+
+
+def build_comparison_response(upc: str, results: List[PriceRecord]) -> PriceComparisonResponse:
+    """Pick the best in-stock price and assemble the comparison response (the Pydantic edge)"""
+    best_result = select_best_result(results)
+    
+    return PriceComparisonResponse(
+        upc=upc,
+        results=[result.to_model() for result in results],
+        best_price=best_result.price if best_result else None,
+        best_merchant=best_result.merchant if best_result else None,
+        best_url=best_result.url if best_result else None,
+        comparison_time=datetime.now().isoformat(),
+        partial=any(r.pending for r in results)
+    )
+
+
+@app.post("/api/compare", response_model=PriceComparisonResponse)
+async def compare_prices(
+    request: PriceComparisonRequest,
+    session: aiohttp.ClientSession = Depends(get_http_session)
+):
+    """Compare prices across all active API endpoints"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        # Merchants failing their probes are not called at all
+        all_endpoints = require_active_endpoints()
+        endpoints, skipped = merchant_prober.plan(all_endpoints)
+        
+        # Fetch prices concurrently over the shared connection pool
+        deadline_ms = request.deadline_ms or COMPARE_DEFAULT_DEADLINE_MS
+        if deadline_ms:
+            results = await gather_within_deadline(session, endpoints, request.upc, deadline_ms / 1000)
+        else:
+            tasks = [get_price(session, endpoint, request.upc) for endpoint in endpoints]
+            results = await asyncio.gather(*tasks)
+        
+        with TimedPhase("serialize"):
+            response = build_comparison_response(request.upc, with_skipped(all_endpoints, results, skipped))
+            rendered = render_model(response)
+        outcome = "partial" if response.partial else "complete"
+        return rendered
+    finally:
+        compare_requests.inc(outcome)
+        compare_latency.observe(time.perf_counter() - started)
+
+
+def sse_event(event: str, data: str) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.get("/api/compare/stream", response_class=StreamingResponse)
+async def compare_prices_stream(
+    upc: str = Query(..., min_length=1, max_length=50),
+    session: aiohttp.ClientSession = Depends(get_http_session)
+):
+    """Stream each merchant's result as a Server-Sent Event as soon as it arrives
+    
+    Emits one `result` event per merchant (a PriceStreamEvent with the running
+    best price) followed by a final `done` event with the full comparison.
+    """
+    all_endpoints = require_active_endpoints()
+    endpoints, skipped = merchant_prober.plan(all_endpoints)
+    
+    async def events():
+        tasks = [asyncio.create_task(get_price(session, endpoint, upc)) for endpoint in endpoints]
+        arrived = []
+        
+        def result_event(result: PriceRecord) -> str:
+            arrived.append(result)
+            best_result = select_best_result(arrived)
+            event = PriceStreamEvent(
+                result=result.to_model(),
+                best_price=best_result.price if best_result else None,
+                best_merchant=best_result.merchant if best_result else None,
+                best_url=best_result.url if best_result else None
+            )
+            return sse_event("result", event.model_dump_json())
+        
+        try:
+            # Merchants skipped as down are known at once
+            for result in skipped.values():
+                yield result_event(result)
+            for next_result in asyncio.as_completed(tasks):
+                yield result_event(await next_result)
+            
+            # Final summary keeps the merchant order used by /api/compare
+            comparison = build_comparison_response(
+                upc, with_skipped(all_endpoints, [task.result() for task in tasks], skipped)
+            )
+            yield sse_event("done", comparison.model_dump_json())
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _fetch_with_limits(
+    session: aiohttp.ClientSession,
+    endpoint: RegisteredEndpoint,
+    upc: str,
+    global_limit: asyncio.Semaphore,
+    merchant_limit: asyncio.Semaphore
+) -> PriceRecord:
+    """Fetch a single price while holding the per-merchant and global slots"""
+    # Take the merchant slot first so a busy merchant never holds a global slot idle
+    async with merchant_limit:
+        async with global_limit:
+            return await fetch_price_from_api(session, endpoint, upc)
+
+
+@app.post("/api/compare/batch")
+async def compare_prices_batch(
+    request: BatchComparisonRequest,
+    session: aiohttp.ClientSession = Depends(get_http_session)
+):
+    """Compare prices for many UPCs, streaming one NDJSON line per UPC as it completes"""
+    all_endpoints = require_active_endpoints()
+    endpoints, skipped = merchant_prober.plan(all_endpoints)
+    
+    max_concurrency = request.max_concurrency or BATCH_DEFAULT_CONCURRENCY
+    per_merchant = request.per_merchant_concurrency or BATCH_DEFAULT_PER_MERCHANT_CONCURRENCY
+    global_limit = asyncio.Semaphore(max_concurrency)
+    merchant_limits = {endpoint.id: asyncio.Semaphore(per_merchant) for endpoint in endpoints}
+    
+    # One UPC in flight per global slot, never more workers than there are UPCs
+    worker_count = min(len(request.upcs), max_concurrency)
+    upcs = iter(request.upcs)
+    # Bounded so a slow reader applies backpressure instead of buffering the whole catalog
+    output: asyncio.Queue = asyncio.Queue(maxsize=worker_count * 2)
+    
+    async def worker():
+        # Batch traffic queues behind interactive compares at each merchant's rate limit
+        fetch_priority.set(BULK)
+        for upc in upcs:
+            # Cache hits return immediately; only real upstream fetches take a slot
+            tasks = [
+                get_price(
+                    session, endpoint, upc,
+                    fetch=functools.partial(
+                        _fetch_with_limits,
+                        global_limit=global_limit,
+                        merchant_limit=merchant_limits[endpoint.id]
+                    )
+                )
+                for endpoint in endpoints
+            ]
+            results = await asyncio.gather(*tasks)
+            await output.put(build_comparison_response(upc, with_skipped(all_endpoints, results, skipped)))
+    
+    async def close_when_done(workers):
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            await output.put(None)
+    
+    async def stream():
+        workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+        closer = asyncio.create_task(close_when_done(workers))
+        try:
+            while True:
+                comparison = await output.get()
+                if comparison is None:
+                    break
+                yield comparison.model_dump_json() + "\n"
+            # Surface any worker failure instead of ending the stream silently
+            await closer
+        finally:
+            for task in (*workers, closer):
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# Price History API
+async def get_history_db(request: Request):
+    if not PRICE_HISTORY_ENABLED:
+        raise HTTPException(status_code=404, detail="Price history is disabled")
+    async with request.app.state.history_pool.acquire() as db:
+        yield db
+
+
+def observation_from_row(upc: str, merchant: str, observed_at: int, price: float, in_stock: int) -> PriceObservation:
+    return PriceObservation(
+        upc=upc,
+        merchant=merchant,
+        price=price,
+        in_stock=bool(in_stock),
+        observed_at=datetime.fromtimestamp(observed_at).isoformat()
+    )
+
+
+@app.get("/api/history/merchants/{merchant}/latest", response_model=List[PriceObservation])
+async def get_merchant_latest_prices(
+    merchant: str,
+    limit: int = Query(100, ge=1, le=1000),
+    db: aiosqlite.Connection = Depends(get_history_db)
+):
+    """Get a merchant's most recently observed price for each UPC, newest first"""
+    cursor = await db.execute("""
+        SELECT upc, merchant, observed_at, price, in_stock FROM latest_prices
+        WHERE merchant = ?
+        ORDER BY observed_at DESC
+        LIMIT ?
+    """, (merchant, limit))
+    rows = await cursor.fetchall()
+    
+    return [observation_from_row(*row) for row in rows]
+
+
+@app.get("/api/history/{upc}", response_model=List[PriceObservation])
+async def get_price_history(
+    upc: str,
+    merchant: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: aiosqlite.Connection = Depends(get_history_db)
+):
+    """Get a UPC's recent price observations, newest first"""
+    query = "SELECT upc, merchant, observed_at, price, in_stock FROM price_history WHERE upc = ?"
+    values: List[Any] = [upc]
+    if merchant is not None:
+        query += " AND merchant = ?"
+        values.append(merchant)
+    if since is not None:
+        query += " AND observed_at >= ?"
+        values.append(int(since.timestamp()))
+    query += " ORDER BY observed_at DESC LIMIT ?"
+    values.append(limit)
+    
+    cursor = await db.execute(query, values)
+    rows = await cursor.fetchall()
+    
+    return [observation_from_row(*row) for row in rows]
+
+
+# Catalog Refresh API
+WATCHLIST_IMPORT_CHUNK = 1000
+
+
+def parse_watchlist_csv(lines) -> Any:
+    """Yield (upc, popularity) from `upc[,popularity]` CSV rows; a header row is skipped"""
+    for line_number, row in enumerate(csv.reader(lines), start=1):
+        if not row or not row[0].strip():
+            continue
+        upc = row[0].strip()
+        if line_number == 1 and upc.lower() == "upc":
+            continue
+        try:
+            popularity = float(row[1]) if len(row) > 1 and row[1].strip() else 1.0
+        except ValueError:
+            raise ValueError(f"Line {line_number}: invalid popularity {row[1]!r}")
+        if popularity <= 0 or len(upc) > 50:
+            raise ValueError(f"Line {line_number}: popularity must be positive and UPCs at most 50 characters")
+        yield upc, popularity
+
+
+async def upsert_watchlist(db: aiosqlite.Connection, rows: List[Tuple[str, float]]):
+    await db.executemany("""
+        INSERT INTO watchlist (upc, popularity) VALUES (?, ?)
+        ON CONFLICT(upc) DO UPDATE SET popularity = excluded.popularity
+    """, rows)
+
+
+async def bump_watchlist_version(db: aiosqlite.Connection):
+    """Tell the refresh engine (possibly in another worker) to reload the watchlist"""
+    await db.execute("UPDATE watchlist_version SET version = version + 1 WHERE id = 1")
+
+
+@app.get("/api/watchlist")
+async def get_watchlist(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """List watchlisted UPCs, most popular first"""
+    cursor = await db.execute("SELECT COUNT(*) FROM watchlist")
+    total = (await cursor.fetchone())[0]
+    cursor = await db.execute("""
+        SELECT upc, popularity, last_refreshed_at FROM watchlist
+        ORDER BY popularity DESC, upc
+        LIMIT ? OFFSET ?
+    """, (limit, offset))
+    rows = await cursor.fetchall()
+    
+    return {
+        "total": total,
+        "items": [
+            {
+                "upc": upc,
+                "popularity": popularity,
+                "refresh_interval_seconds": refresh_interval(popularity),
+                "last_refreshed_at": datetime.fromtimestamp(last_refreshed_at).isoformat() if last_refreshed_at else None
+            }
+            for upc, popularity, last_refreshed_at in rows
+        ]
+    }
+
+
+@app.post("/api/watchlist")
+async def add_to_watchlist(update: WatchlistUpdate, db: aiosqlite.Connection = Depends(get_db)):
+    """Add UPCs to the watchlist, or change the popularity of ones already on it"""
+    await upsert_watchlist(db, [(item.upc, item.popularity) for item in update.items])
+    await bump_watchlist_version(db)
+    await db.commit()
+    
+    return {"message": "Watchlist updated", "upserted": len(update.items)}
+
+
+@app.post("/api/watchlist/import")
+async def import_watchlist(file: UploadFile = File(...), db: aiosqlite.Connection = Depends(get_db)):
+    """Bulk-load the watchlist from a CSV of `upc[,popularity]` rows"""
+    imported = 0
+    chunk: List[Tuple[str, float]] = []
+    try:
+        for row in parse_watchlist_csv(io.TextIOWrapper(file.file, encoding="utf-8-sig")):
+            chunk.append(row)
+            if len(chunk) >= WATCHLIST_IMPORT_CHUNK:
+                await upsert_watchlist(db, chunk)
+                imported += len(chunk)
+                chunk = []
+        await upsert_watchlist(db, chunk)
+        imported += len(chunk)
+    except (ValueError, UnicodeDecodeError) as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    await bump_watchlist_version(db)
+    await db.commit()
+    
+    return {"message": "Watchlist imported", "upserted": imported}
+
+
+@app.delete("/api/watchlist/{upc}")
+async def remove_from_watchlist(upc: str, db: aiosqlite.Connection = Depends(get_db)):
+    """Stop refreshing a UPC"""
+    cursor = await db.execute("DELETE FROM watchlist WHERE upc = ?", (upc,))
+    if cursor.rowcount == 0:
+        raise HTTPException(status_code=404, detail="UPC not on the watchlist")
+    await bump_watchlist_version(db)
+    await db.commit()
+    
+    return {"message": "UPC removed from the watchlist"}
+
+
+@app.get("/api/refresh/status")
+async def get_refresh_status(db: aiosqlite.Connection = Depends(get_db)):
+    """Catalog refresh progress and throughput, as last published by the worker running the engine"""
+    if not REFRESH_ENABLED:
+        return catalog_refresher.stats()
+    cursor = await db.execute("SELECT stats, updated_at FROM refresh_status WHERE id = 1")
+    row = await cursor.fetchone()
+    if row is None:
+        # No worker has started the engine yet
+        return catalog_refresher.stats()
+    return {**json.loads(row[0]), "updated_at": datetime.fromtimestamp(row[1]).isoformat()}
+
+
+# Price Analytics API
+@app.get("/api/analytics/prices")
+async def get_price_analytics(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: int = Query(PRICE_ANALYTICS_DEFAULT_BUCKET, ge=60, le=30 * 86400)
+):
+    """Per-merchant price index, best in-stock price share and volatility, and price spread across the catalog
+    
+    Defaults to the last PRICE_ANALYTICS_DEFAULT_DAYS days. `bucket` is the
+    length in seconds of one comparison round per UPC.
+    """
+    if np is None:
+        raise HTTPException(status_code=503, detail="Price analytics require numpy")
+    if not PRICE_HISTORY_ENABLED:
+        raise HTTPException(status_code=404, detail="Price history is disabled")
+    until_ts = int(until.timestamp()) if until is not None else int(time.time()) + 1
+    since_ts = int(since.timestamp()) if since is not None else until_ts - int(PRICE_ANALYTICS_DEFAULT_DAYS * 86400)
+    if since_ts >= until_ts:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    
+    started = time.perf_counter()
+    # Sync and scan off the event loop: both are long, blocking, numpy/SQLite-bound work
+    await asyncio.to_thread(price_columns.sync)
+    columns, merchants = price_columns.columns()
+    result = await asyncio.to_thread(compute_price_analytics, columns, merchants, since_ts, until_ts, bucket)
+    
+    return {
+        "since": datetime.fromtimestamp(since_ts).isoformat(),
+        "until": datetime.fromtimestamp(until_ts).isoformat(),
+        "bucket_seconds": bucket,
+        **result,
+        "rows_scanned": len(columns["observed_at"]),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+# Metrics API
+def connector_stats(connector: Optional[aiohttp.BaseConnector]) -> Dict[str, int]:
+    """Connection counts of the shared aiohttp connector"""
+    # aiohttp has no public connection counts; its private fields fall back to
+    # zero so a connector without them (another aiohttp version) cannot break a scrape
+    if connector is None or connector.closed:
+        return {"limit": HTTP_POOL_SIZE, "in_use": 0, "idle": 0}
+    return {
+        "limit": connector.limit,
+        "in_use": len(getattr(connector, "_acquired", ())),
+        "idle": sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+    }
+
+
+def _database_pools():
+    pools = {"endpoints": getattr(app.state, "db_pool", None), "history": getattr(app.state, "history_pool", None)}
+    return {name: pool.stats() for name, pool in pools.items() if pool is not None}
+
+
+def _http_pool_samples():
+    session = getattr(app.state, "http_session", None)
+    stats = connector_stats(session.connector if session is not None else None)
+    return [((state,), stats[state]) for state in ("in_use", "idle")]
+
+
+def _sqlite_pool_samples():
+    samples = []
+    for name, stats in _database_pools().items():
+        samples.append(((name, "idle"), stats["idle"]))
+        samples.append(((name, "in_use"), stats["size"] - stats["idle"]))
+    return samples
+
+
+def _cache_lookup_samples():
+    return [(("hit",), price_cache.hits), (("stale",), price_cache.stale_hits), (("miss",), price_cache.misses)]
+
+
+metrics.register(CallbackMetric(
+    "http_pool_connections", "Merchant HTTP connection pool usage", "gauge", ("state",), _http_pool_samples
+))
+metrics.register(CallbackMetric(
+    "http_pool_limit", "Merchant HTTP connection pool size", "gauge", (), lambda: [((), HTTP_POOL_SIZE)]
+))
+metrics.register(CallbackMetric(
+    "sqlite_pool_connections", "SQLite connection pool usage", "gauge", ("pool", "state"), _sqlite_pool_samples
+))
+metrics.register(CallbackMetric(
+    "price_cache_lookups_total", "Price cache lookups by result", "counter", ("result",), _cache_lookup_samples
+))
+metrics.register(CallbackMetric(
+    "price_cache_evictions_total", "Price cache LRU evictions", "counter", (), lambda: [((), price_cache.evictions)]
+))
+metrics.register(CallbackMetric(
+    "price_cache_entries", "Entries in the price cache", "gauge", (), lambda: [((), price_cache.stats()["entries"])]
+))
+metrics.register(CallbackMetric(
+    "price_cache_hit_ratio", "Fresh and stale hits over all lookups", "gauge", (),
+    lambda: [((), price_cache.stats()["hit_rate"])]
+))
+metrics.register(CallbackMetric(
+    "price_upstream_calls_total", "Merchant fetches started by the single-flight leader", "counter", (),
+    lambda: [((), price_flights.leaders)]
+))
+metrics.register(CallbackMetric(
+    "price_coalesced_requests_total", "Fetches that joined an in-flight request", "counter", (),
+    lambda: [((), price_flights.coalesced)]
+))
+metrics.register(CallbackMetric(
+    "price_coalesce_ratio", "Coalesced fetches over all fetches", "gauge", (),
+    lambda: [((), price_flights.stats()["coalesce_rate"])]
+))
+# Scrapes only read existing state: a merchant not called yet has nothing queued, shed or open,
+# and creating its entry here would use up the health restored from the warm snapshot
+def _scheduler_samples(counts: Callable[[MerchantScheduler], Any]):
+    samples = []
+    for endpoint in endpoint_registry.active:
+        scheduler = request_scheduler.peek(endpoint.id)
+        for priority, name in PRIORITY_NAMES.items():
+            samples.append(((endpoint.name, name), counts(scheduler)[priority] if scheduler is not None else 0))
+    return samples
+
+
+def _circuit_open_samples():
+    samples = []
+    for endpoint in endpoint_registry.active:
+        health = merchant_health.peek(endpoint.id)
+        samples.append(((endpoint.name,), int(health is not None and health.state != MerchantHealth.CLOSED)))
+    return samples
+
+
+metrics.register(CallbackMetric(
+    "scheduler_queue_depth", "Requests waiting for a merchant's rate limit", "gauge", ("merchant", "priority"),
+    lambda: _scheduler_samples(lambda scheduler: scheduler.queued)
+))
+metrics.register(CallbackMetric(
+    "scheduler_shed_total", "Requests shed instead of queued at a merchant's rate limit", "counter",
+    ("merchant", "priority"),
+    lambda: _scheduler_samples(lambda scheduler: scheduler.shed)
+))
+metrics.register(CallbackMetric(
+    "merchant_circuit_open", "1 if the merchant's circuit breaker is not closed", "gauge", ("merchant",),
+    _circuit_open_samples
+))
+
+metrics.register(CallbackMetric(
+    "merchant_probe_up", "1 if the merchant's canary probes are passing, 0 if it is skipped as down", "gauge",
+    ("merchant",),
+    lambda: [
+        ((endpoint.name,), int(not merchant_prober.is_down(endpoint.id)))
+        for endpoint in endpoint_registry.active
+        if merchant_prober.get(endpoint.id) is not None
+    ]
+))
+
+
+@app.get("/api/metrics", response_class=Response)
+async def get_metrics():
+    """Prometheus text exposition of request, merchant, pool and cache metrics"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/stats")
+async def get_stats():
+    """Price cache, request coalescing, database pool and per-merchant health counters"""
+    return {
+        "cache": price_cache.stats(),
+        "coalescing": price_flights.stats(),
+        "database_pool": app.state.db_pool.stats(),
+        "merchants": merchant_health.stats(),
+        "endpoint_sync": endpoint_sync.stats(),
+        "scheduler": request_scheduler.stats(),
+        "price_history": price_history.stats(),
+        "catalog_refresh": catalog_refresher.stats(),
+        "price_analytics": price_columns.stats(),
+        "warm_snapshot": merchant_health.snapshot.stats() if merchant_health.snapshot is not None else None,
+        "prewarm": connection_prewarmer.stats(),
+        "logging": {"queued": log_handler.queue.qsize(), "dropped": log_handler.dropped}
+    }
+
+
+# Profiling API
+class StackSampler:
+    """Sample Python stacks from a helper thread at a fixed interval
+    
+    Nothing is hooked into the sampled threads (no settrace/setprofile): each
+    tick reads sys._current_frames(), so a running profile costs one stack walk
+    per interval and an idle server pays nothing.
+    """
+    
+    def __init__(self, thread_id: Optional[int], interval: float):
+        # None samples every thread but the sampler itself
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self.samples = 0
+        self.idle_samples = 0
+        self._labels: Dict[Any, str] = {}
+    
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            short = os.path.join(*filename.split(os.sep)[-2:]) if os.sep in filename else filename
+            label = self._labels[code] = f"{code.co_name} ({short}:{code.co_firstlineno})"
+        return label
+    
+    def sample(self, frame, thread_name: Optional[str] = None):
+        self.samples += 1
+        # An event loop waiting in select() is idle, not hot
+        if frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+            self.idle_samples += 1
+            return
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        if thread_name is not None:
+            stack.append(f"thread {thread_name}")
+        stack.reverse()
+        key = tuple(stack)
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+    
+    def run(self, seconds: float):
+        """Sample for `seconds` (blocking; run it in a thread)"""
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                if frame is not None:
+                    self.sample(frame)
+            else:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in frames.items():
+                    if thread_id != own:
+                        self.sample(frame, names.get(thread_id, str(thread_id)))
+            del frames
+            time.sleep(self.interval)
+    
+    def report(self, limit: int) -> Dict[str, Any]:
+        busy = sum(self.stacks.values())
+        self_counts: Dict[str, int] = {}
+        total_counts: Dict[str, int] = {}
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] = self_counts.get(stack[-1], 0) + count
+            for label in set(stack):
+                total_counts[label] = total_counts.get(label, 0) + count
+        hottest = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)[:limit]
+        functions = sorted(total_counts, key=lambda label: (self_counts.get(label, 0), total_counts[label]), reverse=True)
+        return {
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "stacks": [
+                {"count": count, "percent": round(100 * count / busy, 1), "stack": list(stack)}
+                for stack, count in hottest
+            ],
+            "functions": [
+                {"function": label, "self": self_counts.get(label, 0), "total": total_counts[label]}
+                for label in functions[:limit]
+            ]
+        }
+    
+    def folded(self) -> str:
+        """One "frame;frame;frame count" line per stack (flamegraph.pl / speedscope input)"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.items())
+
+
+profile_lock = asyncio.Lock()
+
+
+def require_admin(x_admin_token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/api/admin/profile")
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    limit: int = Query(30, ge=1, le=1000),
+    format: Literal["json", "folded"] = "json",
+    all_threads: bool = False,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Sample the live server's stacks for `seconds` and return the hottest ones
+    
+    Samples the event loop thread (where requests are handled) unless
+    all_threads is set. Only one profile runs at a time.
+    """
+    require_admin(x_admin_token)
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {PROFILE_MAX_SECONDS:g}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    async with profile_lock:
+        sampler = StackSampler(None if all_threads else threading.get_ident(), interval_ms / 1000)
+        await asyncio.to_thread(sampler.run, seconds)
+    
+    if format == "folded":
+        return Response(sampler.folded(), media_type="text/plain")
+    return {"seconds": seconds, "interval_ms": interval_ms, **sampler.report(limit)}
+
+
+@app.get("/api/health")
+async def health_check():
+    """Health check endpoint"""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "service": "Price Comparison Tool API"
+    }
+
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 503 until merchant connections are pre-warmed
+    
+    /api/health only says the process is up; load balancers should route
+    traffic here so an instance joins the rotation once it is warm.
+    """
+    if not connection_prewarmer.ready:
+        raise HTTPException(status_code=503, detail="Warming up merchant connections")
+    return {
+        "status": "ready",
+        "timestamp": datetime.now().isoformat(),
+        "hosts": {
+            origin: host["connections"] for origin, host in connection_prewarmer.hosts.items()
+        }
+    }
+
+
+@app.get("/")
+async def root():
+    """Root endpoint with API information"""
+    return {
+        "name": "Price Comparison Tool API",
+        "version": "1.0.0",
+        "documentation": "/docs",
+        "health": "/api/health"
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    if WORKERS > 1:
+        # Workers import the app themselves; they share the databases and the SQLite price cache
+        uvicorn.run(
+            "main:app", host="0.0.0.0", port=8000, workers=WORKERS, log_level=LOG_LEVEL.lower(),
+            app_dir=os.path.dirname(os.path.abspath(__file__))
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_level=LOG_LEVEL.lower())
\ No newline at end of file
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the standard and fast JSON paths of the Price Comparison Tool API
+
+Decode: stdlib json vs orjson on recorded Appedia/Micromazon/Googdit payloads.
+Encode: FastAPI response_model processing vs the pre-serialized response
+returned by render_model() in fast JSON mode.
+
+Usage: python3 benchmarks/bench_json.py [--iterations N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Make backend/main.py importable
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import main  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+PAYLOAD_DIR = BENCH_DIR / "payloads"
+MERCHANTS = ["Appedia", "Micromazon", "Googdit"]
+
+
+def load_payloads():
+    """Load the recorded merchant payloads as raw bytes"""
+    return {name: (PAYLOAD_DIR / f"{name.lower()}.json").read_bytes() for name in MERCHANTS}
+
+
+def time_per_call(func, iterations):
+    """Return microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def build_sample_response(payloads):
+    """Build a compare response the way compare_prices does, from the recorded payloads"""
+    results = []
+    for name, raw in payloads.items():
+        price, in_stock = main.parse_api_response(name, json.loads(raw))
+        results.append(main.PriceRecord(
+            merchant=name,
+            price=price,
+            url=f"https://{name.lower()}.example.com/items/101",
+            in_stock=in_stock,
+            error=None if in_stock else "Out of stock"
+        ))
+    return main.build_comparison_response("101", results)
+
+
+async def time_fastapi_encode(response, iterations):
+    """Time FastAPI's default response_model validation + JSONResponse rendering"""
+    field = create_response_field(name="response", type_=main.PriceComparisonResponse, mode="serialization")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        content = await serialize_response(field=field, response_content=response)
+        JSONResponse(content)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main_benchmark(iterations):
+    payloads = load_payloads()
+    print(f"Iterations: {iterations}")
+    print(f"orjson available: {main.orjson is not None}")
+    print("-" * 60)
+    print(f"{'Decode':<28}{'stdlib (us)':>12}{'fast (us)':>12}{'speedup':>8}")
+
+    for name, raw in payloads.items():
+        slow = time_per_call(lambda: json.loads(raw), iterations)
+        if main.orjson is not None:
+            fast = time_per_call(lambda: main.orjson.loads(raw), iterations)
+            print(f"{name + f' ({len(raw)} B)':<28}{slow:>12.2f}{fast:>12.2f}{slow / fast:>7.1f}x")
+        else:
+            print(f"{name + f' ({len(raw)} B)':<28}{slow:>12.2f}{'n/a':>12}{'':>8}")
+
+    response = build_sample_response(payloads)
+    slow = asyncio.run(time_fastapi_encode(response, iterations))
+    fast = time_per_call(
+        lambda: main.Response(content=response.model_dump_json(), media_type="application/json"),
+        iterations
+    )
+    print("-" * 60)
+    print(f"{'Encode':<28}{'default (us)':>12}{'fast (us)':>12}{'speedup':>8}")
+    print(f"{'compare response':<28}{slow:>12.2f}{fast:>12.2f}{slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=int(os.getenv("BENCH_ITERATIONS", "20000")))
+    args = parser.parse_args()
+    main_benchmark(args.iterations)
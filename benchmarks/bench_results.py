@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare the memory and construction cost of merchant results
+
+PriceResult is the Pydantic model in the API schema; PriceRecord is the
+__slots__ object the fetch, cache and compare pipeline uses internally.
+Reports bytes and allocations per result (tracemalloc) and construction time.
+
+Usage: python3 benchmarks/bench_results.py [--count N]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Make backend/main.py importable
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import main  # noqa: E402
+
+
+def build(cls, count, prices, urls):
+    return [
+        cls(merchant="Appedia", price=prices[i], url=urls[i], error=None, in_stock=True)
+        for i in range(count)
+    ]
+
+
+def measure(cls, count, prices, urls):
+    """Return (bytes per result, allocations per result, microseconds per result)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = build(cls, count, prices, urls)
+    size, _ = tracemalloc.get_traced_memory()
+    allocations = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+    del results
+
+    # Timed separately: tracing slows allocation down
+    start = time.perf_counter()
+    results = build(cls, count, prices, urls)
+    elapsed = time.perf_counter() - start
+    del results
+    return size / count, allocations / count, elapsed / count * 1_000_000
+
+
+def main_benchmark(count):
+    prices = [float(i) for i in range(count)]
+    urls = [f"https://appedia.example.com/items/{i}" for i in range(count)]
+    print(f"Results: {count}")
+    print(f"{'':<14}{'bytes':>10}{'allocs':>10}{'us':>10}")
+    rows = {}
+    for cls in (main.PriceResult, main.PriceRecord):
+        rows[cls.__name__] = measure(cls, count, prices, urls)
+        size, allocations, micros = rows[cls.__name__]
+        print(f"{cls.__name__:<14}{size:>10.1f}{allocations:>10.2f}{micros:>10.2f}")
+    model, record = rows["PriceResult"], rows["PriceRecord"]
+    print(f"{'reduction':<14}{model[0] / record[0]:>9.1f}x{model[1] / record[1]:>9.1f}x{model[2] / record[2]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=int(os.getenv("BENCH_COUNT", "200000")))
+    args = parser.parse_args()
+    main_benchmark(args.count)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Load test /api/compare against local simulated merchants
+
+Starts benchmarks/merchant_simulator.py and the backend (uvicorn) as
+subprocesses on a throwaway database whose api_endpoints rows point at the
+simulator, then drives POST /api/compare at each concurrency level and
+reports throughput, p50/p95/p99 latency, errors and backend memory use.
+No network access is needed.
+
+Usage: python3 benchmarks/load_test.py [--concurrency 1,10,50] [--duration 10]
+           [--upcs 1000] [--latency-ms 20] [--error-rate 0.01] [--oos-rate 0.1]
+           [--env PRICE_CACHE_ENABLED=false] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+
+sys.path.insert(0, str(BENCH_DIR))
+from merchant_simulator import URL_TEMPLATES  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_endpoints(env: dict, simulator_url: str):
+    """Create the database with the backend's own schema and point the default merchants at the simulator"""
+    subprocess.run(
+        [sys.executable, "-c", "import asyncio, main; asyncio.run(main.init_db())"],
+        cwd=BACKEND_DIR, env=env, check=True
+    )
+    with sqlite3.connect(env["DATABASE_URL"]) as db:
+        for name, template in URL_TEMPLATES.items():
+            db.execute(
+                "UPDATE api_endpoints SET url = ?, is_active = 1 WHERE name = ?",
+                (template.format(base=simulator_url), name)
+            )
+
+
+def rss_mb(pid: int):
+    """Current and peak resident memory of a process, in MB (Linux only)"""
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None, None
+    values = {}
+    for line in status.splitlines():
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            values[key] = int(value.split()[0]) / 1024
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with status {process.returncode}")
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+async def run_level(base_url: str, concurrency: int, duration: float, upcs: list) -> dict:
+    """Keep `concurrency` compare requests in flight for `duration` seconds"""
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def worker(session):
+        nonlocal errors
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/api/compare", json={"upc": random.choice(upcs)}) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def print_report(results: list):
+    print(f"{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'rss MB':>9}{'peak MB':>9}")
+    for r in results:
+        cells = [r["p50_ms"], r["p95_ms"], r["p99_ms"]]
+        latency = "".join(f"{c:>10.2f}" if c is not None else f"{'n/a':>10}" for c in cells)
+        memory = "".join(f"{m:>9.1f}" if m is not None else f"{'n/a':>9}" for m in (r["rss_mb"], r["peak_rss_mb"]))
+        print(f"{r['concurrency']:>6}{r['throughput_rps']:>10.1f}{latency}{r['errors']:>8}{memory}")
+
+
+def main_benchmark(args: argparse.Namespace):
+    levels = [int(level) for level in args.concurrency.split(",")]
+    upcs = [f"{100000000000 + i}" for i in range(args.upcs)]
+    simulator_port, backend_port = free_port(), free_port()
+    simulator_url = f"http://127.0.0.1:{simulator_port}"
+    base_url = f"http://127.0.0.1:{backend_port}"
+
+    with tempfile.TemporaryDirectory(prefix="price-bench-") as workdir:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": os.path.join(workdir, "api_endpoints.db"),
+            "PRICE_HISTORY_DATABASE_URL": os.path.join(workdir, "price_history.db"),
+            "PRICE_CACHE_DATABASE_URL": os.path.join(workdir, "price_cache.db"),
+            "PRICE_ANALYTICS_DIR": os.path.join(workdir, "price_analytics"),
+            # Start cold and leave no snapshot behind in backend/
+            "WARM_SNAPSHOT_PATH": os.path.join(workdir, "warm_snapshot.db"),
+            "LOG_LEVEL": "error",
+        })
+        for item in args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+        seed_endpoints(env, simulator_url)
+
+        simulator = subprocess.Popen([
+            sys.executable, str(BENCH_DIR / "merchant_simulator.py"), "--port", str(simulator_port),
+            "--latency-ms", str(args.latency_ms), "--latency-sigma", str(args.latency_sigma),
+            "--error-rate", str(args.error_rate), "--oos-rate", str(args.oos_rate),
+            *[arg for spec in args.profile for arg in ("--profile", spec)]
+        ])
+        backend = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(backend_port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env
+        )
+        try:
+            asyncio.run(wait_until_ready(f"{simulator_url}/googdit/0", simulator))
+            asyncio.run(wait_until_ready(f"{base_url}/api/health", backend))
+            print(f"Simulator: {simulator_url}  Backend: {base_url}  Duration: {args.duration}s per level  UPCs: {args.upcs}")
+
+            results = []
+            for concurrency in levels:
+                result = asyncio.run(run_level(base_url, concurrency, args.duration, upcs))
+                result["rss_mb"], result["peak_rss_mb"] = rss_mb(backend.pid)
+                results.append(result)
+            print_report(results)
+        finally:
+            for process in (backend, simulator):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "results": results}, indent=2))
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--upcs", type=int, default=1000, help="distinct UPCs to draw from (smaller = more cache hits)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated merchant median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="simulated latency log-normal shape")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="simulated HTTP 503 rate")
+    parser.add_argument("--oos-rate", type=float, default=0.1, help="simulated out-of-stock ratio")
+    parser.add_argument("--profile", action="append", default=[], metavar="NAME:key=value,...",
+                        help="per-merchant simulator override (see merchant_simulator.py)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra backend environment, e.g. PRICE_CACHE_ENABLED=false")
+    parser.add_argument("--json", help="also write results to this file")
+    main_benchmark(parser.parse_args())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Appedia, Micromazon and Googdit merchant APIs
+
+Each merchant answers in its real response format with a configurable
+latency distribution (log-normal around a median), HTTP error rate and
+out-of-stock ratio. Prices are derived from the UPC, so the same UPC always
+gets the same price from the same merchant.
+
+Routes (relative to http://HOST:PORT):
+    /appedia?upc={upc}
+    /micromazon/{upc}
+    /googdit/{upc}
+
+Usage: python3 benchmarks/merchant_simulator.py [--port 9100] [--latency-ms 20]
+           [--error-rate 0.01] [--oos-rate 0.1] [--profile googdit:latency_ms=80,error_rate=0.05]
+"""
+
+import argparse
+import asyncio
+import random
+import zlib
+
+from aiohttp import web
+
+MERCHANTS = ("appedia", "micromazon", "googdit")
+
+# URL templates for api_endpoints, keyed by the default merchant names
+URL_TEMPLATES = {
+    "Appedia": "{base}/appedia?upc={{upc}}",
+    "Micromazon": "{base}/micromazon/{{upc}}",
+    "Googdit": "{base}/googdit/{{upc}}",
+}
+
+
+class MerchantProfile:
+    """Latency, error and stock behaviour of one simulated merchant"""
+
+    FIELDS = {"latency_ms": float, "latency_sigma": float, "error_rate": float, "oos_rate": float, "locations": int}
+
+    def __init__(self, latency_ms=20.0, latency_sigma=0.5, error_rate=0.0, oos_rate=0.1, locations=40):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.oos_rate = oos_rate
+        self.locations = locations
+
+    def copy(self, **overrides) -> "MerchantProfile":
+        values = {field: getattr(self, field) for field in self.FIELDS}
+        values.update(overrides)
+        return MerchantProfile(**values)
+
+    def delay(self) -> float:
+        """Seconds to wait before answering (log-normal, median latency_ms)"""
+        if self.latency_ms <= 0:
+            return 0.0
+        return random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000
+
+
+def parse_profile(spec: str, base: MerchantProfile) -> tuple:
+    """Parse NAME:key=value,... into (merchant, MerchantProfile)"""
+    name, _, settings = spec.partition(":")
+    name = name.strip().lower()
+    if name not in MERCHANTS:
+        raise argparse.ArgumentTypeError(f"unknown merchant {name!r} (expected one of {', '.join(MERCHANTS)})")
+    overrides = {}
+    for item in filter(None, settings.split(",")):
+        key, _, value = item.partition("=")
+        if key not in MerchantProfile.FIELDS:
+            raise argparse.ArgumentTypeError(f"unknown profile setting {key!r}")
+        overrides[key] = MerchantProfile.FIELDS[key](value)
+    return name, base.copy(**overrides)
+
+
+def base_price(merchant: str, upc: str) -> float:
+    """Stable per-merchant price between $1.00 and $20.99"""
+    return 1 + zlib.crc32(f"{merchant}:{upc}".encode()) % 2000 / 100
+
+
+def appedia_payload(upc: str, profile: MerchantProfile) -> dict:
+    in_stock = random.random() >= profile.oos_rate
+    return {"price": f"${base_price('appedia', upc):.2f}", "stock": random.randint(1, 20) if in_stock else 0}
+
+
+def micromazon_payload(upc: str, profile: MerchantProfile) -> dict:
+    return {"available": random.random() >= profile.oos_rate, "price": base_price("micromazon", upc)}
+
+
+def googdit_payload(upc: str, profile: MerchantProfile) -> dict:
+    in_stock = random.random() >= profile.oos_rate
+    locations = [{"l": random.randint(1000, 9999), "q": 0} for _ in range(max(profile.locations, 1))]
+    if in_stock:
+        random.choice(locations)["q"] = random.randint(1, 9)
+    return {"a": locations, "p": int(round(base_price("googdit", upc) * 100)) * 1000000}
+
+
+PAYLOADS = {"appedia": appedia_payload, "micromazon": micromazon_payload, "googdit": googdit_payload}
+
+
+def create_simulator_app(profiles: dict) -> web.Application:
+    """Build the simulator app; `profiles` maps merchant name to MerchantProfile"""
+
+    def handler(merchant: str):
+        profile = profiles[merchant]
+        build = PAYLOADS[merchant]
+
+        async def handle(request: web.Request) -> web.Response:
+            upc = request.match_info.get("upc") or request.query.get("upc", "")
+            await asyncio.sleep(profile.delay())
+            if random.random() < profile.error_rate:
+                return web.json_response({"error": "simulated failure"}, status=503)
+            return web.json_response(build(upc, profile))
+
+        return handle
+
+    app = web.Application()
+    app.router.add_get("/appedia", handler("appedia"))
+    app.router.add_get("/micromazon/{upc}", handler("micromazon"))
+    app.router.add_get("/googdit/{upc}", handler("googdit"))
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="median response latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal shape (0 = constant latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 503")
+    parser.add_argument("--oos-rate", type=float, default=0.1, help="fraction of answers that are out of stock")
+    parser.add_argument("--locations", type=int, default=40, help="Googdit store locations per response")
+    parser.add_argument("--profile", action="append", default=[], metavar="NAME:key=value,...",
+                        help="per-merchant override, e.g. googdit:latency_ms=80,error_rate=0.05")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible runs")
+    return parser
+
+
+def profiles_from_args(args: argparse.Namespace) -> dict:
+    base = MerchantProfile(args.latency_ms, args.latency_sigma, args.error_rate, args.oos_rate, args.locations)
+    profiles = {merchant: base.copy() for merchant in MERCHANTS}
+    for spec in args.profile:
+        name, profile = parse_profile(spec, base)
+        profiles[name] = profile
+    return profiles
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    web.run_app(create_simulator_app(profiles_from_args(args)), host=args.host, port=args.port, print=None)
@@ -1,70 +1,260 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server for serving the Price Comparison Tool frontend
+HTTP server for serving the Price Comparison Tool frontend
+
+Serves each connection on its own thread, negotiates precompressed
+brotli/gzip variants, sends ETag/Last-Modified validators and answers
+conditional requests with 304 Not Modified. Static assets get a long-lived
+Cache-Control; HTML is revalidated on every load so deploys show up at once.
 """
 
+import email.utils
+import gzip
 import http.server
-import socketserver
+import mimetypes
 import os
 import sys
+import threading
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are generated
+    brotli = None
+
 # Configuration
-PORT = 3010
+PORT = int(os.getenv("FRONTEND_PORT", "3010"))
 FRONTEND_DIR = Path(__file__).parent
+# HTML is revalidated (cheap 304s via ETag); other assets are cached for a day by default
+HTML_CACHE_CONTROL = os.getenv("FRONTEND_HTML_CACHE_CONTROL", "no-cache")
+STATIC_CACHE_CONTROL = os.getenv("FRONTEND_STATIC_CACHE_CONTROL", "public, max-age=86400")
+# Development mode restores the old never-cache behaviour
+DEV_MODE = os.getenv("FRONTEND_DEV", "false").lower() == "true"
+ACCESS_LOG = os.getenv("FRONTEND_ACCESS_LOG", "true").lower() == "true"
+REQUEST_QUEUE_SIZE = int(os.getenv("FRONTEND_REQUEST_QUEUE_SIZE", "128"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 256
+# Preference order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class StaticFile:
+    """A file's bytes and its compressed variants, valid for one (mtime, size)"""
+
+    def __init__(self, path: Path, stat: os.stat_result):
+        self.mtime = int(stat.st_mtime)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.content_type = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+        tag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        self.variants = {None: (path.read_bytes(), f'"{tag}"')}
+
+        if not self.content_type.startswith(COMPRESSIBLE_TYPES) or stat.st_size < MIN_COMPRESS_SIZE:
+            return
+        raw = self.variants[None][0]
+        for encoding, suffix in ENCODINGS:
+            body = self._precompressed(path, suffix, stat)
+            if body is None:
+                if encoding == "gzip":
+                    body = gzip.compress(raw, compresslevel=9, mtime=0)
+                elif encoding == "br" and brotli is not None:
+                    body = brotli.compress(raw)
+            if body is not None and len(body) < len(raw):
+                self.variants[encoding] = (body, f'"{tag}-{encoding}"')
+
+    @staticmethod
+    def _precompressed(path: Path, suffix: str, stat: os.stat_result):
+        """Bytes of a build-time variant (index.html.br / index.html.gz) that is not older than the file"""
+        variant = path.with_name(path.name + suffix)
+        try:
+            if variant.stat().st_mtime_ns >= stat.st_mtime_ns:
+                return variant.read_bytes()
+        except OSError:
+            pass
+        return None
+
+    def negotiate(self, accept_encoding: str):
+        """Pick (encoding, body, etag) for an Accept-Encoding header"""
+        accepted = set()
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(name.strip().lower())
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return (encoding, *self.variants[encoding])
+        return (None, *self.variants[None])
+
+
+class StaticFileCache:
+    """In-memory StaticFile per path, rebuilt when the file changes on disk"""
+
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path):
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        cached = self._files.get(path)
+        if cached is not None and cached.signature == (stat.st_mtime_ns, stat.st_size):
+            return cached
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is None or cached.signature != (stat.st_mtime_ns, stat.st_size):
+                cached = self._files[path] = StaticFile(path, stat)
+        return cached
+
+
+static_files = StaticFileCache()
 
 
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    """Custom HTTP request handler with CORS support"""
-    
+    """Static file handler with CORS, compression and HTTP caching"""
+
+    # Keep-alive, so a page load reuses one connection for all of its assets
+    protocol_version = "HTTP/1.1"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(FRONTEND_DIR), **kwargs)
-    
+
     def end_headers(self):
         # Add CORS headers
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
         super().end_headers()
-    
+
     def do_OPTIONS(self):
         """Handle preflight requests"""
         self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.serve_static(include_body=True)
+
+    def do_HEAD(self):
+        self.serve_static(include_body=False)
+
+    def resolve(self):
+        """Map the request path to a file under FRONTEND_DIR, or None"""
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            path = path / "index.html"
+        try:
+            path.resolve().relative_to(FRONTEND_DIR.resolve())
+        except ValueError:
+            return None
+        return path if path.is_file() else None
+
+    def cache_control(self, static_file: StaticFile) -> str:
+        if DEV_MODE:
+            return "no-cache, no-store, must-revalidate"
+        return HTML_CACHE_CONTROL if static_file.content_type == "text/html" else STATIC_CACHE_CONTROL
+
+    def not_modified(self, static_file: StaticFile, etag: str) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # Weak comparison: W/"x" matches "x"
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return static_file.mtime <= since
+        return False
+
+    def serve_static(self, include_body: bool):
+        path = self.resolve()
+        static_file = static_files.get(path) if path is not None else None
+        if static_file is None:
+            self.send_error(404, "File not found")
+            return
+
+        encoding, body, etag = static_file.negotiate(self.headers.get("Accept-Encoding", ""))
+        if not DEV_MODE and self.not_modified(static_file, etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", self.cache_control(static_file))
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", static_file.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", static_file.last_modified)
+        self.send_header("Cache-Control", self.cache_control(static_file))
         self.end_headers()
-    
+        if include_body:
+            self.wfile.write(body)
+
     def log_message(self, format, *args):
         """Custom logging format"""
-        print(f"[{self.log_date_time_string()}] {format % args}")
+        if ACCESS_LOG:
+            print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+class FrontendServer(http.server.ThreadingHTTPServer):
+    """One thread per connection, so slow clients never hold up other page loads"""
+
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+def precompress(directory: Path = FRONTEND_DIR):
+    """Write .gz (and .br, if brotli is installed) next to every compressible file"""
+    for path in sorted(directory.rglob("*")):
+        content_type = mimetypes.guess_type(str(path))[0] or ""
+        if not path.is_file() or path.suffix in (".gz", ".br", ".py") or not content_type.startswith(COMPRESSIBLE_TYPES):
+            continue
+        raw = path.read_bytes()
+        path.with_name(path.name + ".gz").write_bytes(gzip.compress(raw, compresslevel=9, mtime=0))
+        if brotli is not None:
+            path.with_name(path.name + ".br").write_bytes(brotli.compress(raw))
+        print(f"Precompressed {path.relative_to(directory)}")
 
 
 def main():
     """Start the HTTP server"""
+    if "--precompress" in sys.argv:
+        precompress()
+        return
+
     try:
         # Change to frontend directory
         os.chdir(FRONTEND_DIR)
-        
+
         # Create server
-        with socketserver.TCPServer(("", PORT), CustomHTTPRequestHandler) as httpd:
+        with FrontendServer(("", PORT), CustomHTTPRequestHandler) as httpd:
             print(f"Frontend server starting on port {PORT}")
             print(f"Serving files from: {FRONTEND_DIR}")
             print(f"Access the application at: http://localhost:{PORT}")
             print(f"Press Ctrl+C to stop the server")
             print("-" * 50)
-            
+
             try:
                 httpd.serve_forever()
             except KeyboardInterrupt:
                 print("\n\nServer stopped by user")
                 sys.exit(0)
-                
+
     except OSError as e:
-        if e.errno == 48:  # Address already in use
+        if e.errno in (48, 98):  # Address already in use (macOS, Linux)
             print(f"Error: Port {PORT} is already in use!")
             print(f"   Try stopping any other servers running on port {PORT}")
-            print(f"   or change the PORT variable in this script")
+            print(f"   or set FRONTEND_PORT to a free port")
         else:
             print(f"Error starting server: {e}")
         sys.exit(1)
@@ -74,4 +264,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
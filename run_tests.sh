@@ -41,11 +41,11 @@ else
 fi
 
 # Run the tests
-echo "Running API parsing tests..."
+echo "Running test suite..."
 cd "$SCRIPT_DIR"
 
 # Run pytest with verbose output
-python3 -m pytest tests/test_api_parsing.py -v --tb=short
+python3 -m pytest tests/ -v --tb=short
 
 if [ $? -eq 0 ]; then
     echo "All tests passed!"
@@ -55,6 +55,6 @@ else
 fi
 
 echo "Test coverage summary:"
-python3 -m pytest tests/test_api_parsing.py --tb=no -q
+python3 -m pytest tests/ --tb=no -q
 
 echo "Test suite completed successfully!"
\ No newline at end of file
@@ -0,0 +1,40 @@
+import sys
+import os
+import importlib.util
+
+# Get the backend directory path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+# Load the main module directly, once for every test module
+spec = importlib.util.spec_from_file_location("main", os.path.join(backend_path, "main.py"))
+main_module = importlib.util.module_from_spec(spec)
+sys.modules["main"] = main_module
+spec.loader.exec_module(main_module)
+
+
+class FakeClock:
+    """Manually advanced clock for deterministic time-based tests"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEndpoint:
+    """Stand-in for a registered endpoint with the attributes the code under test reads"""
+
+    def __init__(self, endpoint_id=1, name=None, url="http://127.0.0.1:1/{upc}", cache_ttl=0):
+        self.id = endpoint_id
+        self.name = name if name is not None else f"Merchant {endpoint_id}"
+        self.url = url
+        self.cache_ttl = cache_ttl
+        self.rate_limit_per_second = None
+
+    def render_url(self, upc):
+        return self.url.replace("{upc}", upc)
+
+
+def make_result(merchant="Appedia", price=4.77, in_stock=True):
+    return main_module.PriceRecord(merchant=merchant, price=price, url="https://example.com", in_stock=in_stock)
@@ -0,0 +1,142 @@
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from conftest import main_module
+
+PriceColumnStore = main_module.PriceColumnStore
+compute_price_analytics = main_module.compute_price_analytics
+
+HOUR = 3600
+START = 1_700_000_000
+
+
+def make_columns(rows):
+    """Columns from (upc_id, merchant_id, observed_at, price, in_stock) tuples"""
+    upc, merchant, observed_at, price, in_stock = zip(*rows)
+    return {
+        "upc_id": np.array(upc, dtype="<i4"),
+        "merchant_id": np.array(merchant, dtype="<i2"),
+        "observed_at": np.array(observed_at, dtype="<i8"),
+        "price": np.array(price, dtype="<f8"),
+        "in_stock": np.array(in_stock, dtype="|u1")
+    }
+
+
+def by_merchant(result):
+    return {row["merchant"]: row for row in result["merchants"]}
+
+
+class TestComputePriceAnalytics:
+    """Test the vectorized aggregates on small hand-checked datasets"""
+
+    def test_best_price_share_and_index(self):
+        """Test that the cheapest in-stock merchant wins each comparison"""
+        columns = make_columns([
+            # UPC 0, hour 0: A is cheapest
+            (0, 0, START, 8.0, 1), (0, 1, START, 10.0, 1), (0, 2, START, 12.0, 1),
+            # UPC 1, hour 0: B is cheapest because A is out of stock
+            (1, 0, START + 10, 1.0, 0), (1, 1, START + 10, 5.0, 1), (1, 2, START + 10, 15.0, 1),
+        ])
+
+        result = compute_price_analytics(columns, ["A", "B", "C"], START, START + HOUR, HOUR)
+        merchants = by_merchant(result)
+
+        assert result["comparisons"] == 2
+        assert result["upcs"] == 2
+        assert merchants["A"]["best_price_wins"] == 1
+        assert merchants["A"]["comparisons"] == 1
+        assert merchants["B"]["best_price_share"] == 0.5
+        assert merchants["C"]["best_price_share"] == 0.0
+        # A priced 8 against an average of 10
+        assert merchants["A"]["price_index"] == 80.0
+        assert result["spread"]["mean"] == 7.0
+
+    def test_last_observation_in_bucket_wins(self):
+        """Test that a later price in the same bucket replaces an earlier one"""
+        columns = make_columns([
+            (0, 0, START, 5.0, 1), (0, 1, START, 6.0, 1),
+            (0, 0, START + 60, 9.0, 1),
+        ])
+
+        result = compute_price_analytics(columns, ["A", "B"], START, START + HOUR, HOUR)
+
+        assert by_merchant(result)["B"]["best_price_wins"] == 1
+        assert result["observations"] == 3
+
+    def test_volatility_and_window(self):
+        """Test volatility across buckets and that rows outside the window are ignored"""
+        columns = make_columns([
+            (0, 0, START, 10.0, 1), (0, 0, START + HOUR, 20.0, 1),
+            (0, 0, START + 5 * HOUR, 1000.0, 1),
+        ])
+
+        result = compute_price_analytics(columns, ["A"], START, START + 2 * HOUR, HOUR)
+
+        assert result["observations"] == 2
+        # std 5 / mean 15
+        assert by_merchant(result)["A"]["volatility"] == round(5 / 15, 4)
+        assert result["comparisons"] == 0
+        assert result["spread"] is None
+
+    def test_empty_window(self):
+        """Test that no data yields empty aggregates instead of errors"""
+        columns = make_columns([(0, 0, START, 10.0, 1)])
+
+        result = compute_price_analytics(columns, ["A"], START + HOUR, START + 2 * HOUR, HOUR)
+
+        assert result["observations"] == 0
+        assert result["merchants"] == []
+
+
+class TestPriceColumnStore:
+    """Test the incremental columnar copy of price_history"""
+
+    def write_history(self, path, rows):
+        with sqlite3.connect(path) as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS price_history (
+                    id INTEGER PRIMARY KEY, upc TEXT, merchant TEXT,
+                    observed_at INTEGER, price REAL, in_stock INTEGER, endpoint_id INTEGER
+                )
+            """)
+            db.executemany(
+                "INSERT INTO price_history (upc, merchant, observed_at, price, in_stock) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def test_sync_appends_only_new_rows(self, tmp_path):
+        """Test that a second sync appends new rows and reuses dictionary ids"""
+        history = str(tmp_path / "history.db")
+        store = PriceColumnStore(str(tmp_path / "columns"), history, clock=lambda: START)
+        self.write_history(history, [("111", "A", START, 1.5, 1), ("222", "B", START, 2.5, 0)])
+
+        assert store.sync()["rows"] == 2
+
+        self.write_history(history, [("111", "B", START + 1, 3.5, 1)])
+        store.sync()
+        columns, merchants = store.columns()
+
+        assert merchants == ["A", "B"]
+        assert list(columns["upc_id"]) == [0, 1, 0]
+        assert list(columns["merchant_id"]) == [0, 1, 1]
+        assert list(columns["price"]) == [1.5, 2.5, 3.5]
+        assert list(columns["in_stock"]) == [1, 0, 1]
+
+    def test_rebuilds_after_interval(self, tmp_path):
+        """Test that the copy is rebuilt so rows deleted from history disappear"""
+        history = str(tmp_path / "history.db")
+        now = [START]
+        store = PriceColumnStore(str(tmp_path / "columns"), history, clock=lambda: now[0])
+        self.write_history(history, [("111", "A", START, 1.5, 1), ("222", "A", START, 2.5, 1)])
+        store.sync()
+
+        with sqlite3.connect(history) as db:
+            db.execute("DELETE FROM price_history WHERE upc = '111'")
+        now[0] += main_module.PRICE_ANALYTICS_REBUILD_INTERVAL
+        store.sync()
+        columns, _ = store.columns()
+
+        assert list(columns["price"]) == [2.5]
+        assert store.stats()["rebuilds"] == 1
@@ -1,15 +1,4 @@
-import sys
-import os
-import importlib.util
-
-# Get the backend directory path
-backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
-
-# Load the main module directly
-spec = importlib.util.spec_from_file_location("main", os.path.join(backend_path, "main.py"))
-main_module = importlib.util.module_from_spec(spec)
-sys.modules["main"] = main_module
-spec.loader.exec_module(main_module)
+from conftest import main_module
 
 # Import the function we need to test
 parse_api_response = main_module.parse_api_response
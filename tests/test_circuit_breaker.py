@@ -0,0 +1,128 @@
+import asyncio
+
+import aiosqlite
+from fastapi.testclient import TestClient
+
+from conftest import main_module, FakeClock
+
+MerchantHealth = main_module.MerchantHealth
+
+
+def make_health(clock):
+    return MerchantHealth(
+        window=10, min_requests=4, failure_rate=0.5, open_seconds=30, half_open_probes=1, clock=clock
+    )
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions and adaptive timeouts"""
+
+    def test_opens_after_failure_rate_reached(self):
+        """Test that the breaker opens once enough requests have failed"""
+        health = make_health(FakeClock())
+        for _ in range(2):
+            health.allow_request()
+            health.record_success(0.1)
+        for _ in range(2):
+            health.allow_request()
+            health.record_failure()
+
+        assert health.state == MerchantHealth.OPEN
+        assert health.allow_request() == False
+        assert health.rejected == 1
+
+    def test_needs_minimum_requests_before_opening(self):
+        """Test that a couple of early failures do not open the breaker"""
+        health = make_health(FakeClock())
+        for _ in range(3):
+            health.allow_request()
+            health.record_failure()
+
+        assert health.state == MerchantHealth.CLOSED
+
+    def test_half_open_probe_closes_on_success(self):
+        """Test that a successful probe after the open period closes the breaker"""
+        clock = FakeClock()
+        health = make_health(clock)
+        for _ in range(4):
+            health.allow_request()
+            health.record_failure()
+
+        clock.now += 31
+
+        assert health.allow_request() == True
+        assert health.state == MerchantHealth.HALF_OPEN
+        # Only one probe at a time
+        assert health.allow_request() == False
+
+        health.record_success(0.2)
+
+        assert health.state == MerchantHealth.CLOSED
+        assert health.failure_rate() == 0.0
+
+    def test_half_open_probe_failure_reopens(self):
+        """Test that a failed probe sends the breaker back to open"""
+        clock = FakeClock()
+        health = make_health(clock)
+        for _ in range(4):
+            health.allow_request()
+            health.record_failure()
+
+        clock.now += 31
+        health.allow_request()
+        health.record_failure()
+
+        assert health.state == MerchantHealth.OPEN
+        assert health.times_opened == 2
+
+    def test_released_probe_slot_can_be_reused(self):
+        """Test that an abandoned probe does not leave the breaker stuck half-open"""
+        clock = FakeClock()
+        health = make_health(clock)
+        for _ in range(4):
+            health.allow_request()
+            health.record_failure()
+
+        clock.now += 31
+        health.allow_request()
+        health.release()
+
+        assert health.allow_request() == True
+
+    def test_timeout_follows_p99_latency(self):
+        """Test that the request timeout adapts to observed latency"""
+        health = make_health(FakeClock())
+        for _ in range(40):
+            health.allow_request()
+            health.record_success(0.4)
+
+        timeout = health.request_timeout()
+
+        assert timeout.total == 0.4 * main_module.ADAPTIVE_TIMEOUT_MULTIPLIER
+        assert timeout.total < main_module.HTTP_TOTAL_TIMEOUT
+
+
+class TestEndpointEditsResetHealth:
+    """Test that endpoint edits drop the breaker and timeout state"""
+
+    def test_toggle_resets_merchant_health(self, tmp_path, monkeypatch):
+        """Test that a re-activated endpoint does not come back with an open circuit"""
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+        monkeypatch.setattr(main_module, "endpoint_registry", main_module.EndpointRegistry())
+        monkeypatch.setattr(main_module, "merchant_health", main_module.MerchantHealthBoard())
+        asyncio.run(main_module.init_db())
+
+        async def endpoints_db():
+            async with aiosqlite.connect(main_module.DATABASE_URL) as db:
+                yield db
+
+        monkeypatch.setitem(main_module.app.dependency_overrides, main_module.get_db, endpoints_db)
+        client = TestClient(main_module.app)
+        main_module.merchant_health.get(1).state = MerchantHealth.OPEN
+
+        assert client.patch("/api/endpoints/1/toggle").status_code == 200
+        assert main_module.merchant_health.peek(1) is None
+
+        main_module.merchant_health.get(1).state = MerchantHealth.OPEN
+        assert client.patch("/api/endpoints/1/toggle").json()["message"] == "Endpoint activated successfully"
+        assert main_module.merchant_health.peek(1) is None
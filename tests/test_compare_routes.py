@@ -0,0 +1,217 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import main_module, FakeEndpoint
+
+PriceRecord = main_module.PriceRecord
+BatchComparisonRequest = main_module.BatchComparisonRequest
+
+
+def install_merchants(monkeypatch, merchants):
+    """Register fake merchants answered by a stub fetch
+
+    `merchants` maps a merchant name to (price, delay in seconds). Returns the
+    list of (merchant, upc) calls made upstream.
+    """
+    endpoints = tuple(FakeEndpoint(endpoint_id, name) for endpoint_id, name in enumerate(merchants, 1))
+    calls = []
+
+    async def fake_fetch(session, endpoint, upc):
+        calls.append((endpoint.name, upc))
+        price, delay = merchants[endpoint.name]
+        await asyncio.sleep(delay)
+        return PriceRecord(merchant=endpoint.name, price=price, url=f"https://example.com/{upc}", in_stock=True)
+
+    monkeypatch.setattr(main_module.endpoint_registry, "_active", endpoints)
+    monkeypatch.setattr(main_module, "fetch_price_from_api", fake_fetch)
+    monkeypatch.setattr(main_module, "merchant_prober", main_module.MerchantProber())
+    monkeypatch.setattr(main_module, "PRICE_HISTORY_ENABLED", False)
+    monkeypatch.setitem(main_module.app.dependency_overrides, main_module.get_http_session, lambda: None)
+    return calls
+
+
+class TestCompareDeadline:
+    """Test /api/compare with and without a response deadline"""
+
+    def test_slow_merchant_is_reported_pending(self, monkeypatch):
+        """Test that a merchant missing the deadline comes back pending and the response is partial"""
+        install_merchants(monkeypatch, {"Appedia": (4.77, 0), "Googdit": (3.99, 1.0)})
+
+        response = TestClient(main_module.app).post("/api/compare", json={"upc": "101", "deadline_ms": 100})
+
+        body = response.json()
+        assert response.status_code == 200
+        assert body["partial"] == True
+        assert [(r["merchant"], r["price"], r["pending"]) for r in body["results"]] == [
+            ("Appedia", 4.77, False),
+            ("Googdit", None, True)
+        ]
+        assert body["results"][1]["error"] == "Deadline exceeded"
+        assert body["best_merchant"] == "Appedia"
+
+    def test_without_deadline_every_merchant_is_awaited(self, monkeypatch):
+        """Test that the default waits for all merchants and picks the best price"""
+        install_merchants(monkeypatch, {"Appedia": (4.77, 0), "Googdit": (3.99, 0.05)})
+        monkeypatch.setattr(main_module, "COMPARE_DEFAULT_DEADLINE_MS", 0)
+
+        body = TestClient(main_module.app).post("/api/compare", json={"upc": "101"}).json()
+
+        assert body["partial"] == False
+        assert (body["best_merchant"], body["best_price"]) == ("Googdit", 3.99)
+
+    def test_down_merchant_keeps_its_place(self, monkeypatch):
+        """Test that results are in endpoint order even when a merchant in the middle is skipped"""
+        install_merchants(monkeypatch, {"Appedia": (4.77, 0.05), "Micromazon": (5.25, 0), "Googdit": (3.99, 0)})
+        monkeypatch.setattr(main_module.merchant_prober, "is_down", lambda endpoint_id: endpoint_id == 2)
+
+        body = TestClient(main_module.app).post("/api/compare", json={"upc": "101"}).json()
+
+        assert [(r["merchant"], r["error"]) for r in body["results"]] == [
+            ("Appedia", None),
+            ("Micromazon", "Merchant down"),
+            ("Googdit", None)
+        ]
+
+    def test_no_active_endpoints(self, monkeypatch):
+        """Test that comparing with nothing configured is a client error"""
+        install_merchants(monkeypatch, {})
+
+        assert TestClient(main_module.app).post("/api/compare", json={"upc": "101"}).status_code == 400
+
+
+def parse_sse(text):
+    """Split a Server-Sent Events body into (event, data) pairs"""
+    events = []
+    for message in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["event"], main_module.json.loads(fields["data"])))
+    return events
+
+
+class TestCompareStream:
+    """Test the /api/compare/stream Server-Sent Events route"""
+
+    def test_results_stream_in_arrival_order_then_done(self, monkeypatch):
+        """Test that each merchant is sent as it answers, with the running best, then a summary"""
+        install_merchants(monkeypatch, {"Appedia": (4.77, 0.1), "Micromazon": (5.25, 0), "Googdit": (3.99, 0.2)})
+
+        response = TestClient(main_module.app).get("/api/compare/stream", params={"upc": "101"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        events = parse_sse(response.text)
+        assert [event for event, _ in events] == ["result", "result", "result", "done"]
+        assert [data["result"]["merchant"] for _, data in events[:3]] == ["Micromazon", "Appedia", "Googdit"]
+        # Each event carries the best in-stock price among the merchants so far
+        assert [data["best_price"] for _, data in events[:3]] == [5.25, 4.77, 3.99]
+        done = events[-1][1]
+        assert [r["merchant"] for r in done["results"]] == ["Appedia", "Micromazon", "Googdit"]
+        assert (done["best_merchant"], done["best_price"]) == ("Googdit", 3.99)
+
+    def test_down_merchant_is_sent_first(self, monkeypatch):
+        """Test that a merchant skipped by the prober is reported at once and keeps its place in the summary"""
+        calls = install_merchants(monkeypatch, {"Appedia": (4.77, 0), "Micromazon": (5.25, 0), "Googdit": (3.99, 0)})
+        monkeypatch.setattr(main_module.merchant_prober, "is_down", lambda endpoint_id: endpoint_id == 2)
+
+        events = parse_sse(TestClient(main_module.app).get("/api/compare/stream", params={"upc": "101"}).text)
+
+        assert events[0][1]["result"]["merchant"] == "Micromazon"
+        assert events[0][1]["result"]["error"] == "Merchant down"
+        assert sorted(calls) == [("Appedia", "101"), ("Googdit", "101")]
+        done = events[-1][1]
+        assert [r["merchant"] for r in done["results"]] == ["Appedia", "Micromazon", "Googdit"]
+        assert done["best_merchant"] == "Googdit"
+
+
+async def read_lines(response, pause_after_first=0.0):
+    """Consume a streaming response body line by line, optionally stalling after the first line"""
+    lines = []
+    async for chunk in response.body_iterator:
+        lines.append(main_module.json.loads(chunk))
+        if len(lines) == 1 and pause_after_first:
+            await asyncio.sleep(pause_after_first)
+    return lines
+
+
+class TestCompareBatch:
+    """Test the /api/compare/batch NDJSON route"""
+
+    def test_every_upc_is_compared_within_the_limits(self, monkeypatch):
+        """Test that global and per-merchant concurrency never exceed the requested limits"""
+        install_merchants(monkeypatch, {"Appedia": (4.77, 0), "Micromazon": (5.25, 0), "Googdit": (3.99, 0)})
+        in_flight = {"total": 0}
+        peaks = {}
+        stub = main_module.fetch_price_from_api
+
+        async def tracked_fetch(session, endpoint, upc):
+            in_flight["total"] += 1
+            in_flight[endpoint.name] = in_flight.get(endpoint.name, 0) + 1
+            for key in ("total", endpoint.name):
+                peaks[key] = max(peaks.get(key, 0), in_flight[key])
+            try:
+                await asyncio.sleep(0.005)
+                return await stub(session, endpoint, upc)
+            finally:
+                in_flight["total"] -= 1
+                in_flight[endpoint.name] -= 1
+
+        monkeypatch.setattr(main_module, "fetch_price_from_api", tracked_fetch)
+        upcs = [str(100 + i) for i in range(20)]
+
+        response = TestClient(main_module.app).post(
+            "/api/compare/batch", json={"upcs": upcs, "max_concurrency": 4, "per_merchant_concurrency": 1}
+        )
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [main_module.json.loads(line) for line in response.text.splitlines()]
+        assert sorted(line["upc"] for line in lines) == upcs
+        assert all(line["best_merchant"] == "Googdit" for line in lines)
+        assert peaks["total"] <= 4
+        assert max(peaks[name] for name in ("Appedia", "Micromazon", "Googdit")) == 1
+
+    def test_slow_reader_applies_backpressure(self, monkeypatch):
+        """Test that workers stop fetching while the bounded output queue is full"""
+        calls = install_merchants(monkeypatch, {"Appedia": (4.77, 0)})
+        upcs = [str(100 + i) for i in range(100)]
+
+        async def scenario():
+            request = BatchComparisonRequest(upcs=upcs, max_concurrency=2)
+            response = await main_module.compare_prices_batch(request, session=None)
+            consumer = asyncio.create_task(read_lines(response, pause_after_first=0.1))
+            await asyncio.sleep(0.05)
+            fetched_while_stalled = len(calls)
+            return fetched_while_stalled, await consumer
+
+        fetched_while_stalled, lines = asyncio.run(scenario())
+
+        # One line read, four queued and one finished comparison held by each of the two workers
+        assert 1 < fetched_while_stalled <= 7
+        assert len(lines) == 100
+
+    def test_worker_failure_ends_the_stream_with_the_error(self, monkeypatch):
+        """Test that an unexpected error for one UPC surfaces instead of silently truncating the stream"""
+        install_merchants(monkeypatch, {"Appedia": (4.77, 0)})
+        stub = main_module.fetch_price_from_api
+
+        async def failing_fetch(session, endpoint, upc):
+            if upc == "bad":
+                raise RuntimeError("parser bug")
+            return await stub(session, endpoint, upc)
+
+        monkeypatch.setattr(main_module, "fetch_price_from_api", failing_fetch)
+
+        async def scenario():
+            request = BatchComparisonRequest(upcs=["101", "bad", "102"], max_concurrency=1)
+            response = await main_module.compare_prices_batch(request, session=None)
+            lines = []
+            with pytest.raises(RuntimeError, match="parser bug"):
+                async for chunk in response.body_iterator:
+                    lines.append(main_module.json.loads(chunk))
+            return lines
+
+        lines = asyncio.run(scenario())
+
+        assert [line["upc"] for line in lines] == ["101"]
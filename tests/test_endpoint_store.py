@@ -0,0 +1,189 @@
+import asyncio
+
+import aiosqlite
+from fastapi.testclient import TestClient
+
+from conftest import main_module
+
+APIEndpoint = main_module.APIEndpoint
+EndpointRegistry = main_module.EndpointRegistry
+SQLitePool = main_module.SQLitePool
+
+
+def make_endpoint(endpoint_id, name="Appedia", is_active=True):
+    return APIEndpoint(id=endpoint_id, name=name, url=f"https://example.com/{endpoint_id}?upc={{upc}}", is_active=is_active)
+
+
+class TestEndpointRegistry:
+    """Test the in-memory active endpoint list used by compares"""
+
+    def test_load_keeps_active_endpoints_in_id_order(self, tmp_path, monkeypatch):
+        """Test that loading reads the seeded endpoints and leaves out inactive ones"""
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+        registry = EndpointRegistry()
+
+        async def scenario():
+            await main_module.init_db()
+            async with aiosqlite.connect(main_module.DATABASE_URL) as db:
+                await db.execute("UPDATE api_endpoints SET is_active = FALSE WHERE id = 2")
+                await db.commit()
+                await registry.load(db)
+
+        asyncio.run(scenario())
+
+        assert [(e.id, e.name) for e in registry.active] == [(1, "Appedia"), (3, "Googdit")]
+        assert registry.active[0].render_url("101").endswith("upc=101")
+
+    def test_put_and_remove_swap_in_a_new_snapshot(self):
+        """Test that edits replace the tuple instead of mutating the one readers hold"""
+        registry = EndpointRegistry()
+        registry.put(make_endpoint(2, "Googdit"))
+        registry.put(make_endpoint(1))
+        snapshot = registry.active
+
+        registry.put(make_endpoint(1, "Renamed"))
+
+        assert [(e.id, e.name) for e in snapshot] == [(1, "Appedia"), (2, "Googdit")]
+        assert [(e.id, e.name) for e in registry.active] == [(1, "Renamed"), (2, "Googdit")]
+        assert registry.active is not snapshot
+
+        snapshot = registry.active
+        registry.remove(2)
+        assert [e.id for e in registry.active] == [1]
+        assert [e.id for e in snapshot] == [1, 2]
+
+    def test_put_inactive_endpoint_drops_it(self):
+        """Test that deactivating an endpoint takes it out of the compare fan-out"""
+        registry = EndpointRegistry()
+        registry.put(make_endpoint(1))
+        registry.put(make_endpoint(2, "Googdit"))
+
+        registry.put(make_endpoint(1, is_active=False))
+
+        assert [e.id for e in registry.active] == [2]
+
+
+class TestSQLitePool:
+    """Test the persistent connection pool for the endpoint store"""
+
+    def test_connections_use_wal_and_configured_pragmas(self, tmp_path, monkeypatch):
+        """Test that pooled connections get the busy timeout and synchronous settings"""
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+        monkeypatch.setattr(main_module, "SQLITE_BUSY_TIMEOUT_MS", 1234)
+        monkeypatch.setattr(main_module, "SQLITE_SYNCHRONOUS", "NORMAL")
+
+        async def scenario():
+            await main_module.init_db()
+            pool = SQLitePool(main_module.DATABASE_URL, 2)
+            await pool.open()
+            try:
+                pragmas = []
+                for _ in range(2):
+                    async with pool.acquire() as db:
+                        row = []
+                        for pragma in ("journal_mode", "busy_timeout", "synchronous"):
+                            cursor = await db.execute(f"PRAGMA {pragma}")
+                            row.append((await cursor.fetchone())[0])
+                        pragmas.append(tuple(row))
+                return pragmas
+            finally:
+                await pool.close()
+
+        # synchronous = NORMAL reads back as 1
+        assert asyncio.run(scenario()) == [("wal", 1234, 1)] * 2
+
+    def test_release_rolls_back_an_open_transaction(self, tmp_path):
+        """Test that uncommitted work never leaks into the next request on the same connection"""
+        async def scenario():
+            pool = SQLitePool(str(tmp_path / "pool.db"), 1)
+            await pool.open()
+            try:
+                async with pool.acquire() as db:
+                    await db.execute("CREATE TABLE t (x INTEGER)")
+                    await db.commit()
+                async with pool.acquire() as db:
+                    await db.execute("INSERT INTO t VALUES (1)")
+                async with pool.acquire() as db:
+                    cursor = await db.execute("SELECT COUNT(*) FROM t")
+                    return db.in_transaction, (await cursor.fetchone())[0]
+            finally:
+                await pool.close()
+
+        assert asyncio.run(scenario()) == (False, 0)
+
+    def test_acquire_waits_for_a_free_connection(self, tmp_path):
+        """Test that at most `size` connections are handed out and a release wakes the next caller"""
+        async def scenario():
+            pool = SQLitePool(str(tmp_path / "pool.db"), 2)
+            await pool.open()
+            try:
+                async with pool.acquire() as first, pool.acquire() as second:
+                    assert first is not second
+                    assert pool.stats() == {"size": 2, "idle": 0}
+
+                    async def third_caller():
+                        async with pool.acquire() as db:
+                            return db
+
+                    waiting = asyncio.create_task(third_caller())
+                    await asyncio.sleep(0.05)
+                    assert not waiting.done()
+                # Both released: the waiting caller gets one of the same two connections
+                third = await asyncio.wait_for(waiting, 1)
+                assert third in (first, second)
+                return pool.stats()
+            finally:
+                await pool.close()
+
+        assert asyncio.run(scenario()) == {"size": 2, "idle": 2}
+
+
+class TestUpdateEndpoint:
+    """Test partial updates through PUT /api/endpoints/{id}"""
+
+    def make_client(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+        monkeypatch.setattr(main_module, "endpoint_registry", EndpointRegistry())
+        asyncio.run(main_module.init_db())
+
+        async def endpoints_db():
+            async with aiosqlite.connect(main_module.DATABASE_URL) as db:
+                yield db
+
+        monkeypatch.setitem(main_module.app.dependency_overrides, main_module.get_db, endpoints_db)
+        return TestClient(main_module.app)
+
+    def test_explicit_null_clears_optional_settings(self, tmp_path, monkeypatch):
+        """Test that sending null resets a setting while omitted fields are left alone"""
+        client = self.make_client(tmp_path, monkeypatch)
+        settings = {
+            "cache_ttl": 30,
+            "response_mapping": {
+                "price_path": "offer.amount",
+                "price_unit": "float",
+                "stock_path": "offer.stock",
+                "stock_rule": "positive"
+            },
+            "rate_limit_per_second": 5,
+            "rate_limit_burst": 2
+        }
+        assert client.put("/api/endpoints/1", json=settings).status_code == 200
+
+        response = client.put("/api/endpoints/1", json={"cache_ttl": None, "rate_limit_per_second": None})
+
+        body = response.json()
+        assert response.status_code == 200
+        assert (body["cache_ttl"], body["rate_limit_per_second"]) == (None, None)
+        assert body["rate_limit_burst"] == 2
+        assert body["response_mapping"]["price_path"] == "offer.amount"
+
+        body = client.put("/api/endpoints/1", json={"response_mapping": None}).json()
+        assert body["response_mapping"] is None
+        assert body["name"] == "Appedia"
+
+    def test_null_required_field_is_rejected(self, tmp_path, monkeypatch):
+        """Test that name, url and is_active cannot be cleared"""
+        client = self.make_client(tmp_path, monkeypatch)
+
+        assert client.put("/api/endpoints/1", json={"name": None}).status_code == 400
+        assert client.put("/api/endpoints/1", json={}).status_code == 400
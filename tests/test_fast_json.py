@@ -0,0 +1,110 @@
+import sys
+import os
+import asyncio
+import json
+import importlib.util
+
+from aiohttp import web
+
+from conftest import backend_path, main_module
+
+
+def load_main_without_orjson(monkeypatch):
+    """A separate copy of main.py imported as if orjson were not installed"""
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    module_spec = importlib.util.spec_from_file_location("main_without_orjson", os.path.join(backend_path, "main.py"))
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return module
+
+
+def fetch_appedia_price(module, payload):
+    """Fetch one price from a local merchant answering with `payload`"""
+    async def scenario():
+        async def handle(request):
+            return web.Response(text=payload, content_type="application/json")
+
+        app = web.Application()
+        app.router.add_get("/item", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        endpoint = module.RegisteredEndpoint(
+            module.APIEndpoint(id=801, name="Appedia", url=f"http://127.0.0.1:{port}/item?upc={{upc}}")
+        )
+        session = module.create_http_session()
+        try:
+            return await module.fetch_price_from_api(session, endpoint, "101")
+        finally:
+            await session.close()
+            await runner.cleanup()
+
+    return asyncio.run(scenario())
+
+
+class TestRenderModel:
+    """Test pre-serialized compare replies"""
+
+    def test_fast_mode_returns_serialized_response(self, monkeypatch):
+        """Test that fast JSON mode hands FastAPI the model's JSON as a ready response"""
+        monkeypatch.setattr(main_module, "FAST_JSON_ENABLED", True)
+        model = main_module.PriceResult(merchant="Appedia", price=4.77, in_stock=True)
+
+        response = main_module.render_model(model)
+
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == model.model_dump()
+
+    def test_standard_mode_returns_the_model(self, monkeypatch):
+        """Test that with fast JSON off FastAPI serializes the model itself"""
+        monkeypatch.setattr(main_module, "FAST_JSON_ENABLED", False)
+        model = main_module.PriceResult(merchant="Appedia", price=4.77)
+
+        assert main_module.render_model(model) is model
+
+
+class TestMerchantPayloadDecoding:
+    """Test decoding merchant responses with and without orjson"""
+
+    def test_fast_and_standard_modes_agree(self, monkeypatch):
+        """Test that the raw-bytes decode path parses the same price as aiohttp's json()"""
+        payload = json.dumps({"price": "$4.77", "stock": 7})
+        results = []
+        for enabled in (True, False):
+            monkeypatch.setattr(main_module, "FAST_JSON_ENABLED", enabled)
+            results.append(fetch_appedia_price(main_module, payload))
+
+        assert [(r.price, r.in_stock, r.error) for r in results] == [(4.77, True, None)] * 2
+
+    def test_stdlib_fallback_without_orjson(self, monkeypatch):
+        """Test that fast JSON mode still works when orjson is not installed"""
+        module = load_main_without_orjson(monkeypatch)
+
+        assert module.orjson is None
+        assert module.json_loads is json.loads
+        result = fetch_appedia_price(module, json.dumps({"price": "$4.77", "stock": 0}))
+        assert (result.price, result.in_stock) == (4.77, False)
+
+    def test_read_decode_and_extract_are_timed_separately(self, monkeypatch):
+        """Test that both modes record the body read, decode and extraction as their own phases"""
+        for enabled in (True, False):
+            monkeypatch.setattr(main_module, "FAST_JSON_ENABLED", enabled)
+            timings = main_module.RequestTimings()
+            token = main_module.request_timings.set(timings)
+            try:
+                fetch_appedia_price(main_module, json.dumps({"price": "$4.77", "stock": 7}))
+            finally:
+                main_module.request_timings.reset(token)
+
+            assert list(timings.phases) == ["read", "decode", "extract"]
+
+    def test_invalid_payload_is_an_error_result(self, monkeypatch):
+        """Test that undecodable bytes become an error result in fast mode"""
+        monkeypatch.setattr(main_module, "FAST_JSON_ENABLED", True)
+
+        result = fetch_appedia_price(main_module, "not json")
+
+        assert result.price is None
+        assert result.error is not None
@@ -0,0 +1,75 @@
+import os
+import gzip
+import threading
+import http.client
+import importlib.util
+
+# Get the frontend directory path
+frontend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend'))
+
+# Load the server module directly
+spec = importlib.util.spec_from_file_location("frontend_server", os.path.join(frontend_path, "server.py"))
+server_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(server_module)
+
+
+class TestFrontendServer:
+    """Test compression negotiation, validators and conditional requests"""
+
+    @classmethod
+    def setup_class(cls):
+        server_module.ACCESS_LOG = False
+        cls.httpd = server_module.FrontendServer(("127.0.0.1", 0), server_module.CustomHTTPRequestHandler)
+        cls.port = cls.httpd.server_address[1]
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def get(self, path="/", **headers):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_gzip_variant_served_when_accepted(self):
+        """Test that index.html is sent gzip-encoded to clients that accept it"""
+        response, body = self.get("/", **{"Accept-Encoding": "gzip"})
+
+        assert response.status == 200
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert response.getheader("Vary") == "Accept-Encoding"
+        assert b"<html" in gzip.decompress(body).lower()
+
+    def test_identity_when_compression_not_accepted(self):
+        """Test that clients without Accept-Encoding get the raw file"""
+        response, body = self.get("/index.html")
+
+        assert response.getheader("Content-Encoding") is None
+        assert b"<html" in body.lower()
+        assert response.getheader("Cache-Control") == server_module.HTML_CACHE_CONTROL
+
+    def test_matching_etag_returns_304(self):
+        """Test that a revalidation with the current ETag gets an empty 304"""
+        first, _ = self.get("/", **{"Accept-Encoding": "gzip"})
+        response, body = self.get("/", **{"Accept-Encoding": "gzip", "If-None-Match": first.getheader("ETag")})
+
+        assert response.status == 304
+        assert body == b""
+
+    def test_if_modified_since_returns_304(self):
+        """Test that Last-Modified based revalidation works without an ETag"""
+        first, _ = self.get("/")
+        response, _ = self.get("/", **{"If-Modified-Since": first.getheader("Last-Modified")})
+
+        assert response.status == 304
+
+    def test_paths_outside_frontend_are_rejected(self):
+        """Test that the server never serves files outside the frontend directory"""
+        response, _ = self.get("/../backend/main.py")
+
+        assert response.status == 404
@@ -0,0 +1,42 @@
+import json
+import queue
+import logging
+
+from conftest import main_module
+
+JsonLogFormatter = main_module.JsonLogFormatter
+DroppingQueueHandler = main_module.DroppingQueueHandler
+
+
+def make_record(message="Merchant price fetched", **fields):
+    record = logging.LogRecord("price_comparison.fetch", logging.INFO, __file__, 1, message, None, None)
+    record.__dict__.update(fields)
+    return record
+
+
+class TestStructuredLogging:
+    """Test JSON log output and the non-blocking queue handler"""
+
+    def test_json_output_includes_structured_fields(self):
+        """Test that merchant, UPC, status and latency appear as JSON fields"""
+        record = make_record(merchant="Appedia", upc="101", status=200, latency_ms=12.5)
+
+        entry = json.loads(JsonLogFormatter().format(record))
+
+        assert entry["level"] == "info"
+        assert entry["message"] == "Merchant price fetched"
+        assert entry["merchant"] == "Appedia"
+        assert entry["upc"] == "101"
+        assert entry["status"] == 200
+        assert entry["latency_ms"] == 12.5
+        assert "error" not in entry
+
+    def test_full_queue_drops_records(self):
+        """Test that logging never blocks when the listener falls behind"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+
+        handler.handle(make_record())
+        handler.handle(make_record())
+
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 1
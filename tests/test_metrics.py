@@ -0,0 +1,93 @@
+from conftest import main_module
+
+Counter = main_module.Counter
+Histogram = main_module.Histogram
+MetricsRegistry = main_module.MetricsRegistry
+MerchantHealth = main_module.MerchantHealth
+
+
+class TestMetrics:
+    """Test counters, fixed-bucket histograms and Prometheus text output"""
+
+    def test_counter_renders_labels(self):
+        """Test that counter samples carry their label values"""
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("merchant_responses_total", "Responses", ("merchant", "status")))
+        counter.inc("Appedia", 200)
+        counter.inc("Appedia", 200)
+        counter.inc("Googdit", 503)
+
+        text = registry.render()
+
+        assert "# TYPE merchant_responses_total counter" in text
+        assert 'merchant_responses_total{merchant="Appedia",status="200"} 2' in text
+        assert 'merchant_responses_total{merchant="Googdit",status="503"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that each bucket counts observations up to and including its bound"""
+        histogram = Histogram("latency_seconds", "Latency", ("merchant",), buckets=(0.1, 0.5, 1.0))
+        for value in (0.05, 0.1, 0.3, 2.0):
+            histogram.observe(value, "Appedia")
+
+        samples = dict(histogram.samples())
+
+        assert samples['latency_seconds_bucket{merchant="Appedia",le="0.1"}'] == 2
+        assert samples['latency_seconds_bucket{merchant="Appedia",le="0.5"}'] == 3
+        assert samples['latency_seconds_bucket{merchant="Appedia",le="1.0"}'] == 3
+        assert samples['latency_seconds_bucket{merchant="Appedia",le="+Inf"}'] == 4
+        assert samples['latency_seconds_count{merchant="Appedia"}'] == 4
+        assert abs(samples['latency_seconds_sum{merchant="Appedia"}'] - 2.45) < 1e-9
+
+    def test_label_values_are_escaped(self):
+        """Test that quotes in merchant names cannot break the exposition format"""
+        counter = Counter("parse_failures_total", "Failures", ("merchant",))
+        counter.inc('Bob\'s "Deals"')
+
+        (sample, value), = counter.samples()
+
+        assert sample == 'parse_failures_total{merchant="Bob\'s \\"Deals\\""}'
+
+
+class FakeSnapshot:
+    """Warm snapshot that records which endpoints' health was restored"""
+
+    def __init__(self):
+        self.restored = []
+
+    def health(self, endpoint_id):
+        self.restored.append(endpoint_id)
+        return None
+
+
+class FakeConnector:
+    """Connector without aiohttp's private bookkeeping fields"""
+
+    closed = False
+    limit = 7
+
+
+class TestMerchantGauges:
+    """Test that scrapes read merchant state without creating it"""
+
+    def test_scrape_does_not_create_schedulers_or_restore_health(self, monkeypatch):
+        """Test that merchants not called yet report zeros and keep their snapshot entry"""
+        endpoint = main_module.RegisteredEndpoint(main_module.APIEndpoint(id=1, name="Appedia", url="https://example.com/{upc}"))
+        monkeypatch.setattr(main_module.endpoint_registry, "_active", (endpoint,))
+        monkeypatch.setattr(main_module, "request_scheduler", main_module.RequestScheduler())
+        monkeypatch.setattr(main_module, "merchant_health", main_module.MerchantHealthBoard())
+        snapshot = main_module.merchant_health.snapshot = FakeSnapshot()
+
+        text = main_module.metrics.render()
+
+        assert 'scheduler_queue_depth{merchant="Appedia",priority="interactive"} 0' in text
+        assert 'merchant_circuit_open{merchant="Appedia"} 0' in text
+        assert main_module.request_scheduler.stats() == {}
+        assert main_module.merchant_health.stats() == {}
+        assert snapshot.restored == []
+
+        main_module.merchant_health.get(1).state = MerchantHealth.OPEN
+        assert 'merchant_circuit_open{merchant="Appedia"} 1' in main_module.metrics.render()
+
+    def test_connector_without_private_counts(self):
+        """Test that pool gauges fall back to zero instead of failing the scrape"""
+        assert main_module.connector_stats(FakeConnector()) == {"limit": 7, "in_use": 0, "idle": 0}
@@ -0,0 +1,96 @@
+import asyncio
+
+from aiohttp import web
+
+from conftest import main_module, FakeEndpoint
+
+ConnectionPrewarmer = main_module.ConnectionPrewarmer
+endpoint_origin = main_module.endpoint_origin
+connector_stats = main_module.connector_stats
+
+
+async def start_server(peers):
+    """Local merchant host that records the client port of every request"""
+    async def handle(request):
+        peers.add(request.transport.get_extra_info("peername")[1])
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_route("HEAD", "/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+class TestEndpointOrigin:
+    """Test mapping URL templates to the host to warm"""
+
+    def test_origin_of_template(self):
+        """Test that the path and {upc} placeholder are dropped"""
+        assert endpoint_origin(FakeEndpoint(url="https://api.example.com:8443/items/{upc}?x=1")) == "https://api.example.com:8443"
+
+    def test_templated_host_is_skipped(self):
+        """Test that a host depending on the UPC cannot be warmed"""
+        assert endpoint_origin(FakeEndpoint(url="https://{upc}.example.com/item")) is None
+
+
+class TestConnectionPrewarmer:
+    """Test opening keep-alive connections against a local server"""
+
+    def test_opens_idle_connections_per_host(self):
+        """Test that each host gets the configured number of distinct pooled connections"""
+        async def scenario():
+            peers = set()
+            runner, port = await start_server(peers)
+            session = main_module.create_http_session()
+            try:
+                prewarmer = ConnectionPrewarmer(connections=3, timeout=2)
+                # Two endpoints on one host are warmed once
+                endpoints = [
+                    FakeEndpoint(url=f"http://127.0.0.1:{port}/a/{{upc}}"),
+                    FakeEndpoint(url=f"http://127.0.0.1:{port}/b/{{upc}}")
+                ]
+                hosts = await prewarmer.warm(session, endpoints)
+                return hosts, peers, connector_stats(session.connector)
+            finally:
+                await session.close()
+                await runner.cleanup()
+
+        hosts, peers, pool = asyncio.run(scenario())
+
+        assert len(hosts) == 1
+        assert list(hosts.values())[0]["connections"] == 3
+        assert len(peers) == 3
+        assert pool["idle"] == 3
+
+    def test_connections_capped_by_per_host_limit_only_when_set(self, monkeypatch):
+        """Test that the per-host pool size caps warming, with 0 meaning no limit"""
+        monkeypatch.setattr(main_module, "HTTP_POOL_SIZE_PER_HOST", 3)
+        assert ConnectionPrewarmer(connections=5).connections == 3
+
+        monkeypatch.setattr(main_module, "HTTP_POOL_SIZE_PER_HOST", 0)
+        assert ConnectionPrewarmer(connections=5).connections == 5
+
+    def test_unreachable_host_still_becomes_ready(self):
+        """Test that a failing host is reported without holding back readiness"""
+        async def scenario():
+            runner, port = await start_server(set())
+            # Nothing listens on the port once the server is gone
+            await runner.cleanup()
+            session = main_module.create_http_session()
+            try:
+                prewarmer = ConnectionPrewarmer(connections=2, timeout=2)
+                await prewarmer.start(session, [FakeEndpoint(url=f"http://127.0.0.1:{port}/{{upc}}")])
+                return prewarmer
+            finally:
+                await session.close()
+
+        prewarmer = asyncio.run(scenario())
+
+        assert prewarmer.ready == True
+        host = prewarmer.stats()["hosts"].popitem()[1]
+        assert host["connections"] == 0
+        assert host["error"] is not None
@@ -0,0 +1,122 @@
+from conftest import main_module, FakeClock, make_result
+
+PriceCache = main_module.PriceCache
+PriceRecord = main_module.PriceRecord
+
+
+class TestPriceCache:
+    """Test TTL, stale-while-revalidate, LRU and invalidation behaviour"""
+
+    def test_fresh_hit(self):
+        """Test that an entry within its TTL is returned as fresh"""
+        clock = FakeClock()
+        cache = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        cache.set(1, "101", make_result(), ttl=60)
+
+        clock.now += 5
+        result, age, is_fresh = cache.get(1, "101")
+
+        assert result.price == 4.77
+        assert age == 5
+        assert is_fresh == True
+        assert cache.hits == 1
+
+    def test_expired_entry_served_as_stale(self):
+        """Test that an expired entry is still returned inside the stale window"""
+        clock = FakeClock()
+        cache = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        cache.set(1, "101", make_result(), ttl=60)
+
+        clock.now += 75
+        result, age, is_fresh = cache.get(1, "101")
+
+        assert is_fresh == False
+        assert age == 75
+        assert cache.stale_hits == 1
+
+    def test_entry_past_stale_window_is_a_miss(self):
+        """Test that an entry older than ttl + stale_ttl is dropped"""
+        clock = FakeClock()
+        cache = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        cache.set(1, "101", make_result(), ttl=60)
+
+        clock.now += 91
+
+        assert cache.get(1, "101") is None
+        assert len(cache) == 0
+        assert cache.misses == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = PriceCache(max_entries=2, stale_ttl=0, clock=FakeClock())
+        cache.set(1, "101", make_result(), ttl=60)
+        cache.set(1, "102", make_result(), ttl=60)
+
+        # Touch 101 so 102 becomes the least recently used
+        cache.get(1, "101")
+        cache.set(1, "103", make_result(), ttl=60)
+
+        assert cache.get(1, "102") is None
+        assert cache.get(1, "101") is not None
+        assert cache.get(1, "103") is not None
+        assert cache.evictions == 1
+
+    def test_invalidate_endpoint(self):
+        """Test that invalidation only drops the given endpoint's entries"""
+        cache = PriceCache(max_entries=10, stale_ttl=0, clock=FakeClock())
+        cache.set(1, "101", make_result("Appedia"), ttl=60)
+        cache.set(2, "101", make_result("Googdit"), ttl=60)
+
+        cache.invalidate_endpoint(1)
+
+        assert cache.get(1, "101") is None
+        assert cache.get(2, "101") is not None
+
+    def test_set_ignored_after_invalidation(self):
+        """Test that a fetch started before an endpoint edit cannot repopulate the cache"""
+        cache = PriceCache(max_entries=10, stale_ttl=0, clock=FakeClock())
+        generation = cache.generation(1)
+
+        cache.invalidate_endpoint(1)
+        cache.set(1, "101", make_result(), ttl=60, generation=generation)
+
+        assert cache.get(1, "101") is None
+
+
+class TestPriceRecord:
+    """Test the compact internal result and its conversion at the API edge"""
+
+    def test_cached_copy_leaves_original_untouched(self):
+        """Test that marking a cache hit does not change the stored record"""
+        record = make_result()
+
+        hit = record.as_cached(5.0)
+
+        assert hit.cached == True
+        assert hit.cache_age == 5.0
+        assert record.cached == False
+        assert hit.price == record.price
+
+    def test_converts_to_api_model(self):
+        """Test that serialization produces the documented PriceResult schema"""
+        record = PriceRecord(merchant="Googdit", price=None, error="Out of stock", in_stock=False)
+
+        model = record.to_model()
+
+        assert isinstance(model, main_module.PriceResult)
+        assert model.model_dump() == {
+            "merchant": "Googdit", "price": None, "url": None, "error": "Out of stock",
+            "in_stock": False, "cached": False, "cache_age": None, "pending": False
+        }
+
+    def test_response_serializes_records(self):
+        """Test that a comparison built from records picks the best in-stock price"""
+        results = [
+            PriceRecord(merchant="Appedia", price=3.0, in_stock=False),
+            PriceRecord(merchant="Googdit", price=4.0, url="https://g", in_stock=True),
+        ]
+
+        response = main_module.build_comparison_response("101", results)
+
+        assert response.best_merchant == "Googdit"
+        assert [r.merchant for r in response.results] == ["Appedia", "Googdit"]
@@ -0,0 +1,217 @@
+import asyncio
+
+import aiosqlite
+from fastapi.testclient import TestClient
+
+from conftest import main_module, make_result
+
+PriceHistoryWriter = main_module.PriceHistoryWriter
+
+DAY = 86400
+NOW = 1_700_000_000
+
+
+async def insert_rows(writer, rows):
+    await writer._db.executemany("""
+        INSERT INTO price_history (upc, merchant, observed_at, price, in_stock, endpoint_id)
+        VALUES (?, ?, ?, ?, 1, 1)
+    """, rows)
+    await writer._db.commit()
+
+
+async def fetch_all(path, query):
+    async with aiosqlite.connect(path) as db:
+        cursor = await db.execute(query)
+        return await cursor.fetchall()
+
+
+class TestPriceHistory:
+    """Test batched history writes, latest prices and maintenance"""
+
+    def test_stop_flushes_queued_observations(self, tmp_path):
+        """Test that observations queued before shutdown are written"""
+        path = str(tmp_path / "history.db")
+
+        async def run():
+            writer = PriceHistoryWriter(path)
+            await writer.start()
+            writer.record("101", 1, make_result(price=4.77))
+            writer.record("101", 1, make_result(price=4.50))
+            writer.record("101", 2, make_result("Googdit", price=None))
+            await writer.stop()
+            return writer
+
+        writer = asyncio.run(run())
+
+        assert writer.written == 2
+        history = asyncio.run(fetch_all(path, "SELECT merchant, price FROM price_history ORDER BY id"))
+        assert history == [("Appedia", 4.77), ("Appedia", 4.50)]
+        latest = asyncio.run(fetch_all(path, "SELECT merchant, upc, price FROM latest_prices"))
+        assert latest == [("Appedia", "101", 4.50)]
+
+    def test_stop_waits_for_the_batch_being_written(self, tmp_path, monkeypatch):
+        """Test that shutting down mid-write neither loses nor duplicates the drained batch"""
+        path = str(tmp_path / "history.db")
+        monkeypatch.setattr(main_module, "PRICE_HISTORY_FLUSH_INTERVAL", 0.0)
+
+        async def run():
+            writer = PriceHistoryWriter(path)
+            await writer.start()
+            write = writer._write
+            started = asyncio.Event()
+
+            async def slow_write(batch):
+                started.set()
+                await asyncio.sleep(0.05)
+                await write(batch)
+
+            writer._write = slow_write
+            writer.record("101", 1, make_result(price=4.77))
+            writer.record("101", 1, make_result(price=4.50))
+            await started.wait()
+            writer.record("101", 1, make_result(price=4.25))
+            await writer.stop()
+            return writer
+
+        writer = asyncio.run(run())
+
+        assert writer.written == 3
+        history = asyncio.run(fetch_all(path, "SELECT price FROM price_history ORDER BY id"))
+        assert history == [(4.77,), (4.50,), (4.25,)]
+
+    def test_stop_flushes_the_batch_being_collected(self, tmp_path):
+        """Test that rows already taken off the queue are written when shutdown interrupts batching"""
+        path = str(tmp_path / "history.db")
+
+        async def run():
+            writer = PriceHistoryWriter(path)
+            await writer.start()
+            writer.record("101", 1, make_result(price=4.77))
+            # Let the writer drain the queue and wait for more rows to fill the batch
+            for _ in range(3):
+                await asyncio.sleep(0)
+            assert writer._queue.empty() and len(writer._pending) == 1
+            await writer.stop()
+            return writer
+
+        writer = asyncio.run(run())
+
+        assert writer.written == 1
+
+    def test_first_id_at_or_after_skips_deleted_rows(self, tmp_path):
+        """Test that the rowid binary search finds the boundary across gaps in the ids"""
+        path = str(tmp_path / "history.db")
+
+        async def run():
+            writer = PriceHistoryWriter(path)
+            await writer.start()
+            await insert_rows(writer, [("101", "Appedia", NOW + offset, 1.0) for offset in range(0, 100, 10)])
+            # ids 1..10 at NOW, NOW + 10, ..., NOW + 90; punch a hole at ids 4..6
+            await writer._db.execute("DELETE FROM price_history WHERE id BETWEEN 4 AND 6")
+            await writer._db.commit()
+            found = [
+                await writer._first_id_at_or_after(observed_at)
+                for observed_at in (NOW - 1, NOW, NOW + 25, NOW + 35, NOW + 90, NOW + 91)
+            ]
+            await writer.stop()
+            return found
+
+        assert asyncio.run(run()) == [1, 1, 7, 7, 10, None]
+
+    def test_full_queue_drops_instead_of_blocking(self, tmp_path):
+        """Test that record() never waits when the queue is full"""
+        writer = PriceHistoryWriter(str(tmp_path / "history.db"))
+        writer._queue = asyncio.Queue(maxsize=1)
+
+        writer.record("101", 1, make_result())
+        writer.record("102", 1, make_result())
+
+        assert writer._queue.qsize() == 1
+        assert writer.dropped == 1
+
+    def test_maintenance_applies_retention_and_downsampling(self, tmp_path):
+        """Test that old rows are deleted and older rows keep one observation per hour"""
+        path = str(tmp_path / "history.db")
+        retention = int(main_module.PRICE_HISTORY_RETENTION_DAYS * DAY)
+        old_hour = NOW - 30 * DAY
+        old_hour -= old_hour % 3600
+
+        async def run():
+            writer = PriceHistoryWriter(path)
+            await writer.start()
+            await insert_rows(writer, [
+                ("101", "Appedia", NOW - retention - DAY, 1.0),
+                ("101", "Appedia", old_hour + 60, 2.0),
+                ("101", "Appedia", old_hour + 120, 3.0),
+                ("101", "Googdit", old_hour + 60, 4.0),
+                ("101", "Appedia", NOW - 60, 5.0),
+                ("101", "Appedia", NOW - 30, 6.0),
+            ])
+            await writer.run_maintenance(now=NOW)
+            await writer.stop()
+
+        asyncio.run(run())
+
+        rows = asyncio.run(fetch_all(path, "SELECT merchant, price FROM price_history ORDER BY id"))
+        assert rows == [("Appedia", 3.0), ("Googdit", 4.0), ("Appedia", 5.0), ("Appedia", 6.0)]
+
+
+class TestPriceHistoryRoutes:
+    """Test the /api/history read endpoints"""
+
+    def make_client(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "history.db")
+
+        async def seed():
+            writer = PriceHistoryWriter(path)
+            await writer.start()
+            await insert_rows(writer, [
+                ("101", "Appedia", NOW - 120, 4.99),
+                ("101", "Googdit", NOW - 90, 5.25),
+                ("101", "Appedia", NOW - 60, 4.77),
+                ("202", "Appedia", NOW - 30, 9.99),
+            ])
+            await writer._db.executemany("""
+                INSERT INTO latest_prices (merchant, upc, observed_at, price, in_stock) VALUES (?, ?, ?, ?, 1)
+            """, [("Appedia", "101", NOW - 60, 4.77), ("Appedia", "202", NOW - 30, 9.99), ("Googdit", "101", NOW - 90, 5.25)])
+            await writer._db.commit()
+            await writer.stop()
+
+        asyncio.run(seed())
+
+        async def history_db():
+            async with aiosqlite.connect(path) as db:
+                yield db
+
+        monkeypatch.setitem(main_module.app.dependency_overrides, main_module.get_history_db, history_db)
+        return TestClient(main_module.app)
+
+    def test_history_is_newest_first_and_filterable(self, tmp_path, monkeypatch):
+        """Test that a UPC's observations can be narrowed by merchant, time and count"""
+        client = self.make_client(tmp_path, monkeypatch)
+
+        rows = client.get("/api/history/101").json()
+        assert [(row["merchant"], row["price"]) for row in rows] == [("Appedia", 4.77), ("Googdit", 5.25), ("Appedia", 4.99)]
+        assert rows[0]["in_stock"] == True
+
+        rows = client.get("/api/history/101", params={"merchant": "Appedia", "limit": 1}).json()
+        assert [row["price"] for row in rows] == [4.77]
+
+        since = main_module.datetime.fromtimestamp(NOW - 90).isoformat()
+        rows = client.get("/api/history/101", params={"since": since}).json()
+        assert [row["price"] for row in rows] == [4.77, 5.25]
+
+    def test_merchant_latest_prices(self, tmp_path, monkeypatch):
+        """Test that a merchant's latest price per UPC comes back newest first"""
+        client = self.make_client(tmp_path, monkeypatch)
+
+        rows = client.get("/api/history/merchants/Appedia/latest").json()
+
+        assert [(row["upc"], row["price"]) for row in rows] == [("202", 9.99), ("101", 4.77)]
+        assert client.get("/api/history/merchants/Appedia/latest", params={"limit": 0}).status_code == 422
+
+    def test_disabled_history_is_not_found(self, monkeypatch):
+        """Test that the read endpoints 404 when price history is turned off"""
+        monkeypatch.setattr(main_module, "PRICE_HISTORY_ENABLED", False)
+
+        assert TestClient(main_module.app).get("/api/history/101").status_code == 404
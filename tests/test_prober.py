@@ -0,0 +1,142 @@
+import asyncio
+
+from aiohttp import web
+
+from conftest import main_module, FakeEndpoint
+
+MerchantProber = main_module.MerchantProber
+
+
+def record(prober, endpoint_id, latency, error=None):
+    stats = prober._stats.setdefault(endpoint_id, main_module.ProbeStats(prober.window))
+    stats.record(latency, error, 0.0)
+
+
+class TestFanOutPlan:
+    """Test skipping endpoints that are down"""
+
+    def test_live_endpoints_keep_their_order(self):
+        """Test that probe latency does not reorder the fan-out"""
+        prober = MerchantProber(window=5, down_after=3)
+        endpoints = (FakeEndpoint(1), FakeEndpoint(2), FakeEndpoint(3))
+        for latency in (0.5, 0.4, 0.6):
+            record(prober, 1, latency)
+        for latency in (0.1, 2.0, 0.2):
+            record(prober, 2, latency)
+
+        live, skipped = prober.plan(endpoints)
+
+        assert [endpoint.id for endpoint in live] == [1, 2, 3]
+        assert skipped == {}
+
+    def test_persistently_down_endpoint_is_skipped_until_recovery(self):
+        """Test that consecutive failures skip an endpoint and one success brings it back"""
+        prober = MerchantProber(window=5, down_after=3)
+        endpoints = (FakeEndpoint(1), FakeEndpoint(2))
+        for _ in range(3):
+            record(prober, 1, 5.0, error="Request timeout")
+
+        live, skipped = prober.plan(endpoints)
+
+        assert [endpoint.id for endpoint in live] == [2]
+        assert skipped[1].merchant == "Merchant 1"
+        assert skipped[1].error == "Merchant down"
+        assert prober.stats(1)["success_rate"] == 0.0
+
+        record(prober, 1, 0.3)
+        assert prober.is_down(1) == False
+
+    def test_reset_forgets_probes(self):
+        """Test that editing an endpoint clears its down state"""
+        prober = MerchantProber(window=5, down_after=1)
+        record(prober, 1, 1.0, error="HTTP 503")
+
+        prober.reset(1)
+
+        assert prober.is_down(1) == False
+        assert prober.stats(1) is None
+
+
+class TestProbe:
+    """Test canary probes against a local merchant"""
+
+    def run_probes(self, monkeypatch, statuses):
+        async def scenario():
+            responses = iter(statuses)
+
+            async def handle(request):
+                assert request.match_info["upc"] == "canary"
+                return web.json_response({"price": 1.0}, status=next(responses))
+
+            app = web.Application()
+            app.router.add_get("/{upc}", handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            endpoint = FakeEndpoint(1, url=f"http://127.0.0.1:{port}/{{upc}}")
+            monkeypatch.setattr(main_module.endpoint_registry, "_active", (endpoint,))
+            prober = MerchantProber(upc="canary", timeout=2, window=10, down_after=2)
+            session = main_module.create_http_session()
+            try:
+                errors = []
+                for _ in statuses:
+                    await prober.probe_all(session, (endpoint,))
+                    errors.append(prober.get(1).last_error if prober.get(1).consecutive_failures else None)
+                return prober, errors
+            finally:
+                await session.close()
+                await runner.cleanup()
+
+        return asyncio.run(scenario())
+
+    def test_server_errors_fail_and_other_answers_pass(self, monkeypatch):
+        """Test that 5xx fails a probe while 200 and 404 count as the merchant being up"""
+        prober, errors = self.run_probes(monkeypatch, [200, 404, 503])
+
+        assert errors == [None, None, "HTTP 503"]
+        stats = prober.stats(1)
+        assert stats["probes"] == 3
+        assert stats["success_rate"] == round(2 / 3, 3)
+        assert stats["latency_p50_ms"] is not None
+        assert stats["down"] == False
+
+    def test_down_after_consecutive_failures(self, monkeypatch):
+        """Test that an endpoint is reported down once failures reach the threshold"""
+        prober, _ = self.run_probes(monkeypatch, [500, 503])
+
+        assert prober.is_down(1) == True
+        assert prober.stats(1)["down"] == True
+
+    def test_stop_waits_for_the_probe_loop(self, monkeypatch):
+        """Test that stopping returns only once the cancelled probe loop has finished"""
+        unwound = []
+
+        async def slow_probe_all(session, endpoints):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                unwound.append(True)
+
+        async def scenario():
+            prober = MerchantProber()
+            monkeypatch.setattr(prober, "probe_all", slow_probe_all)
+            prober.start(None)
+            task = prober._task
+            await asyncio.sleep(0)
+            await prober.stop()
+            return task.done()
+
+        assert asyncio.run(scenario()) == True
+        assert unwound == [True]
+
+
+class TestEndpointHealthRoute:
+    """Test that the health listing is not shadowed by the endpoint id route"""
+
+    def test_health_route_declared_before_id_route(self):
+        """Test that /api/endpoints/health is matched before /api/endpoints/{endpoint_id}"""
+        paths = [route.path for route in main_module.app.routes]
+
+        assert paths.index("/api/endpoints/health") < paths.index("/api/endpoints/{endpoint_id}")
@@ -0,0 +1,192 @@
+import asyncio
+
+import aiosqlite
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import main_module, FakeClock, FakeEndpoint
+
+CatalogRefresher = main_module.CatalogRefresher
+PriceRecord = main_module.PriceRecord
+refresh_interval = main_module.refresh_interval
+parse_watchlist_csv = main_module.parse_watchlist_csv
+
+
+class TestRefreshOrdering:
+    """Test staleness and popularity based refresh ordering"""
+
+    def test_interval_shrinks_with_popularity_within_bounds(self):
+        """Test that popular UPCs refresh more often, clamped to the configured range"""
+        base = main_module.REFRESH_BASE_INTERVAL
+
+        assert refresh_interval(1) == base
+        assert refresh_interval(2) == base / 2
+        assert refresh_interval(1e9) == main_module.REFRESH_MIN_INTERVAL
+        assert refresh_interval(1e-9) == main_module.REFRESH_MAX_INTERVAL
+
+    def test_most_overdue_upc_comes_first(self):
+        """Test that never-refreshed UPCs come first, then the stalest relative to popularity"""
+        clock = FakeClock()
+        refresher = CatalogRefresher(clock=clock)
+        refresher.upsert("stale-popular", 10, last_refreshed_at=clock.now - 100)
+        refresher.upsert("fresh", 1, last_refreshed_at=clock.now - 10)
+        refresher.upsert("new", 1)
+
+        assert refresher.next_due().upc == "new"
+        refresher.remove("new")
+        assert refresher.next_due().upc == "stale-popular"
+
+    def test_popularity_change_reschedules(self):
+        """Test that raising a UPC's popularity moves it ahead and drops its old heap entry"""
+        clock = FakeClock()
+        refresher = CatalogRefresher(clock=clock)
+        refresher.upsert("a", 1, last_refreshed_at=clock.now - 100)
+        refresher.upsert("b", 1, last_refreshed_at=clock.now - 50)
+
+        refresher.upsert("b", 100)
+
+        assert refresher.next_due().upc == "b"
+        assert refresher.next_due().due_at == clock.now - 50 + refresh_interval(100)
+
+
+class TestRefresh:
+    """Test refreshing a UPC across merchants"""
+
+    def run_refresh(self, monkeypatch, results, clock):
+        endpoints = tuple(FakeEndpoint(i) for i in range(len(results)))
+        monkeypatch.setattr(main_module.endpoint_registry, "_active", endpoints)
+
+        async def fake_refresh_price(session, endpoint, upc):
+            return results[endpoint.id]
+
+        monkeypatch.setattr(main_module, "refresh_price", fake_refresh_price)
+        refresher = CatalogRefresher(clock=clock)
+        refresher.upsert("123", 1)
+        item = refresher.next_due()
+        asyncio.run(refresher.refresh(None, item))
+        return refresher, item
+
+    def test_successful_refresh_schedules_next_interval(self, monkeypatch):
+        """Test that a refresh records its time and is due again one interval later"""
+        clock = FakeClock()
+        results = [
+            PriceRecord(merchant="Merchant 0", price=1.0, in_stock=True),
+            PriceRecord(merchant="Merchant 1", price=None, error="Request timeout")
+        ]
+
+        refresher, item = self.run_refresh(monkeypatch, results, clock)
+
+        assert item.last_refreshed_at == clock.now
+        assert item.due_at == clock.now + refresh_interval(1)
+        stats = refresher.stats()
+        assert stats["refreshed"] == 1
+        assert stats["errors"] == 1
+        assert stats["upcs_per_minute"] == 1
+
+    def test_fully_rate_limited_refresh_retries_soon(self, monkeypatch):
+        """Test that a UPC shed by every merchant is retried instead of marked fresh"""
+        clock = FakeClock()
+        results = [PriceRecord(merchant="Merchant 0", price=None, error="Rate limited")]
+
+        refresher, item = self.run_refresh(monkeypatch, results, clock)
+
+        assert item.last_refreshed_at is None
+        assert item.due_at == clock.now + main_module.REFRESH_RETRY_DELAY
+        assert refresher.stats()["rate_limited"] == 1
+
+
+class TestRefreshLoop:
+    """Test dispatching due UPCs from the run loop"""
+
+    def test_in_flight_head_does_not_block_other_due_upcs(self, tmp_path, monkeypatch):
+        """Test that a UPC rescheduled while it is still refreshing does not hold up the rest of the heap"""
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+
+        async def scenario():
+            await main_module.init_db()
+            pool = main_module.SQLitePool(main_module.DATABASE_URL, 1)
+            await pool.open()
+            refresher = CatalogRefresher()
+            # The watchlist table is empty; keep the in-memory items
+            refresher._version = 0
+            started = []
+            release = asyncio.Event()
+
+            async def fake_refresh(session, item):
+                started.append(item.upc)
+                if item.upc == "slow":
+                    await release.wait()
+
+            refresher.refresh = fake_refresh
+            now = main_module.time.time()
+            refresher.upsert("slow", 1, last_refreshed_at=now - 10000)
+            task = asyncio.create_task(refresher.run(None, pool))
+            try:
+                await asyncio.sleep(0.05)
+                # Re-imported while refreshing: "slow" is due again and at the head of the heap
+                refresher.upsert("slow", 1)
+                refresher.upsert("fast", 1, last_refreshed_at=now - 5000)
+                await asyncio.sleep(0.2)
+                return list(started)
+            finally:
+                release.set()
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await pool.close()
+
+        assert asyncio.run(scenario()) == ["slow", "fast"]
+
+
+class TestSharedRefreshStatus:
+    """Test that every worker reports the refresh engine's progress"""
+
+    def test_standby_worker_serves_the_leaders_published_stats(self, tmp_path, monkeypatch):
+        """Test that a standby answers with the running worker's numbers, not its own empty ones"""
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+        monkeypatch.setattr(main_module, "REFRESH_ENABLED", True)
+
+        async def publish():
+            await main_module.init_db()
+            pool = main_module.SQLitePool(main_module.DATABASE_URL, 1)
+            await pool.open()
+            try:
+                leader = CatalogRefresher()
+                leader.state = "running"
+                leader.upsert("123", 1)
+                leader.refreshed = 42
+                await leader.persist(pool)
+            finally:
+                await pool.close()
+
+        asyncio.run(publish())
+
+        async def endpoints_db():
+            async with aiosqlite.connect(main_module.DATABASE_URL) as db:
+                yield db
+
+        standby = CatalogRefresher()
+        standby.state = "standby"
+        monkeypatch.setattr(main_module, "catalog_refresher", standby)
+        monkeypatch.setitem(main_module.app.dependency_overrides, main_module.get_db, endpoints_db)
+
+        status = TestClient(main_module.app).get("/api/refresh/status").json()
+
+        assert status["state"] == "running"
+        assert status["watchlist_size"] == 1
+        assert status["refreshed"] == 42
+        assert "updated_at" in status
+
+
+class TestWatchlistCsv:
+    """Test parsing of watchlist CSV imports"""
+
+    def test_parses_header_defaults_and_blank_lines(self):
+        """Test that the header is skipped and popularity defaults to 1"""
+        lines = ["upc,popularity", "0001,5", "", "0002", "0003, 0.5"]
+
+        assert list(parse_watchlist_csv(lines)) == [("0001", 5.0), ("0002", 1.0), ("0003", 0.5)]
+
+    def test_rejects_invalid_popularity(self):
+        """Test that a bad row reports its line number"""
+        with pytest.raises(ValueError, match="Line 2"):
+            list(parse_watchlist_csv(["0001,1", "0002,lots"]))
@@ -0,0 +1,82 @@
+import pytest
+from pydantic import ValidationError
+
+from conftest import main_module
+
+ResponseMapping = main_module.ResponseMapping
+ParserRegistry = main_module.ParserRegistry
+compile_mapping = main_module.compile_mapping
+parser_registry = main_module.parser_registry
+
+
+class TestResponseMapping:
+    """Test compiling declarative response mappings into extractors"""
+
+    def test_nested_path_with_float_price(self):
+        """Test a mapping that reads price and stock from nested objects"""
+        extract = compile_mapping(ResponseMapping(
+            price_path="offer.amount",
+            price_unit="float",
+            stock_path="offer.inventory.count",
+            stock_rule="positive"
+        ))
+
+        price, in_stock = extract({"offer": {"amount": 12.5, "inventory": {"count": 3}}})
+
+        assert price == 12.5
+        assert in_stock == True
+
+    def test_missing_stock_is_out_of_stock(self):
+        """Test that a missing stock field counts as out of stock"""
+        extract = compile_mapping(ResponseMapping(
+            price_path="price", price_unit="dollar_string", stock_path="stock", stock_rule="positive"
+        ))
+
+        price, in_stock = extract({"price": "$1.25"})
+
+        assert price == 1.25
+        assert in_stock == False
+
+    def test_list_fan_out_with_any_positive(self):
+        """Test that [] paths read a field from every list element"""
+        extract = compile_mapping(ResponseMapping(
+            price_path="p", price_unit="microcents", stock_path="stores[].qty", stock_rule="any_positive"
+        ))
+
+        price, in_stock = extract({"p": 250000000, "stores": [{"qty": 0}, {"qty": 2}]})
+
+        assert price == 2.5
+        assert in_stock == True
+
+    def test_non_object_payload_is_unparseable(self):
+        """Test that a payload of the wrong shape yields no price"""
+        extract = compile_mapping(ResponseMapping(
+            price_path="price", price_unit="float", stock_path="available", stock_rule="truthy"
+        ))
+
+        price, in_stock = extract(["not", "an", "object"])
+
+        assert price is None
+        assert in_stock == False
+
+    def test_invalid_path_rejected(self):
+        """Test that empty path segments are rejected at validation time"""
+        with pytest.raises(ValidationError):
+            ResponseMapping(price_path="a..b", price_unit="float", stock_path="s", stock_rule="truthy")
+
+    def test_identical_mappings_share_extractor(self):
+        """Test that endpoints with the same mapping reuse one compiled extractor"""
+        registry = ParserRegistry({})
+        mapping = ResponseMapping(price_path="price", price_unit="float", stock_path="ok", stock_rule="truthy")
+
+        assert registry.compile(mapping) is registry.compile(mapping.model_copy())
+
+    def test_endpoint_mapping_overrides_builtin(self):
+        """Test that an endpoint's own mapping wins over the built-in for its name"""
+        mapping = ResponseMapping(price_path="cost", price_unit="float", stock_path="ok", stock_rule="truthy")
+        extract = parser_registry.resolve("Appedia", mapping)
+
+        price, in_stock = extract({"cost": 3.0, "ok": True})
+
+        assert price == 3.0
+        assert in_stock == True
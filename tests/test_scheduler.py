@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from conftest import main_module
+
+MerchantScheduler = main_module.MerchantScheduler
+RateLimited = main_module.RateLimited
+INTERACTIVE = main_module.INTERACTIVE
+BULK = main_module.BULK
+BACKGROUND = main_module.BACKGROUND
+
+
+class TestMerchantScheduler:
+    """Test per-endpoint token buckets and priority ordering"""
+
+    def test_unlimited_endpoint_never_waits(self):
+        """Test that an endpoint without a rate limit admits everything at once"""
+        scheduler = MerchantScheduler(rate=None, burst=None)
+
+        async def run():
+            for _ in range(100):
+                await scheduler.acquire(BULK)
+
+        asyncio.run(run())
+
+        assert scheduler.admitted[BULK] == 100
+        assert scheduler.stats()["queue_depth"] == 0
+
+    def test_higher_priority_is_admitted_first(self):
+        """Test that queued interactive requests go ahead of bulk and background ones"""
+        scheduler = MerchantScheduler(rate=100, burst=1)
+        order = []
+
+        async def request(priority):
+            await scheduler.acquire(priority)
+            order.append(priority)
+
+        async def run():
+            await scheduler.acquire(INTERACTIVE)  # use up the burst
+            tasks = [asyncio.create_task(request(p)) for p in (BACKGROUND, BULK, INTERACTIVE)]
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+
+        assert order == [INTERACTIVE, BULK, BACKGROUND]
+
+    def test_low_priority_shed_when_wait_too_long(self):
+        """Test that background work is shed rather than queued past its wait limit"""
+        scheduler = MerchantScheduler(
+            rate=1, burst=1, max_wait={INTERACTIVE: 10, BULK: 10, BACKGROUND: 0.5}
+        )
+
+        async def run():
+            await scheduler.acquire(INTERACTIVE)
+            with pytest.raises(RateLimited):
+                await scheduler.acquire(BACKGROUND)
+
+        asyncio.run(run())
+
+        assert scheduler.shed[BACKGROUND] == 1
+        assert scheduler.shed[INTERACTIVE] == 0
+
+    def test_full_queue_sheds(self):
+        """Test that the queue bound applies once it is reached"""
+        scheduler = MerchantScheduler(rate=1, burst=1, max_queue=1)
+
+        async def run():
+            await scheduler.acquire(INTERACTIVE)
+            waiter = asyncio.create_task(scheduler.acquire(INTERACTIVE))
+            await asyncio.sleep(0)
+            with pytest.raises(RateLimited):
+                await scheduler.acquire(INTERACTIVE)
+            waiter.cancel()
+
+        asyncio.run(run())
+
+    def test_cancelled_waiter_gives_up_its_place(self):
+        """Test that a cancelled waiter does not consume a token"""
+        scheduler = MerchantScheduler(rate=50, burst=1)
+
+        async def run():
+            await scheduler.acquire(INTERACTIVE)
+            abandoned = asyncio.create_task(scheduler.acquire(INTERACTIVE))
+            await asyncio.sleep(0)
+            abandoned.cancel()
+            await asyncio.wait_for(scheduler.acquire(BULK), timeout=1)
+
+        asyncio.run(run())
+
+        assert scheduler.admitted[INTERACTIVE] == 1
+        assert scheduler.admitted[BULK] == 1
+        assert scheduler.stats()["queue_depth"] == 0
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+
+import aiosqlite
+
+from conftest import main_module, FakeClock, make_result
+
+SharedPriceCache = main_module.SharedPriceCache
+PriceCache = main_module.PriceCache
+EndpointSync = main_module.EndpointSync
+
+
+def make_workers(tmp_path, clock, max_entries=10):
+    """Two caches on the same file, standing in for two worker processes"""
+    path = str(tmp_path / "price_cache.db")
+    return (
+        SharedPriceCache(path, max_entries=max_entries, stale_ttl=30, clock=clock),
+        SharedPriceCache(path, max_entries=max_entries, stale_ttl=30, clock=clock)
+    )
+
+
+class TestSharedPriceCache:
+    """Test that worker processes see one another's cache entries and invalidations"""
+
+    def test_entry_written_by_one_worker_is_read_by_another(self, tmp_path):
+        """Test that a result cached by one worker is a hit on another"""
+        clock = FakeClock()
+        first, second = make_workers(tmp_path, clock)
+        first.set(1, "101", make_result(), ttl=60)
+
+        clock.now += 5
+        result, age, is_fresh = second.get(1, "101")
+
+        assert result.price == 4.77
+        assert age == 5
+        assert is_fresh == True
+
+    def test_stale_window_applies(self, tmp_path):
+        """Test that expired entries are stale, then missing, for every worker"""
+        clock = FakeClock()
+        first, second = make_workers(tmp_path, clock)
+        first.set(1, "101", make_result(), ttl=60)
+
+        clock.now += 75
+        assert second.get(1, "101")[2] == False
+
+        clock.now += 30
+        assert second.get(1, "101") is None
+
+    def test_invalidation_blocks_other_workers_in_flight_writes(self, tmp_path):
+        """Test that a fetch started on one worker cannot repopulate after another worker's edit"""
+        first, second = make_workers(tmp_path, FakeClock())
+        first.set(1, "101", make_result(price=1.00), ttl=60)
+        generation = first.generation(1)
+
+        second.invalidate_endpoint(1)
+        first.set(1, "101", make_result(price=2.00), ttl=60, generation=generation)
+
+        assert second.get(1, "101") is None
+        assert first.generation(1) == generation + 1
+
+    def test_prune_evicts_oldest_beyond_max_entries(self, tmp_path):
+        """Test that pruning keeps the newest max_entries results"""
+        clock = FakeClock()
+        cache, _ = make_workers(tmp_path, clock, max_entries=2)
+        for upc in ("101", "102", "103"):
+            cache.set(1, upc, make_result(), ttl=60)
+            clock.now += 1
+
+        cache.prune()
+
+        assert len(cache) == 2
+        assert cache.get(1, "101") is None
+        assert cache.evictions == 1
+
+    def test_reads_entries_in_the_previous_format(self, tmp_path):
+        """Test that entries stored as PriceResult JSON by an older version still load"""
+        cache = SharedPriceCache(str(tmp_path / "price_cache.db"), max_entries=10, stale_ttl=30, clock=FakeClock())
+        cache._db.execute(
+            "INSERT INTO price_cache_entries VALUES (1, '101', ?, 1000, 1060)",
+            (main_module.PriceResult(merchant="Appedia", price=4.77, in_stock=True).model_dump_json(),)
+        )
+
+        result, _, _ = cache.get(1, "101")
+
+        assert result.price == 4.77
+        assert result.merchant == "Appedia"
+
+
+class TestSharedPriceCacheOffLoop:
+    """Test that the request path and pruning never touch SQLite on the event loop"""
+
+    def test_async_calls_run_on_the_cache_thread(self, tmp_path, monkeypatch):
+        """Test that lookups, writes and generation reads happen on the dedicated thread"""
+        clock = FakeClock()
+        cache, _ = make_workers(tmp_path, clock)
+        threads = []
+        get = cache.get
+        monkeypatch.setattr(cache, "get", lambda *args: threads.append(threading.current_thread().name) or get(*args))
+
+        async def scenario():
+            generation = await cache.generation_async(1)
+            await cache.set_async(1, "101", make_result(), 60, generation)
+            return await cache.get_async(1, "101")
+
+        result, _, is_fresh = asyncio.run(scenario())
+
+        assert result.price == 4.77 and is_fresh == True
+        assert threads[0].startswith("price-cache") and threads[0] != threading.current_thread().name
+
+    def test_prune_runs_periodically_in_the_background(self, tmp_path, monkeypatch):
+        """Test that writes no longer prune inline and the background task evicts beyond max_entries"""
+        monkeypatch.setattr(main_module, "PRICE_CACHE_PRUNE_INTERVAL", 0.01)
+        clock = FakeClock()
+        cache, _ = make_workers(tmp_path, clock, max_entries=2)
+
+        async def scenario():
+            for upc in ("101", "102", "103"):
+                clock.now += 1
+                await cache.set_async(1, upc, make_result(), 60)
+            before = len(cache)
+            cache.start()
+            await asyncio.sleep(0.1)
+            await cache.stop()
+            return before
+
+        assert asyncio.run(scenario()) == 3
+        assert len(cache) == 2
+        assert cache.get(1, "101") is None
+
+
+    def test_invalidation_and_entry_count_stay_off_the_loop(self, tmp_path, monkeypatch):
+        """Test that CRUD invalidation runs on the cache thread and stats read the count from the last prune"""
+        clock = FakeClock()
+        cache, _ = make_workers(tmp_path, clock)
+        threads = []
+        invalidate = cache.invalidate_endpoint
+        monkeypatch.setattr(
+            cache, "invalidate_endpoint",
+            lambda endpoint_id: threads.append(threading.current_thread().name) or invalidate(endpoint_id)
+        )
+
+        async def scenario():
+            for upc in ("101", "102"):
+                await cache.set_async(1, upc, make_result(), 60)
+            await cache.set_async(2, "101", make_result(), 60)
+            before_prune = cache.stats()["entries"]
+            cache.prune()
+            after_prune = cache.stats()["entries"]
+            await cache.invalidate_endpoint_async(1)
+            return before_prune, after_prune
+
+        assert asyncio.run(scenario()) == (0, 3)
+        assert threads[0].startswith("price-cache")
+        assert cache.get(1, "101") is None
+        assert cache.generation(1) == 1
+
+
+class TestEndpointSync:
+    """Test applying endpoint edits logged by other workers"""
+
+    def test_poll_applies_only_other_workers_changes(self, tmp_path, monkeypatch):
+        """Test that edits, deletes and re-activations from another worker reach this worker"""
+        monkeypatch.setattr(main_module, "DATABASE_URL", str(tmp_path / "endpoints.db"))
+        monkeypatch.setattr(main_module, "endpoint_registry", main_module.EndpointRegistry())
+        monkeypatch.setattr(main_module, "price_cache", PriceCache(max_entries=10, stale_ttl=30))
+        scheduled = []
+        monkeypatch.setattr(main_module.connection_prewarmer, "schedule", scheduled.extend)
+
+        async def scenario():
+            await main_module.init_db()
+            async with aiosqlite.connect(main_module.DATABASE_URL) as db:
+                await db.execute("UPDATE api_endpoints SET is_active = FALSE WHERE id = 3")
+                await db.commit()
+                await main_module.endpoint_registry.load(db)
+                this_worker, other_worker = EndpointSync(), EndpointSync()
+                await this_worker.start(db)
+                await other_worker.start(db)
+                main_module.price_cache.set(1, "101", make_result(), 60)
+                main_module.price_cache.set(2, "101", make_result(), 60)
+
+                # Another worker renames endpoint 1, deletes 2 and re-activates 3
+                await db.execute("UPDATE api_endpoints SET name = 'Renamed' WHERE id = 1")
+                await db.execute("DELETE FROM api_endpoints WHERE id = 2")
+                await db.execute("UPDATE api_endpoints SET is_active = TRUE WHERE id = 3")
+                for endpoint_id in (1, 2, 3):
+                    await other_worker.record(db, endpoint_id)
+                # This worker's own change was applied when it was made, so polling skips it
+                await this_worker.record(db, 99)
+                await db.commit()
+                return await this_worker.poll(db), await this_worker.poll(db), this_worker
+
+        applied, again, sync = asyncio.run(scenario())
+
+        assert (applied, again) == (3, 0)
+        assert sync.applied == 3
+        assert [(e.id, e.name) for e in main_module.endpoint_registry.active] == [(1, "Renamed"), (3, "Googdit")]
+        assert main_module.price_cache.get(1, "101") is None
+        assert main_module.price_cache.get(2, "101") is None
+        assert [e.id for e in scheduled] == [3]
@@ -0,0 +1,138 @@
+import asyncio
+
+from conftest import main_module, FakeEndpoint
+
+SingleFlight = main_module.SingleFlight
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent identical upstream calls"""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test that concurrent callers with the same key trigger a single call"""
+        async def scenario():
+            flights = SingleFlight()
+            calls = 0
+
+            async def fetch():
+                nonlocal calls
+                calls += 1
+                await asyncio.sleep(0.01)
+                return "price"
+
+            results = await asyncio.gather(*[flights.do(("Appedia", "101"), fetch) for _ in range(5)])
+            return flights, calls, results
+
+        flights, calls, results = asyncio.run(scenario())
+
+        assert calls == 1
+        assert results == ["price"] * 5
+        assert flights.leaders == 1
+        assert flights.coalesced == 4
+        assert flights.stats()["in_flight"] == 0
+
+    def test_different_keys_are_not_coalesced(self):
+        """Test that different keys each get their own call"""
+        async def scenario():
+            flights = SingleFlight()
+
+            async def fetch():
+                await asyncio.sleep(0)
+                return "price"
+
+            await asyncio.gather(flights.do("101", fetch), flights.do("102", fetch))
+            return flights
+
+        flights = asyncio.run(scenario())
+
+        assert flights.leaders == 2
+        assert flights.coalesced == 0
+
+    def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        """Test that cancelling one waiter leaves the shared call running for the others"""
+        async def scenario():
+            flights = SingleFlight()
+
+            async def fetch():
+                await asyncio.sleep(0.02)
+                return "price"
+
+            first = asyncio.create_task(flights.do("101", fetch))
+            second = asyncio.create_task(flights.do("101", fetch))
+            await asyncio.sleep(0.005)
+            first.cancel()
+            return first, await second
+
+        first, second_result = asyncio.run(scenario())
+
+        assert first.cancelled()
+        assert second_result == "price"
+
+    def test_key_is_released_after_completion(self):
+        """Test that a finished call is not reused by later callers"""
+        async def scenario():
+            flights = SingleFlight()
+
+            async def fetch():
+                return "price"
+
+            await flights.do("101", fetch)
+            await flights.do("101", fetch)
+            return flights
+
+        flights = asyncio.run(scenario())
+
+        assert flights.leaders == 2
+        assert flights.coalesced == 0
+
+
+class TestPriorityFlights:
+    """Test that coalescing never makes a caller wait behind less urgent work"""
+
+    def run_pair(self, monkeypatch, first_priority, second_priority):
+        """Start a slow fetch at first_priority, then ask for the same price at second_priority"""
+        monkeypatch.setattr(main_module, "PRICE_HISTORY_ENABLED", False)
+        endpoint = FakeEndpoint(name="Appedia")
+
+        async def scenario():
+            release = asyncio.Event()
+            fetched_at = []
+
+            async def fetch(session, endpoint, upc):
+                priority = main_module.fetch_priority.get()
+                fetched_at.append(priority)
+                if priority == first_priority:
+                    await release.wait()
+                return main_module.PriceRecord(merchant=endpoint.name, price=float(priority), in_stock=True)
+
+            async def caller(priority):
+                main_module.fetch_priority.set(priority)
+                return await main_module.get_price(None, endpoint, "101", fetch=fetch)
+
+            first = asyncio.create_task(caller(first_priority))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(caller(second_priority))
+            done, _ = await asyncio.wait([second], timeout=0.2)
+            second_done_early = bool(done)
+            release.set()
+            return fetched_at, second_done_early, await first, await second
+
+        return asyncio.run(scenario())
+
+    def test_interactive_does_not_join_bulk_fetch(self, monkeypatch):
+        """Test that an interactive compare starts its own fetch instead of queueing behind a batch"""
+        fetched_at, done_early, _, interactive = self.run_pair(monkeypatch, main_module.BULK, main_module.INTERACTIVE)
+
+        assert fetched_at == [main_module.BULK, main_module.INTERACTIVE]
+        assert done_early == True
+        assert interactive.price == float(main_module.INTERACTIVE)
+
+    def test_background_joins_interactive_fetch(self, monkeypatch):
+        """Test that less urgent callers still share a fetch that is already running"""
+        fetched_at, done_early, interactive, background = self.run_pair(
+            monkeypatch, main_module.INTERACTIVE, main_module.BACKGROUND
+        )
+
+        assert fetched_at == [main_module.INTERACTIVE]
+        assert done_early == False
+        assert background.price == interactive.price
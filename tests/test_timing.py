@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from conftest import main_module
+
+RequestTimings = main_module.RequestTimings
+StackSampler = main_module.StackSampler
+SQLitePool = main_module.SQLitePool
+request_timings = main_module.request_timings
+
+
+class TestServerTiming:
+    """Test per-request phase timings and the Server-Timing header"""
+
+    def test_header_sums_phases_and_quotes_descriptions(self):
+        """Test that repeated phases add up and merchant names are escaped"""
+        timings = RequestTimings()
+        timings.add("sqlite", 0.001)
+        timings.add("sqlite", 0.002)
+        timings.add("fetch-1", 0.25, 'Shop "A"')
+
+        assert timings.header() == 'sqlite;dur=3.0, fetch-1;desc="Shop \\"A\\"";dur=250.0'
+
+    def test_response_carries_header(self):
+        """Test that the middleware adds the total to every response"""
+        response = TestClient(main_module.app).get("/api/health")
+
+        assert response.headers["server-timing"].startswith("total;dur=")
+        assert response.headers["timing-allow-origin"] == "http://localhost:3010, http://127.0.0.1:3010"
+
+    def test_sqlite_time_is_recorded_only_inside_a_request(self, tmp_path):
+        """Test that pooled SQLite work lands in the current request's timings"""
+        async def scenario():
+            pool = SQLitePool(str(tmp_path / "timing.db"), 1)
+            await pool.open()
+            try:
+                async with pool.acquire() as db:
+                    await db.execute("CREATE TABLE t (x INTEGER)")
+                    await db.commit()
+                timings = RequestTimings()
+                token = request_timings.set(timings)
+                try:
+                    async with pool.acquire() as db:
+                        cursor = await db.execute("INSERT INTO t VALUES (1)")
+                        assert cursor.lastrowid == 1
+                        await db.commit()
+                        cursor = await db.execute("SELECT COUNT(*) FROM t")
+                        assert await cursor.fetchone() == (1,)
+                finally:
+                    request_timings.reset(token)
+                return timings
+            finally:
+                await pool.close()
+
+        timings = asyncio.run(scenario())
+
+        assert list(timings.phases) == ["sqlite"]
+        assert timings.phases["sqlite"][0] > 0
+
+
+class TestStackSampler:
+    """Test the sampling profiler"""
+
+    def test_busy_function_is_hot(self):
+        """Test that a thread spinning in one function dominates the samples"""
+        stop = threading.Event()
+
+        def spin_for_test():
+            while not stop.is_set():
+                sum(range(1000))
+
+        thread = threading.Thread(target=spin_for_test)
+        thread.start()
+        try:
+            sampler = StackSampler(thread.ident, 0.001)
+            sampler.run(0.2)
+        finally:
+            stop.set()
+            thread.join()
+
+        report = sampler.report(limit=5)
+        assert report["samples"] > 0
+        assert report["functions"][0]["function"].startswith("spin_for_test ")
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in sampler.folded().splitlines()) == report["samples"]
+
+    def test_admin_token_required(self, monkeypatch):
+        """Test that profiling is off without ADMIN_TOKEN and needs the matching header"""
+        client = TestClient(main_module.app)
+        monkeypatch.setattr(main_module, "ADMIN_TOKEN", "")
+        assert client.get("/api/admin/profile", params={"seconds": 0.1}).status_code == 404
+
+        monkeypatch.setattr(main_module, "ADMIN_TOKEN", "s3cret")
+        assert client.get("/api/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+        response = client.get("/api/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "s3cret"})
+        assert response.status_code == 200
+        assert response.json()["samples"] > 0
@@ -0,0 +1,135 @@
+from conftest import main_module, FakeClock, FakeEndpoint, make_result
+
+PriceCache = main_module.PriceCache
+MerchantHealth = main_module.MerchantHealth
+WarmSnapshot = main_module.WarmSnapshot
+write_warm_snapshot = main_module.write_warm_snapshot
+
+
+def save(path, clock, endpoints, cache=None, health=None, previous=None):
+    prices = cache.export(100) if cache is not None else []
+    if previous is not None:
+        previous.close()
+    write_warm_snapshot(str(path), endpoints, prices, health or {}, clock(), previous)
+
+
+class TestWarmSnapshot:
+    """Test saving hot cache entries and merchant health across a restart"""
+
+    def test_restores_entry_with_remaining_ttl(self, tmp_path):
+        """Test that a saved entry is served after restart with its age carried over"""
+        clock = FakeClock()
+        endpoints = (FakeEndpoint(1),)
+        old = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        old.set(1, "101", make_result(), ttl=60)
+        clock.now += 10
+        save(tmp_path / "snap.db", clock, endpoints, cache=old)
+
+        clock.now += 5
+        new = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        new.snapshot = WarmSnapshot.open(str(tmp_path / "snap.db"), endpoints, clock=clock)
+        result, age, is_fresh = new.get(1, "101")
+
+        assert result.price == 4.77
+        assert age == 15
+        assert is_fresh == True
+        assert len(new) == 1
+        assert new.snapshot.prices_restored == 1
+
+    def test_unused_entries_carry_over_to_next_snapshot(self, tmp_path):
+        """Test that a second restart keeps saved entries the first run never looked up"""
+        clock = FakeClock()
+        endpoints = (FakeEndpoint(1),)
+        old = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        old.set(1, "101", make_result(price=1.0), ttl=60)
+        old.set(1, "102", make_result(price=2.0), ttl=60)
+        save(tmp_path / "snap.db", clock, endpoints, cache=old)
+
+        clock.now += 10
+        middle = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        middle.snapshot = WarmSnapshot.open(str(tmp_path / "snap.db"), endpoints, clock=clock)
+        middle.set(1, "101", make_result(price=1.5), ttl=60)
+        save(tmp_path / "snap.db", clock, endpoints, cache=middle, previous=middle.snapshot)
+
+        clock.now += 5
+        new = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        new.snapshot = WarmSnapshot.open(str(tmp_path / "snap.db"), endpoints, clock=clock)
+
+        assert new.get(1, "101")[0].price == 1.5
+        result, age, _ = new.get(1, "102")
+        assert result.price == 2.0
+        assert age == 15
+
+    def test_export_is_most_recent_first_and_bounded(self):
+        """Test that the hottest entries are the ones kept"""
+        cache = PriceCache(max_entries=10, stale_ttl=30, clock=FakeClock())
+        for upc in ("101", "102", "103"):
+            cache.set(1, upc, make_result(), ttl=60)
+        cache.get(1, "101")
+
+        assert [upc for _, upc, *_ in cache.export(2)] == ["101", "103"]
+
+    def test_changed_or_invalidated_endpoint_is_ignored(self, tmp_path):
+        """Test that entries are not reused for an endpoint whose URL changed or that was edited"""
+        clock = FakeClock()
+        old = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        old.set(1, "101", make_result(), ttl=60)
+        old.set(2, "101", make_result(), ttl=60)
+        save(tmp_path / "snap.db", clock, (FakeEndpoint(1), FakeEndpoint(2, name="Googdit")), cache=old)
+
+        endpoints = (FakeEndpoint(1, url="https://new.example.com/{upc}"), FakeEndpoint(2, name="Googdit"))
+        new = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        new.snapshot = WarmSnapshot.open(str(tmp_path / "snap.db"), endpoints, clock=clock)
+        new.invalidate_endpoint(2)
+
+        assert new.get(1, "101") is None
+        assert new.get(2, "101") is None
+
+    def test_snapshot_closes_after_entries_expire(self, tmp_path):
+        """Test that lookups stop once every saved entry is past its stale window"""
+        clock = FakeClock()
+        endpoints = (FakeEndpoint(1),)
+        old = PriceCache(max_entries=10, stale_ttl=30, clock=clock)
+        old.set(1, "101", make_result(), ttl=60)
+        save(tmp_path / "snap.db", clock, endpoints, cache=old)
+
+        snapshot = WarmSnapshot.open(str(tmp_path / "snap.db"), endpoints, clock=clock)
+        clock.now += 60 + main_module.PRICE_CACHE_STALE_TTL
+
+        assert snapshot.price(1, "101") is None
+        assert snapshot.closed == True
+
+    def test_missing_or_old_snapshot(self, tmp_path):
+        """Test that a missing or too old snapshot means a cold start"""
+        clock = FakeClock()
+        endpoints = (FakeEndpoint(1),)
+        assert WarmSnapshot.open(str(tmp_path / "missing.db"), endpoints, clock=clock) is None
+
+        save(tmp_path / "snap.db", clock, endpoints)
+        clock.now += main_module.WARM_SNAPSHOT_MAX_AGE + 1
+
+        assert WarmSnapshot.open(str(tmp_path / "snap.db"), endpoints, clock=clock) is None
+
+    def test_health_restores_timeout_and_open_breaker(self, tmp_path):
+        """Test that adaptive timeouts and an open breaker survive a restart"""
+        clock = FakeClock()
+        old = MerchantHealth(window=10, min_requests=4, open_seconds=30, clock=clock)
+        for _ in range(40):
+            old.allow_request()
+            old.record_success(0.4)
+        for _ in range(10):
+            old.allow_request()
+            old.record_failure()
+        assert old.state == MerchantHealth.OPEN
+        save(tmp_path / "snap.db", clock, (FakeEndpoint(1),), health={1: old.export_state()})
+
+        clock.now += 10
+        snapshot = WarmSnapshot.open(str(tmp_path / "snap.db"), (FakeEndpoint(1),), clock=clock)
+        new = MerchantHealth(window=10, min_requests=4, open_seconds=30, clock=clock)
+        new.restore_state(*snapshot.health(1))
+
+        assert new.request_timeout().total == old.request_timeout().total
+        assert new.allow_request() == False
+        clock.now += 21
+        assert new.allow_request() == True
+        assert new.state == MerchantHealth.HALF_OPEN